@@ -0,0 +1,388 @@
+import numpy as np
+import pandas as pd
+from collections import namedtuple
+from datetime import date
+import database as db
+import instrumentation
+
+# Análises de vários anos. Acumulados, variação anual e médias móveis são calculados pelo SQLite com
+# funções de janela sobre os totais mensais já agregados (monthly_totals + regras de recorrência):
+# o custo cresce com o número de meses do histórico, não com o número de lançamentos.
+MOVING_AVERAGE_MONTHS = 3
+
+MONTHLY_COLUMNS = ["period", "year", "month", "income", "expense", "investment", "balance", "running_balance",
+                   "cumulative_invested", "income_yoy", "expense_yoy", "balance_yoy", "income_ma", "expense_ma", "balance_ma"]
+YEARLY_COLUMNS = ["year", "income", "expense", "investment", "balance", "running_balance",
+                  "income_yoy_pct", "expense_yoy_pct", "balance_yoy_pct"]
+
+# Todos os meses de [:start, :end], inclusive os vazios (LAG de 12 linhas = mesmo mês do ano anterior)
+_MONTHLY_CTE = """
+    WITH RECURSIVE months (period) AS (
+        SELECT :start UNION ALL SELECT period + 1 FROM months WHERE period < :end
+    ),
+    totals AS ({period_totals}),
+    monthly AS (
+        SELECT m.period, COALESCE(t.income, 0) AS income, COALESCE(t.expense, 0) AS expense,
+               COALESCE(t.investment, 0) AS investment, COALESCE(t.income, 0) - COALESCE(t.expense, 0) AS balance
+        FROM months m LEFT JOIN totals t ON t.period = m.period
+    )
+"""
+
+_MONTHLY_QUERY = _MONTHLY_CTE + """
+    SELECT period, period / 12 AS year, period % 12 + 1 AS month, income, expense, investment, balance,
+           SUM(balance) OVER running AS running_balance,
+           SUM(investment) OVER running AS cumulative_invested,
+           income - LAG(income, 12) OVER ordered AS income_yoy,
+           expense - LAG(expense, 12) OVER ordered AS expense_yoy,
+           balance - LAG(balance, 12) OVER ordered AS balance_yoy,
+           AVG(income) OVER moving AS income_ma,
+           AVG(expense) OVER moving AS expense_ma,
+           AVG(balance) OVER moving AS balance_ma
+    FROM monthly
+    WINDOW ordered AS (ORDER BY period),
+           running AS (ORDER BY period ROWS UNBOUNDED PRECEDING),
+           moving AS (ORDER BY period ROWS {preceding} PRECEDING)
+    ORDER BY period
+"""
+
+_YEARLY_QUERY = _MONTHLY_CTE + """
+    SELECT period / 12 AS year, SUM(income) AS income, SUM(expense) AS expense,
+           SUM(investment) AS investment, SUM(balance) AS balance,
+           SUM(SUM(balance)) OVER (ORDER BY period / 12 ROWS UNBOUNDED PRECEDING) AS running_balance,
+           100.0 * (SUM(income) - LAG(SUM(income)) OVER ordered) / NULLIF(ABS(LAG(SUM(income)) OVER ordered), 0) AS income_yoy_pct,
+           100.0 * (SUM(expense) - LAG(SUM(expense)) OVER ordered) / NULLIF(ABS(LAG(SUM(expense)) OVER ordered), 0) AS expense_yoy_pct,
+           100.0 * (SUM(balance) - LAG(SUM(balance)) OVER ordered) / NULLIF(ABS(LAG(SUM(balance)) OVER ordered), 0) AS balance_yoy_pct
+    FROM monthly
+    GROUP BY period / 12
+    WINDOW ordered AS (ORDER BY period / 12)
+    ORDER BY year
+"""
+
+def history_range(user_id):
+    """(primeiro, último) período do histórico do usuário, indo pelo menos até o mês atual; None se não houver dados."""
+    with db.connection(user_id=user_id) as conn:
+        first, last = conn.execute("""
+            SELECT MIN(first), MAX(last) FROM (
+                SELECT MIN(year * 12 + month - 1) AS first, MAX(year * 12 + month - 1) AS last
+                FROM monthly_totals WHERE user_id = :user_id
+                UNION ALL
+                SELECT MIN(start_period), MAX(end_period) FROM recurrences WHERE user_id = :user_id
+            )
+        """, {"user_id": user_id}).fetchone()
+    if first is None:
+        return None
+    today = date.today()
+    # Regras sem término (end_period NULL) não empurram o fim do histórico além do mês atual
+    return first, max(last if last is not None else first, db.to_period(today.month, today.year))
+
+def _read(query, user_id, start, end, columns):
+    if start is None or end is None:
+        found = history_range(user_id)
+        if found is None:
+            return pd.DataFrame(columns=columns)
+        start = found[0] if start is None else start
+        end = found[1] if end is None else end
+    with db.connection(user_id=user_id) as conn:
+        return pd.read_sql_query(query, conn, params=db.period_params(user_id, start, end))
+
+@db.cached_read
+def get_monthly_trends(user_id, start=None, end=None, window=MOVING_AVERAGE_MONTHS):
+    """Uma linha por mês de [start, end] (todo o histórico por padrão): saldo e investimento acumulados,
+    variação sobre o mesmo mês do ano anterior (*_yoy) e médias móveis de `window` meses (*_ma), em centavos."""
+    query = _MONTHLY_QUERY.format(period_totals=db.PERIOD_TOTALS_QUERY, preceding=max(int(window), 1) - 1)
+    return _read(query, user_id, start, end, MONTHLY_COLUMNS)
+
+@db.cached_read
+def get_yearly_trends(user_id, start=None, end=None):
+    """Totais por ano, saldo acumulado e variação percentual em relação ao ano anterior."""
+    return _read(_YEARLY_QUERY.format(period_totals=db.PERIOD_TOTALS_QUERY), user_id, start, end, YEARLY_COLUMNS)
+
+# --- Categorias ---
+# Pivô categoria x mês (ou ano) sobre database.get_category_totals, que já vem agregado do banco
+# (category_totals + regras): o pivô tem no máximo meses x categorias células e fica em cache.
+CATEGORY_TOP = 8  # categorias com série própria nos gráficos; as demais somam em OTHER_CATEGORY
+OTHER_CATEGORY = "Outras"
+
+@db.cached_read
+def get_category_pivot(user_id, kind, start, end, by="month", top=None):
+    """Totais (centavos) do tipo `kind` em [start, end]: uma linha por mês (by="month", índice = período)
+    ou por ano (by="year"), uma coluna por categoria, da maior para a menor. Com `top`, as categorias
+    além das `top` maiores são somadas numa coluna "Outras"."""
+    totals = db.get_category_totals(user_id, start, end)
+    totals = totals[totals["kind"] == kind]
+    index = range(start, end + 1) if by == "month" else range(start // 12, end // 12 + 1)
+    if by == "year":
+        totals = totals.assign(period=totals["period"] // 12)
+    pivot = totals.groupby(["period", "category"])["total"].sum().unstack(fill_value=0).reindex(index, fill_value=0)
+    pivot = pivot[pivot.sum().sort_values(ascending=False, kind="stable").index]
+    if top is not None and len(pivot.columns) > top:
+        rest = pivot.iloc[:, top:].sum(axis=1)
+        pivot = pivot.iloc[:, :top]
+        pivot[OTHER_CATEGORY] = rest
+    pivot.index.name, pivot.columns.name = "period" if by == "month" else "year", None
+    return pivot.astype("int64")
+
+@db.cached_read
+def get_category_allocation(user_id, kind, start, end):
+    """Total (centavos) e participação (%) de cada categoria do tipo `kind` em [start, end]."""
+    totals = get_category_pivot(user_id, kind, start, end, by="year").sum()
+    grand = totals.sum()
+    return pd.DataFrame({"category": totals.index, "total": totals.to_numpy(dtype=np.int64),
+                         "share_pct": totals.to_numpy() / grand * 100 if grand else 0.0})
+
+# --- Previsão das metas ---
+# Todas as metas do usuário numa passada: uma matriz metas x meses com os aportes vinculados
+# (avulsos do histórico + ocorrências das regras, com exceções), acumulada com cumsum.
+GOAL_HORIZON_MONTHS = 360
+GOAL_PACE_MONTHS = 12  # janela da média dos aportes avulsos, projetada para os meses seguintes
+GOAL_COLUMNS = ["id", "name", "target_value", "current_value", "progress", "deadline", "monthly_pace",
+                "completion_period", "needed_monthly", "status"]
+
+def _goal_inputs(user_id):
+    with db.connection(user_id=user_id) as conn:
+        conn.execute("BEGIN")
+        goals = conn.execute("SELECT id, name, target_value, COALESCE(current_value, 0), deadline FROM goals "
+                             "WHERE user_id = ? ORDER BY id", (user_id,)).fetchall()
+        single = conn.execute("""
+            SELECT goal_id, year * 12 + month - 1, SUM(amount) FROM investments
+            WHERE +user_id = ? AND goal_id IN (SELECT id FROM goals WHERE user_id = ?)
+            GROUP BY goal_id, year, month
+        """, (user_id, user_id)).fetchall()
+        rules = conn.execute("""
+            SELECT id, goal_id, value, start_period, end_period, interval_months FROM recurrences
+            WHERE user_id = ? AND kind = 'investment' AND goal_id IS NOT NULL
+        """, (user_id,)).fetchall()
+        overrides = conn.execute("""
+            SELECT o.recurrence_id, o.period, o.value, o.skip FROM recurrence_overrides o
+            JOIN recurrences r ON r.id = o.recurrence_id
+            WHERE r.user_id = ? AND r.kind = 'investment' AND r.goal_id IS NOT NULL
+        """, (user_id,)).fetchall()
+    return goals, single, rules, overrides
+
+def _deadline_period(deadline):
+    if deadline is None or deadline == "":
+        return -1
+    parsed = pd.Timestamp(deadline)
+    return db.to_period(parsed.month, parsed.year)
+
+def _goal_contributions(ids, single, rules, overrides, now, horizon):
+    """Aportes vinculados (metas x meses, de `first` até now + horizon): avulsos e ocorrências das regras."""
+    single = np.array(single, dtype=np.int64).reshape(-1, 3)
+    rules = np.array([[r[0], r[1], r[2], r[3], -1 if r[4] is None else r[4], r[5]] for r in rules], dtype=np.int64).reshape(-1, 6)
+    rules = rules[np.isin(rules[:, 1], ids)]
+    first = int(min(single[:, 1].min(initial=now), rules[:, 3].min(initial=now)))
+    last = now + max(int(horizon), 1)
+    periods = np.arange(first, last + 1)
+    # goal_id -> linha pelo searchsorted (ids vêm ordenados do ORDER BY)
+    single = single[single[:, 1] <= last]
+    one_off = np.zeros((len(ids), len(periods)), dtype=np.int64)
+    np.add.at(one_off, (np.searchsorted(ids, single[:, 0]), single[:, 1] - first), single[:, 2])
+
+    # Ocorrências das regras: matriz regras x meses
+    start, end, interval = rules[:, 3:4], np.where(rules[:, 4:5] < 0, last, rules[:, 4:5]), rules[:, 5:6]
+    active = (periods >= start) & (periods <= end) & ((periods - start) % interval == 0)
+    scheduled_rules = np.where(active, rules[:, 2:3], 0)
+    if overrides and len(rules):
+        row_of = {rule_id: i for i, rule_id in enumerate(rules[:, 0].tolist())}
+        # Exceções de regras que ficaram de fora (vinculadas a metas fora de ids) não entram na matriz
+        o = np.array([[r, p, -1 if v is None else v, s] for r, p, v, s in overrides if r in row_of],
+                     dtype=np.int64).reshape(-1, 4)
+        row, col = np.array([row_of[r] for r in o[:, 0].tolist()], dtype=np.int64), o[:, 1] - first
+        inside = (col >= 0) & (col < len(periods))
+        row, col, o = row[inside], col[inside], o[inside]
+        # Exceção só vale num mês em que a regra ocorre; skip zera, value NULL mantém o valor da regra
+        hit = active[row, col]
+        value = np.where(o[:, 3] != 0, 0, np.where(o[:, 2] < 0, rules[row, 2], o[:, 2]))
+        scheduled_rules[row[hit], col[hit]] = value[hit]
+    recurring = np.zeros_like(one_off)
+    np.add.at(recurring, np.searchsorted(ids, rules[:, 1]), scheduled_rules)
+    return first, one_off, recurring
+
+@db.cached_read
+def forecast_goals(user_id, horizon=GOAL_HORIZON_MONTHS):
+    """Progresso e previsão de todas as metas: data prevista de conclusão (completion_period, NA se não
+    chega lá em `horizon` meses) e aporte mensal necessário para cumprir o prazo (needed_monthly), em centavos.
+
+    A previsão soma os aportes programados (regras vinculadas e lançamentos futuros) à média dos aportes
+    avulsos dos últimos GOAL_PACE_MONTHS meses."""
+    goals, single, rules, overrides = _goal_inputs(user_id)
+    if not goals:
+        return pd.DataFrame(columns=GOAL_COLUMNS)
+    now = db.current_period()
+    ids = np.array([g[0] for g in goals], dtype=np.int64)
+    target = np.array([g[2] for g in goals], dtype=np.int64)
+    initial = np.array([g[3] for g in goals], dtype=np.int64)
+    deadline = np.array([_deadline_period(g[4]) for g in goals], dtype=np.int64)
+
+    first, one_off, recurring = _goal_contributions(ids, single, rules, overrides, now, horizon)
+    contributions = one_off + recurring
+    elapsed = now - first + 1  # colunas até o mês atual, inclusive
+    current = initial + contributions[:, :elapsed].sum(axis=1)
+    window = one_off[:, max(elapsed - GOAL_PACE_MONTHS, 0):elapsed]
+    pace = window.sum(axis=1) // GOAL_PACE_MONTHS
+    future = contributions[:, elapsed:]  # programado: regras + lançamentos já feitos para meses seguintes
+    projected = current[:, None] + np.cumsum(future + pace[:, None], axis=1)
+    reached = projected >= target[:, None]
+    done = current >= target
+    completion = np.where(done, now, np.where(reached.any(axis=1), now + 1 + reached.argmax(axis=1), -1))
+
+    # Aporte necessário: o que falta depois do programado até o prazo, dividido pelos meses restantes
+    months_left = deadline - now
+    cumulative_future = np.cumsum(future, axis=1)
+    until_deadline = np.where(months_left > 0, cumulative_future[np.arange(len(ids)), np.clip(months_left, 1, future.shape[1]) - 1], 0)
+    missing = np.maximum(target - current - until_deadline, 0)
+    needed = np.where(months_left > 0, -(-missing // np.maximum(months_left, 1)), missing)
+
+    status = np.select(
+        [done, deadline < 0, (completion >= 0) & (completion <= deadline), months_left <= 0],
+        ["Atingida", "Sem prazo", "No ritmo", "Prazo vencido"], "Atrasada")
+    monthly_pace = pace + future[:, :GOAL_PACE_MONTHS].sum(axis=1) // GOAL_PACE_MONTHS
+    return pd.DataFrame({
+        "id": ids, "name": [g[1] for g in goals], "target_value": target, "current_value": current,
+        "progress": np.minimum(current / np.maximum(target, 1), 1.0), "deadline": [g[4] for g in goals],
+        "monthly_pace": monthly_pace,
+        "completion_period": pd.Series(completion, dtype="Int64").mask(completion < 0),
+        "needed_monthly": pd.Series(needed, dtype="Int64").mask(deadline < 0),
+        "status": status.astype(object),
+    })
+
+# --- Cenários (Monte Carlo) ---
+# Projeção estocástica: em cada caminho, cada mês simulado sorteia um mês do histórico recente do usuário
+# (bootstrap) e repete os lançamentos avulsos daquele mês, em todas as categorias ao mesmo tempo; assim a
+# variabilidade de cada categoria e a correlação entre elas vêm do próprio histórico. Regras de recorrência
+# e lançamentos já registrados para meses futuros entram como programados (o avulso registrado é o piso da
+# sua categoria no mês). Um fator por caminho e tipo representa a incerteza da média aprendida com poucos
+# meses. Tudo em matrizes meses x caminhos: nenhum laço em Python por caminho ou por mês.
+SCENARIO_PATHS = 10_000
+SCENARIO_HISTORY_MONTHS = 24  # meses completos antes do início da projeção usados no bootstrap
+SCENARIO_SEED = 0  # semente fixa: o mesmo cenário a cada rerun (e no cache)
+SCENARIO_PERCENTILES = (10, 50, 90)
+SCENARIO_KINDS = ("income", "expense", "investment")
+SCENARIO_COLUMNS = ["period", "year", "month", "scheduled_balance", "income_mean", "expense_mean", "investment_mean",
+                    "balance_p10", "balance_p50", "balance_p90", "cumulative_p10", "cumulative_p50", "cumulative_p90"]
+SCENARIO_GOAL_COLUMNS = ["id", "name", "target_value", "current_value", "deadline", "hit_probability"]
+Scenario = namedtuple("Scenario", ["bands", "goals"])
+
+def _one_off_matrix(user_id, start, end):
+    # Lançamentos avulsos por mês x (tipo, categoria): category_totals não inclui as ocorrências das regras
+    with db.connection(user_id=user_id) as conn:
+        rows = conn.execute("""
+            SELECT year * 12 + month - 1 AS period, kind, category, total FROM category_totals
+            WHERE user_id = :user_id AND year BETWEEN :first_year AND :last_year
+              AND year * 12 + month - 1 BETWEEN :start AND :end
+        """, db.period_params(user_id, start, end)).fetchall()
+    frame = db.category_frame(rows)
+    matrix = frame.groupby(["period", "kind", "category"])["total"].sum().unstack(["kind", "category"], fill_value=0)
+    matrix = matrix.reindex(range(start, end + 1), fill_value=0)
+    kinds = matrix.columns.get_level_values("kind").to_numpy() if len(matrix.columns) else np.array([], dtype=object)
+    return matrix.to_numpy(dtype=np.float64).reshape(end - start + 1, -1), kinds
+
+def _path_scale(rng, history, paths):
+    # Incerteza da média: desvio do fator = coeficiente de variação / raiz do número de meses do histórico
+    mean = history.mean() if len(history) else 0.0
+    if len(history) < 2 or mean <= 0:
+        return np.ones(paths)
+    sd = history.std(ddof=1) / mean / np.sqrt(len(history))
+    return np.maximum(1 + sd * rng.standard_normal(paths), 0)
+
+def _sample(history, registered, pick, scale):
+    """Avulsos simulados (meses x caminhos) de um grupo de séries: history (meses do histórico x séries),
+    registered (meses simulados x séries, lançamentos já registrados), pick (meses x caminhos, índice do
+    mês sorteado) e scale (fator por caminho). Devolve o que excede o registrado."""
+    total = history.sum(axis=1)[pick] * scale
+    # Meses com algo registrado: max(sorteado, registrado) por série em vez de sorteado + registrado
+    for j in np.flatnonzero(registered.any(axis=0)):
+        rows = np.flatnonzero(registered[:, j])
+        total[rows] += np.maximum(registered[rows, j:j + 1] - history[pick[rows], j] * scale, 0)
+    return total - registered.sum(axis=1)[:, None]
+
+@db.cached_read
+def simulate_projection(user_id, start, months=12, paths=SCENARIO_PATHS, seed=SCENARIO_SEED):
+    """Projeção Monte Carlo de `months` meses a partir do período `start`, com `paths` caminhos.
+
+    bands: uma linha por mês com o saldo programado (como get_future_projection), as médias de receita,
+    despesa e investimento e os percentis P10/P50/P90 do saldo do mês e do saldo acumulado desde `start`.
+    goals: probabilidade de cada meta atingir o valor alvo até o prazo (NaN sem prazo). Centavos."""
+    now = db.current_period()
+    end = start + months - 1
+    span = history_range(user_id)
+    history_end = min(start, now) - 1  # o mês corrente ainda está incompleto
+    history_start = max(history_end - SCENARIO_HISTORY_MONTHS + 1, span[0] if span else history_end + 1)
+    n_history = max(history_end - history_start + 1, 0)
+
+    goals, single, rules, overrides = _goal_inputs(user_id)
+    deadline = np.array([_deadline_period(g[4]) for g in goals], dtype=np.int64)
+    goals_end = min(int(deadline.max(initial=now)), now + GOAL_HORIZON_MONTHS)
+    # Eixo simulado comum à projeção e às metas: o mesmo mês sorteado vale para as duas
+    first, last = min(start, now + 1), max(end, goals_end)
+    length = last - first + 1
+
+    rng = np.random.default_rng(seed)
+    base = min(history_start, first)
+    one_off, kinds = _one_off_matrix(user_id, base, last)
+    registered = one_off[first - base:]
+    if n_history:
+        history = one_off[history_start - base:history_end - base + 1]
+        pick = rng.integers(0, n_history, size=(length, paths))
+    else:  # sem histórico: só o programado
+        history = np.zeros((1, one_off.shape[1]))
+        pick = np.zeros((length, paths), dtype=np.int64)
+
+    window = slice(start - first, end - first + 1)
+    scheduled = db.get_future_projection(user_id, *db.from_period(start), months)
+    simulated, scales = {}, {}
+    for kind, column in zip(SCENARIO_KINDS, ("Receita", "Despesa", "Investimento")):
+        cols = kinds == kind
+        scales[kind] = _path_scale(rng, history[:n_history, cols].sum(axis=1), paths)
+        simulated[kind] = scheduled[column].to_numpy(dtype=np.float64)[:, None] + _sample(
+            history[:, cols], registered[window, cols], pick[window], scales[kind])
+
+    balance = simulated["income"] - simulated["expense"]
+    balance_q = np.percentile(balance, SCENARIO_PERCENTILES, axis=1)
+    cumulative_q = np.percentile(np.cumsum(balance, axis=0), SCENARIO_PERCENTILES, axis=1)
+    periods = np.arange(start, end + 1)
+    bands = pd.DataFrame({"period": periods, "year": periods // 12, "month": periods % 12 + 1,
+                          "scheduled_balance": scheduled["Saldo"].to_numpy(dtype=np.int64)})
+    for kind in SCENARIO_KINDS:
+        bands[f"{kind}_mean"] = np.rint(simulated[kind].mean(axis=1)).astype(np.int64)
+    for q, b, c in zip(SCENARIO_PERCENTILES, balance_q, cumulative_q):
+        bands[f"balance_p{q}"] = np.rint(b).astype(np.int64)
+        bands[f"cumulative_p{q}"] = np.rint(c).astype(np.int64)
+    return Scenario(bands[SCENARIO_COLUMNS], _goal_probabilities(goals, single, rules, overrides, deadline, now,
+                                                                   first, pick, history_start, n_history, scales["investment"]))
+
+def _goal_probabilities(goals, single, rules, overrides, deadline, now, first, pick, history_start, n_history, scale):
+    if not goals:
+        return pd.DataFrame(columns=SCENARIO_GOAL_COLUMNS)
+    ids = np.array([g[0] for g in goals], dtype=np.int64)
+    target = np.array([g[2] for g in goals], dtype=np.int64)
+    horizon = max(len(pick) + first - 1 - now, 1)
+    goal_first, one_off, recurring = _goal_contributions(ids, single, rules, overrides, now, horizon)
+    if goal_first > history_start:  # histórico anterior ao primeiro aporte vinculado: meses sem aporte
+        pad = goal_first - history_start
+        one_off = np.pad(one_off, ((0, 0), (pad, 0)))
+        recurring = np.pad(recurring, ((0, 0), (pad, 0)))
+        goal_first = history_start
+    current = np.array([g[3] for g in goals], dtype=np.int64) + (one_off + recurring)[:, :now - goal_first + 1].sum(axis=1)
+    history = one_off[:, history_start - goal_first:history_start - goal_first + n_history].T.astype(np.float64)
+    if not n_history:
+        history = np.zeros((1, len(ids)))
+
+    probability = np.full(len(ids), np.nan)
+    probability[current >= target] = 1.0
+    open_goals = (current < target) & (deadline >= 0)
+    probability[open_goals & (deadline <= now)] = 0.0
+    for i in np.flatnonzero(open_goals & (deadline > now)):
+        # Meses de now + 1 até o prazo (limitado ao eixo simulado)
+        stop = min(int(deadline[i]), first + len(pick) - 1)
+        months = slice(now + 1 - first, stop - first + 1)
+        future = slice(now + 1 - goal_first, stop - goal_first + 1)
+        reg = one_off[i, future].astype(np.float64)[:, None]
+        extra = _sample(history[:, i:i + 1], reg, pick[months], scale).sum(axis=0)
+        # Aportes são só positivos: atingir até o prazo = acumulado no prazo >= alvo
+        reached = current[i] + recurring[i, future].sum() + reg.sum() + extra >= target[i]
+        probability[i] = reached.mean()
+    return pd.DataFrame({"id": ids, "name": [g[1] for g in goals], "target_value": target, "current_value": current,
+                         "deadline": [g[4] for g in goals], "hit_probability": probability})
+
+instrumentation.instrument_functions(globals())
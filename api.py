@@ -0,0 +1,269 @@
+import os
+import gzip
+import json
+import hmac
+import time
+import hashlib
+import logging
+import secrets
+import argparse
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, parse_qs
+import database as db
+import analytics
+import instrumentation
+
+# API HTTP/JSON somente leitura sobre database.py, para apps móveis e rotinas em lote: as mesmas
+# consultas (e o mesmo cache) das telas do Streamlit, sem reexecutar o script inteiro a cada pedido.
+#
+# Autenticação: POST /api/login devolve um token assinado (HMAC) com o id do usuário e a validade;
+# os demais pedidos mandam "Authorization: Bearer <token>". A assinatura inclui o hash da senha, então
+# trocar a senha invalida os tokens antigos. Sem FINANCE_API_SECRET, o segredo é sorteado a cada início.
+#
+# Cache condicional: o ETag de cada resposta é a versão gravada dos dados do usuário (data_versions,
+# que toda escrita incrementa, em qualquer processo) + o mês corrente. Um GET com If-None-Match igual
+# recebe 304 depois de uma única leitura por chave primária, sem consultar os lançamentos.
+# Valores em centavos (inteiros), como no banco.
+API_VERSION = 1
+HOST = os.environ.get("FINANCE_API_HOST", "127.0.0.1")
+PORT = int(os.environ.get("FINANCE_API_PORT", "8502"))
+WORKERS = int(os.environ.get("FINANCE_API_WORKERS", "8"))
+TOKEN_TTL = 30 * 24 * 3600  # segundos
+SECRET = os.environ.get("FINANCE_API_SECRET") or secrets.token_hex(32)
+GZIP_MIN_BYTES = 1024
+MAX_BODY_BYTES = 64 * 1024
+MAX_PROJECTION_MONTHS = 120
+
+log = logging.getLogger("finance.api")
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+# --- Tokens ---
+def _signature(user_id, expires, password_hash):
+    message = f"{user_id}.{expires}.{password_hash}".encode()
+    return hmac.new(SECRET.encode(), message, hashlib.sha256).hexdigest()
+
+def _user_row(user_id):
+    with db.connection() as conn:
+        return conn.execute("SELECT password FROM users WHERE id = ?", (user_id,)).fetchone()
+
+def issue_token(user_id, ttl=TOKEN_TTL):
+    row = _user_row(user_id)
+    if row is None:
+        raise ApiError(404, "Usuário não encontrado")
+    expires = int(time.time()) + ttl
+    return f"{user_id}.{expires}.{_signature(user_id, expires, row[0])}", expires
+
+def authenticate(header):
+    """user_id do token em "Authorization: Bearer <token>"; ApiError(401) se ausente, inválido ou vencido."""
+    if not header or not header.startswith("Bearer "):
+        raise ApiError(401, "Token ausente")
+    try:
+        user_id, expires, signature = header[7:].strip().split(".")
+        user_id, expires = int(user_id), int(expires)
+    except ValueError:
+        raise ApiError(401, "Token inválido")
+    if expires < time.time():
+        raise ApiError(401, "Token vencido")
+    row = _user_row(user_id)
+    if row is None or not hmac.compare_digest(signature, _signature(user_id, expires, row[0])):
+        raise ApiError(401, "Token inválido")
+    return user_id
+
+# --- Conversão ---
+def _records(frame):
+    # to_json já converte NaN/NA em null e tipos do NumPy em números JSON
+    return json.loads(frame.to_json(orient="records", date_format="iso"))
+
+def _int_param(query, name, default=None, low=None, high=None):
+    values = query.get(name)
+    if not values:
+        if default is None:
+            raise ApiError(400, f"Parâmetro obrigatório: {name}")
+        return default
+    try:
+        value = int(values[0])
+    except ValueError:
+        raise ApiError(400, f"Parâmetro {name} deve ser um número inteiro")
+    if (low is not None and value < low) or (high is not None and value > high):
+        raise ApiError(400, f"Parâmetro {name} fora do intervalo [{low}, {high}]")
+    return value
+
+def _month_year(query):
+    month, year = db.from_period(db.current_period())
+    return _int_param(query, "month", month, 1, 12), _int_param(query, "year", year, 1900, 9999)
+
+# --- Rotas ---
+def get_month(user_id, query):
+    month, year = _month_year(query)
+    pages = tuple(_int_param(query, f"page_{table}", 1, 1) for table in db.ENTRY_TABLES)
+    snap = db.get_month_snapshot(user_id, month, year, pages)
+    income, expense, investment = snap.totals
+    result = {"month": month, "year": year,
+              "totals": {"income": income, "expense": expense, "investment": investment, "balance": income - expense},
+              "goals": _records(snap.goals), "page_size": db.PAGE_SIZE}
+    for table, frame, count, page in zip(db.ENTRY_TABLES, snap[:3], snap.counts, snap.pages):
+        result[table] = {"rows": _records(frame), "count": count, "page": page}
+    return result
+
+def get_annual(user_id, query):
+    year = _int_param(query, "year", db.from_period(db.current_period())[1], 1900, 9999)
+    return {"year": year, "months": _records(db.get_annual_summary(user_id, year))}
+
+def get_projection(user_id, query):
+    month, year = _month_year(query)
+    periods = _int_param(query, "months", 12, 1, MAX_PROJECTION_MONTHS)
+    frame = db.get_future_projection(user_id, month, year, periods)
+    return {"month": month, "year": year, "months": _records(frame)}
+
+def get_scenarios(user_id, query):
+    month, year = _month_year(query)
+    periods = _int_param(query, "months", 12, 1, MAX_PROJECTION_MONTHS)
+    scenario = analytics.simulate_projection(user_id, db.to_period(month, year), periods)
+    return {"month": month, "year": year, "paths": analytics.SCENARIO_PATHS,
+            "months": _records(scenario.bands), "goals": _records(scenario.goals)}
+
+def get_goals(user_id, query):
+    return {"goals": _records(analytics.forecast_goals(user_id))}
+
+ROUTES = {
+    "/api/month": get_month,
+    "/api/annual": get_annual,
+    "/api/projection": get_projection,
+    "/api/scenarios": get_scenarios,
+    "/api/goals": get_goals,
+}
+
+def etag(user_id, version):
+    # Muda com os dados do usuário e com o mês corrente (projeções e metas dependem de "hoje")
+    return f'"{API_VERSION}-{user_id}-{version}-{db.current_period()}"'
+
+def _matches(if_none_match, tag):
+    if if_none_match is None:
+        return False
+    candidates = [c.strip() for c in if_none_match.split(",")]
+    return "*" in candidates or tag in candidates or f"W/{tag}" in candidates
+
+class Handler(BaseHTTPRequestHandler):
+    server_version = "FinanceAPI/1"
+
+    def log_message(self, format, *args):
+        log.info("%s %s", self.address_string(), format % args)
+
+    def _send(self, status, payload=None, headers=()):
+        body = b"" if payload is None else json.dumps(payload, ensure_ascii=False).encode()
+        self.send_response(status)
+        if payload is not None:
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            if len(body) >= GZIP_MIN_BYTES and "gzip" in self.headers.get("Accept-Encoding", ""):
+                body = gzip.compress(body, compresslevel=5)
+                self.send_header("Content-Encoding", "gzip")
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _dispatch(self, handler):
+        try:
+            handler()
+        except ApiError as e:
+            self._send(e.status, {"error": str(e)},
+                       [("WWW-Authenticate", "Bearer")] if e.status == 401 else ())
+        except Exception:
+            log.exception("erro em %s %s", self.command, self.path)
+            self._send(500, {"error": "Erro interno"})
+
+    def do_GET(self):
+        self._dispatch(self._get)
+
+    do_HEAD = do_GET
+
+    def do_POST(self):
+        self._dispatch(self._post)
+
+    def _get(self):
+        url = urlsplit(self.path)
+        if url.path == "/api/health":
+            with db.connection() as conn:
+                self._send(200, {"status": "ok", "api_version": API_VERSION, "schema_version": db.get_schema_version(conn)})
+            return
+        route = ROUTES.get(url.path)
+        if route is None:
+            raise ApiError(404, "Rota desconhecida")
+        user_id = authenticate(self.headers.get("Authorization"))
+        version = db.sync_data_version(user_id)
+        tag = etag(user_id, version)
+        headers = [("ETag", tag), ("Cache-Control", "private, no-cache"), ("Vary", "Authorization")]
+        if _matches(self.headers.get("If-None-Match"), tag):
+            self._send(304, headers=headers)
+            return
+        self._send(200, route(user_id, parse_qs(url.query)), headers)
+
+    def _post(self):
+        if urlsplit(self.path).path != "/api/login":
+            raise ApiError(404 if urlsplit(self.path).path not in ROUTES else 405, "Rota desconhecida")
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            raise ApiError(413, "Corpo grande demais")
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+            login, password = body["user"], body["password"]
+        except (ValueError, KeyError, TypeError):
+            raise ApiError(400, 'Envie {"user": ..., "password": ...}')
+        found = db.login_user(login, password)
+        if found is None:
+            raise ApiError(401, "Dados de acesso incorretos")
+        user_id, username = found
+        token, expires = issue_token(user_id)
+        self._send(200, {"token": token, "expires": expires, "user_id": user_id, "username": username})
+
+class PooledHTTPServer(HTTPServer):
+    """HTTPServer que atende cada conexão num pool fixo de threads (em vez de uma thread nova por pedido)."""
+
+    def __init__(self, address, handler=Handler, workers=WORKERS):
+        super().__init__(address, handler)
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="api")
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self._process, request, client_address)
+
+    def _process(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=True)
+
+def make_server(host=HOST, port=PORT, workers=WORKERS):
+    """Servidor pronto para serve_forever(); port=0 escolhe uma porta livre (server.server_address)."""
+    db.init_db()
+    return PooledHTTPServer((host, port), Handler, workers)
+
+instrumentation.instrument_functions(globals(), exclude={"make_server", "authenticate", "etag", "issue_token"})
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="API HTTP/JSON do Controle Financeiro")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    server = make_server(args.host, args.port, args.workers)
+    print(f"API em http://{server.server_address[0]}:{server.server_address[1]}/api (Ctrl+C encerra)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
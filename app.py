@@ -1,10 +1,17 @@
 import streamlit as st
 from datetime import datetime
+from functools import partial
+import zipfile
 import database as db
+import importer
+import exporter
+import analytics
+import instrumentation
 import utils
 import styles
 import pandas as pd
 import re
+import json
 
 # Configuração da Página
 st.set_page_config(
@@ -14,8 +21,12 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Inicializar Banco de Dados e Estilos
-db.init_db()
+# Bootstrap do banco uma vez por processo (o Streamlit reexecuta este script a cada interação)
+@st.cache_resource(show_spinner=False)
+def bootstrap_database(path):
+    return db.init_db(path)
+
+bootstrap_database(db.DB_NAME)
 styles.apply_styles()
 
 # Função para exibir o cabeçalho sofisticado
@@ -107,7 +118,9 @@ username = st.session_state['username']
 st.sidebar.title(f"👤 {username}")
 if st.sidebar.button("Sair"): logout()
 st.sidebar.divider()
-menu = st.sidebar.radio("Ir para:", ["Mensal", "🎯 Metas Financeiras", "Resumo Anual", "🔮 Projeção 12 Meses"])
+pages = ["Mensal", "🎯 Metas Financeiras", "Resumo Anual", "🔮 Projeção 12 Meses", "📈 Tendências", "📂 Importar Extrato", "💾 Backup"]
+if db.is_admin(username): pages.append("🩺 Diagnóstico")
+menu = st.sidebar.radio("Ir para:", pages)
 
 # Seleção de Mês e Ano
 current_date = datetime.now()
@@ -118,15 +131,42 @@ selected_year = st.sidebar.number_input("Ano", min_value=2020, max_value=2030, v
 
 show_sophisticated_header()
 
+def entries_table(df, table, prefix, columns, rows):
+    # Uma página de lançamentos com coluna de seleção; as ações agem em lote (uma transação por ação)
+    n_pages = db.page_count(rows)
+    if n_pages > 1:
+        st.number_input(f"Página (de {n_pages}, {rows} lançamentos)", min_value=1, max_value=n_pages, key=f"page_{prefix}")
+    if df.empty:
+        return
+    value_col = 'amount' if table == "investments" else 'value'
+    view = df[list(columns)].rename(columns=columns)
+    view.insert(0, "Selecionar", False)
+    view['Valor'] = utils.format_currency_array(df[value_col])
+    view['Recorrente'] = df['recurrence_id'].notna()
+    # A chave muda a cada escrita: a seleção não sobrevive a uma exclusão nem passa para outras linhas
+    edited = st.data_editor(view, hide_index=True, use_container_width=True, disabled=list(view.columns[1:]),
+                            key=f"ed_{prefix}_{selected_month}_{selected_year}_{db.data_version(user_id)}")
+    chosen = df[edited["Selecionar"].to_numpy(dtype=bool)]
+    if chosen.empty:
+        return
+    single = chosen[chosen['recurrence_id'].isna()]['id'].tolist()
+    recurring = chosen[chosen['recurrence_id'].notna()]['recurrence_id'].tolist()
+    c_del, c_end = st.columns(2)
+    if c_del.button(f"🗑️ Excluir selecionados ({len(chosen)})", key=f"del_{prefix}"):
+        # Recorrentes selecionados saem só deste mês
+        if single: db.delete_entries(table, single, user_id)
+        if recurring: db.skip_recurrences(recurring, user_id, selected_month, selected_year)
+        st.rerun()
+    if recurring and c_end.button(f"⏹️ Encerrar {len(recurring)} recorrência(s) a partir deste mês", key=f"end_{prefix}"):
+        db.end_recurrences(recurring, user_id, selected_month, selected_year); st.rerun()
+
 if menu == "Mensal":
     st.subheader(f"📊 {selected_month_name} / {selected_year}")
-    in_df = db.get_incomes(user_id, selected_month, selected_year)
-    ex_df = db.get_expenses(user_id, selected_month, selected_year)
-    inv_df = db.get_investments(user_id, selected_month, selected_year)
-    
-    t_in = in_df['value'].sum() if not in_df.empty else 0.0
-    t_ex = ex_df['value'].sum() if not ex_df.empty else 0.0
-    t_inv = inv_df['amount'].sum() if not inv_df.empty else 0.0
+    pages = tuple(st.session_state.get(f"page_{p}", 1) for p in ("i", "e", "v"))
+    snap = db.get_month_snapshot(user_id, selected_month, selected_year, pages)
+    for p, page in zip(("i", "e", "v"), snap.pages): st.session_state[f"page_{p}"] = page
+    in_df, ex_df, inv_df, goals_df = snap.incomes, snap.expenses, snap.investments, snap.goals
+    t_in, t_ex, t_inv = snap.totals
     
     c1, col_bal, c3 = st.columns([1, 1.5, 1])
     with col_bal:
@@ -147,52 +187,38 @@ if menu == "Mensal":
             v = st.number_input("Valor", min_value=0.0, step=0.01); r = st.checkbox("Replicar 12 meses")
             if st.form_submit_button("Adicionar Receita"):
                 if src and v > 0:
-                    db.add_income(user_id, src, v, cat, selected_month, selected_year, 1 if r else 0)
+                    db.add_income(user_id, src, utils.to_cents(v), cat, selected_month, selected_year, 1 if r else 0)
                     st.success("Receita adicionada!"); st.rerun()
-        if not in_df.empty:
-            df_in_disp = in_df.copy()
-            df_in_disp['Valor'] = df_in_disp['value'].apply(utils.format_currency)
-            st.dataframe(df_in_disp[['source_name', 'category', 'Valor']].rename(columns={'source_name':'Fonte','category':'Cat'}), use_container_width=True)
-            for _, r in in_df.iterrows():
-                if st.button(f"🗑️ Excluir {r['source_name']}", key=f"i_{r['id']}"): db.delete_income(r['id'], user_id); st.rerun()
+        entries_table(in_df, "incomes", "i", {'source_name': 'Fonte', 'category': 'Cat'}, snap.counts[0])
 
     with t2:
         with st.form("ex_f", clear_on_submit=True):
             d = st.text_input("Descrição"); v_e = st.number_input("Valor", min_value=0.0); ct = st.selectbox("Tipo", ["Fixa", "Ocasional"]); r_e = st.checkbox("Replicar 12 meses", value=(ct=="Fixa"))
             if st.form_submit_button("Adicionar Despesa"):
                 if d and v_e > 0:
-                    db.add_expense(user_id, d, v_e, ct, selected_month, selected_year, 1 if r_e else 0)
+                    db.add_expense(user_id, d, utils.to_cents(v_e), ct, selected_month, selected_year, 1 if r_e else 0)
                     st.success("Despesa adicionada!"); st.rerun()
-        if not ex_df.empty:
-            df_ex_disp = ex_df.copy()
-            df_ex_disp['Valor'] = df_ex_disp['value'].apply(utils.format_currency)
-            st.dataframe(df_ex_disp[['description', 'category', 'Valor']].rename(columns={'description':'Desc','category':'Tipo'}), use_container_width=True)
-            for _, r in ex_df.iterrows():
-                if st.button(f"🗑️ Excluir {r['description']}", key=f"e_{r['id']}"): db.delete_expense(r['id'], user_id); st.rerun()
+        entries_table(ex_df, "expenses", "e", {'description': 'Desc', 'category': 'Tipo'}, snap.counts[1])
 
     with t3:
         with st.form("inv_f", clear_on_submit=True):
             v_i = st.number_input("Valor", min_value=0.0); c_i = st.selectbox("Cat", ["Ações", "FIIs", "Renda Fixa", "Reserva", "Outros"]); r_i = st.checkbox("Replicar 12 meses")
             # Adicionar meta vinculada (opcional)
-            goals_df = db.get_goals(user_id)
             goal_options = ["Nenhuma"] + goals_df['name'].tolist() if not goals_df.empty else ["Nenhuma"]
             selected_goal_name = st.selectbox("Vincular a uma Meta?", goal_options)
             
             if st.form_submit_button("Adicionar Investimento"):
                 if v_i > 0:
-                    db.add_investment(user_id, v_i, c_i, selected_month, selected_year, 1 if r_i else 0)
+                    goal_id = None
                     if selected_goal_name != "Nenhuma":
-                        goal_id = goals_df[goals_df['name'] == selected_goal_name]['id'].iloc[0]
-                        db.update_goal_progress(goal_id, user_id, v_i)
+                        goal_id = int(goals_df[goals_df['name'] == selected_goal_name]['id'].iloc[0])
+                    # O aporte fica vinculado à meta (e, se recorrente, todas as ocorrências da regra)
+                    db.add_investment(user_id, utils.to_cents(v_i), c_i, selected_month, selected_year, 1 if r_i else 0, goal_id=goal_id)
+                    if goal_id is not None:
                         st.balloons()
                         st.toast(f"🎯 Meta '{selected_goal_name}' atualizada!")
                     st.success("Investimento registrado!"); st.rerun()
-        if not inv_df.empty:
-            df_inv_disp = inv_df.copy()
-            df_inv_disp['Valor'] = df_inv_disp['amount'].apply(utils.format_currency)
-            st.dataframe(df_inv_disp[['category', 'Valor']].rename(columns={'category':'Cat'}), use_container_width=True)
-            for _, r in inv_df.iterrows():
-                if st.button(f"🗑️ Excluir {r['category']}", key=f"v_{r['id']}"): db.delete_investment(r['id'], user_id); st.rerun()
+        entries_table(inv_df, "investments", "v", {'category': 'Cat'}, snap.counts[2])
 
 elif menu == "🎯 Metas Financeiras":
     st.subheader("🎯 Suas Metas de Prosperidade")
@@ -205,24 +231,34 @@ elif menu == "🎯 Metas Financeiras":
             gd = st.date_input("Prazo (Opcional)", value=None)
             if st.form_submit_button("Salvar Meta"):
                 if gn and gt > 0:
-                    db.add_goal(user_id, gn, gt, gd)
+                    db.add_goal(user_id, gn, utils.to_cents(gt), gd)
                     st.success("Meta criada com sucesso!"); st.rerun()
 
-    # Listar metas existentes
-    goals_df = db.get_goals(user_id)
-    if not goals_df.empty:
-        for _, g in goals_df.iterrows():
-            progress = min(g['current_value'] / g['target_value'], 1.0)
+    # Listar metas existentes (progresso e previsão de todas calculados de uma vez)
+    forecast = analytics.forecast_goals(user_id)
+    if not forecast.empty:
+        for g in forecast.itertuples():
             col_g1, col_g2 = st.columns([3, 1])
             with col_g1:
-                st.write(f"### {g['name']}")
-                st.progress(progress)
-                st.write(f"Progresso: **{progress*100:.1f}%** ({utils.format_currency(g['current_value'])} de {utils.format_currency(g['target_value'])})")
-                if progress >= 1.0:
+                st.write(f"### {g.name}")
+                st.progress(g.progress)
+                st.write(f"Progresso: **{g.progress*100:.1f}%** ({utils.format_currency(g.current_value)} de {utils.format_currency(g.target_value)})")
+                if g.status == "Atingida":
                     st.success("🏆 Meta Atingida! Parabéns pela sua disciplina!")
+                else:
+                    if pd.isna(g.completion_period):
+                        st.write("📅 Previsão de conclusão: sem aportes suficientes no ritmo atual")
+                    else:
+                        m, y = db.from_period(int(g.completion_period))
+                        st.write(f"📅 Previsão de conclusão: **{months[m - 1]}/{y}** (aportes de {utils.format_currency(g.monthly_pace)}/mês)")
+                    if g.status == "Atrasada":
+                        st.warning(f"Para cumprir o prazo, aporte {utils.format_currency(g.needed_monthly)} por mês.")
+                    elif g.status == "Prazo vencido":
+                        st.error(f"Prazo vencido: faltam {utils.format_currency(g.needed_monthly)}.")
             with col_g2:
-                if st.button("🗑️ Excluir", key=f"dg_{g['id']}"):
-                    db.delete_goal(g['id'], user_id)
+                st.caption(g.status)
+                if st.button("🗑️ Excluir", key=f"dg_{g.id}"):
+                    db.delete_goal(int(g.id), user_id)
                     st.rerun()
             st.divider()
     else:
@@ -230,8 +266,8 @@ elif menu == "🎯 Metas Financeiras":
 
 elif menu == "Resumo Anual":
     st.subheader(f"📅 Resumo Anual - {selected_year}")
-    in_a, ex_a, inv_a = db.get_annual_summary(user_id, selected_year)
-    t_in_y = in_a['value'].sum(); t_ex_y = ex_a['value'].sum(); t_inv_y = inv_a['amount'].sum()
+    df_c = db.get_annual_summary(user_id, selected_year)
+    t_in_y, t_ex_y, t_inv_y = df_c[['income', 'expense', 'investment']].sum()
     
     c1, c2, c3, c4 = st.columns(4)
     c1.metric("Receita Total", utils.format_currency(t_in_y))
@@ -240,22 +276,197 @@ elif menu == "Resumo Anual":
     c4.metric("Total Investido", utils.format_currency(t_inv_y))
     
     st.divider()
-    m_d = []
-    for i in range(1, 13):
-        m_d.append({
-            "Mês": months[i-1], 
-            "Receita": in_a[in_a['month']==i]['value'].sum(), 
-            "Despesa": ex_a[ex_a['month']==i]['value'].sum(), 
-            "Investimento": inv_a[inv_a['month']==i]['amount'].sum()
-        })
-    df_c = pd.DataFrame(m_d)
-    df_c['Mês'] = pd.Categorical(df_c['Mês'], categories=months, ordered=True)
-    st.bar_chart(df_c.sort_values('Mês'), x="Mês", y=["Receita", "Despesa", "Investimento"])
+    df_c = df_c.rename(columns={'income': 'Receita', 'expense': 'Despesa', 'investment': 'Investimento'})
+    df_c[['Receita', 'Despesa', 'Investimento']] = utils.to_reais(df_c[['Receita', 'Despesa', 'Investimento']])
+    df_c['Mês'] = pd.Categorical.from_codes(df_c['month'] - 1, categories=months, ordered=True)
+    st.bar_chart(df_c, x="Mês", y=["Receita", "Despesa", "Investimento"])
+
+    st.divider()
+    st.markdown("#### Por categoria")
+    kinds = {"expense": "Despesas", "income": "Receitas", "investment": "Investimentos"}
+    c_k, c_r = st.columns([2, 3])
+    kind = c_k.radio("Tipo", list(kinds), format_func=kinds.get, horizontal=True)
+    # Intervalo de anos: começa no ano selecionado e pode se estender pelo histórico
+    span = analytics.history_range(user_id)
+    first_year = min(span[0] // 12, selected_year) if span else selected_year
+    last_year = max(span[1] // 12, selected_year) if span else selected_year
+    y0 = y1 = selected_year
+    if first_year < last_year:
+        y0, y1 = c_r.slider("Anos", min_value=first_year, max_value=last_year, value=(selected_year, selected_year))
+    start, end = db.to_period(1, y0), db.to_period(12, y1)
+    # Até 3 anos mês a mês; acima disso, um ponto por ano mantém o gráfico leve
+    by = "month" if y1 - y0 < 3 else "year"
+    pivot = analytics.get_category_pivot(user_id, kind, start, end, by=by, top=analytics.CATEGORY_TOP)
+    if pivot.columns.empty:
+        st.info(f"Nenhum lançamento de {kinds[kind].lower()} no período.")
+    else:
+        df_k = utils.to_reais(pivot)
+        if by == "year":
+            df_k.insert(0, 'Período', pivot.index.astype(str))
+        elif y0 == y1:
+            df_k.insert(0, 'Período', pd.Categorical.from_codes(pivot.index % 12, categories=months, ordered=True))
+        else:
+            df_k.insert(0, 'Período', [f"{p // 12}-{p % 12 + 1:02d}" for p in pivot.index])
+        st.bar_chart(df_k, x="Período", y=list(pivot.columns), stack=True)
+
+        st.markdown("##### Alocação")
+        alloc = analytics.get_category_allocation(user_id, kind, start, end)
+        c_chart, c_table = st.columns(2)
+        c_chart.bar_chart(alloc.set_index('category')['share_pct'].rename("Participação (%)"), horizontal=True, sort="-Participação (%)")
+        c_table.dataframe(pd.DataFrame({'Categoria': alloc['category'], 'Total': utils.format_currency_array(alloc['total']),
+                                        'Participação': alloc['share_pct'].map("{:.1f}%".format)}),
+                          hide_index=True, use_container_width=True)
 
 elif menu == "🔮 Projeção 12 Meses":
     st.subheader("🔮 Projeção Financeira - 12 Meses")
     df_p = db.get_future_projection(user_id, selected_month, selected_year)
     if not df_p.empty:
-        df_p['Mês Nome'] = df_p.apply(lambda x: f"{months[int(x['Mês'])-1]} / {int(x['Ano'])}", axis=1)
-        st.line_chart(df_p.set_index("Mês Nome")[["Receita", "Despesa", "Saldo"]])
-        st.table(df_p[["Mês Nome", "Receita", "Despesa", "Investimento", "Saldo"]])
+        df_p['Mês Nome'] = df_p['Mês'].map(dict(enumerate(months, start=1))) + " / " + df_p['Ano'].astype(str)
+        money = ["Receita", "Despesa", "Investimento", "Saldo"]
+        st.line_chart(utils.to_reais(df_p.set_index("Mês Nome")[["Receita", "Despesa", "Saldo"]]))
+        st.table(df_p[["Mês Nome"]].join(df_p[money].apply(utils.format_currency_array)))
+
+        # Cenários: a projeção acima só soma o que já está lançado; aqui os avulsos seguem o histórico
+        st.divider()
+        st.markdown("#### Cenários (Monte Carlo)")
+        sc = analytics.simulate_projection(user_id, db.to_period(selected_month, selected_year))
+        bands = sc.bands.set_index(df_p['Mês Nome'])
+        last = bands.iloc[-1]
+        c1, c2, c3 = st.columns(3)
+        c1.metric("Saldo acumulado pessimista (P10)", utils.format_currency(last['cumulative_p10']))
+        c2.metric("Saldo acumulado provável (P50)", utils.format_currency(last['cumulative_p50']))
+        c3.metric("Saldo acumulado otimista (P90)", utils.format_currency(last['cumulative_p90']))
+        df_b = bands[['cumulative_p10', 'cumulative_p50', 'cumulative_p90']].assign(scheduled=bands['scheduled_balance'].cumsum())
+        st.line_chart(utils.to_reais(df_b).rename(columns={'cumulative_p10': 'P10', 'cumulative_p50': 'P50',
+                                                            'cumulative_p90': 'P90', 'scheduled': 'Só o programado'}))
+        st.caption(f"{analytics.SCENARIO_PATHS} simulações. Receitas e despesas avulsas sorteadas dos últimos "
+                   f"{analytics.SCENARIO_HISTORY_MONTHS} meses do seu histórico; recorrências e lançamentos futuros entram como programados.")
+        if not sc.goals.empty:
+            st.markdown("##### Chance de cumprir as metas no prazo")
+            st.dataframe(pd.DataFrame({'Meta': sc.goals['name'], 'Prazo': sc.goals['deadline'].fillna("—"),
+                                       'Probabilidade': sc.goals['hit_probability'].map(lambda p: "—" if pd.isna(p) else f"{p:.0%}")}),
+                         hide_index=True, use_container_width=True)
+
+elif menu == "📈 Tendências":
+    st.subheader("📈 Tendências de Longo Prazo")
+    span = analytics.history_range(user_id)
+    if span is None:
+        st.info("Ainda não há lançamentos para analisar.")
+    else:
+        first_year, last_year = span[0] // 12, span[1] // 12
+        c_r, c_w = st.columns([3, 1])
+        if first_year < last_year:
+            y0, y1 = c_r.slider("Período", min_value=first_year, max_value=last_year, value=(first_year, last_year))
+        else:
+            y0 = y1 = first_year
+        window = c_w.selectbox("Média móvel (meses)", [3, 6, 12])
+        start, end = max(span[0], db.to_period(1, y0)), min(span[1], db.to_period(12, y1))
+        df_t = analytics.get_monthly_trends(user_id, start, end, window)
+        df_y = analytics.get_yearly_trends(user_id, start, end)
+
+        last = df_t.iloc[-1]
+        c1, c2, c3, c4 = st.columns(4)
+        c1.metric("Saldo Acumulado", utils.format_currency(last['running_balance']))
+        c2.metric("Total Investido", utils.format_currency(last['cumulative_invested']))
+        c3.metric(f"Saldo Médio ({window} meses)", utils.format_currency(round(last['balance_ma'])))
+        closed = df_y[df_y['year'] < current_date.year]  # o ano corrente ainda está incompleto
+        if not closed.empty and pd.notna(closed['balance_yoy_pct'].iloc[-1]):
+            c4.metric(f"Saldo {int(closed['year'].iloc[-1])} x ano anterior", f"{closed['balance_yoy_pct'].iloc[-1]:+.1f}%")
+
+        df_t['Mês'] = df_t['year'].astype(str) + "-" + df_t['month'].map("{:02d}".format)
+        st.markdown("#### Saldo e investimento acumulados")
+        st.line_chart(utils.to_reais(df_t.set_index('Mês')[['running_balance', 'cumulative_invested']])
+                      .rename(columns={'running_balance': 'Saldo Acumulado', 'cumulative_invested': 'Investido Acumulado'}))
+        st.markdown(f"#### Receitas e despesas (média móvel de {window} meses)")
+        st.line_chart(utils.to_reais(df_t.set_index('Mês')[['income_ma', 'expense_ma']])
+                      .rename(columns={'income_ma': 'Receita', 'expense_ma': 'Despesa'}))
+
+        st.markdown("#### Ano a ano")
+        money = {'income': 'Receita', 'expense': 'Despesa', 'investment': 'Investido', 'balance': 'Saldo', 'running_balance': 'Saldo Acumulado'}
+        pct = {'income_yoy_pct': 'Receita Δ%', 'expense_yoy_pct': 'Despesa Δ%', 'balance_yoy_pct': 'Saldo Δ%'}
+        table = df_y[list(money)].apply(utils.format_currency_array).rename(columns=money)
+        table = table.join(df_y[list(pct)].map(lambda v: "" if pd.isna(v) else f"{v:+.1f}%").rename(columns=pct))
+        table.insert(0, 'Ano', df_y['year'].astype(str))
+        st.dataframe(table, hide_index=True, use_container_width=True)
+
+elif menu == "📂 Importar Extrato":
+    st.subheader("📂 Importar Extrato Bancário")
+    st.write("Envie um extrato em CSV (colunas Data, Descrição e Valor) ou OFX. Valores positivos viram receitas e negativos, despesas. Lançamentos já importados são ignorados.")
+    up = st.file_uploader("Arquivo do extrato", type=["csv", "ofx"])
+    enc = st.selectbox("Codificação", ["utf-8-sig", "latin-1"])
+    if up is not None and st.button("Importar"):
+        bar = st.progress(0.0)
+        total = max(up.size, 1)
+        try:
+            res = importer.import_statement(up, user_id, encoding=enc, progress=lambda s: bar.progress(min(up.tell() / total, 1.0)))
+        except (ValueError, UnicodeDecodeError) as e:
+            st.error(f"Não foi possível importar o arquivo: {e}")
+        else:
+            bar.progress(1.0)
+            c1, c2, c3, c4 = st.columns(4)
+            c1.metric("Receitas", res['incomes']); c2.metric("Despesas", res['expenses'])
+            c3.metric("Duplicadas", res['duplicates']); c4.metric("Ignoradas", res['skipped'])
+            st.success(f"{res['rows']} linhas processadas em {res['seconds']:.1f}s.")
+
+elif menu == "💾 Backup":
+    st.subheader("💾 Backup dos Dados")
+    st.write("Baixe todas as suas receitas, despesas, investimentos, metas e recorrências num arquivo .zip. No Streamlit Cloud o banco pode ser apagado quando o servidor reinicia: guarde um backup e restaure-o aqui se precisar.")
+    formats = ["csv", "parquet"] if exporter.parquet_available() else ["csv"]
+    fmt = st.radio("Formato", formats, horizontal=True, format_func=str.upper)
+    # O arquivo só é gerado quando o botão é clicado (em lotes, num arquivo temporário)
+    st.download_button("⬇️ Baixar backup", partial(exporter.export_to_bytes, user_id, fmt),
+                       f"backup_{username}_{datetime.now():%Y%m%d}.zip", "application/zip")
+
+    st.divider()
+    st.markdown("#### Restaurar")
+    up = st.file_uploader("Arquivo de backup (.zip)", type=["zip"])
+    replace = st.checkbox("Substituir os dados atuais", help="Sem esta opção, só é possível restaurar numa conta vazia.")
+    if up is not None and st.button("Restaurar"):
+        try:
+            res = exporter.restore_user(up, user_id, replace=replace)
+        except (ValueError, KeyError, zipfile.BadZipFile) as e:
+            st.error(f"Não foi possível restaurar o backup: {e}")
+        else:
+            st.success(f"Backup restaurado em {res['seconds']:.1f}s: {res['incomes']} receitas, "
+                       f"{res['expenses']} despesas, {res['investments']} investimentos, {res['goals']} metas.")
+
+elif menu == "🩺 Diagnóstico" and db.is_admin(username):
+    st.subheader("🩺 Diagnóstico do Banco")
+    enabled = st.toggle("Instrumentação ativa", value=instrumentation.ENABLED)
+    if enabled != instrumentation.ENABLED:
+        db.set_instrumentation(enabled); st.rerun()
+    if st.button("Zerar métricas"): instrumentation.reset(); st.rerun()
+
+    data = instrumentation.export_json()
+    cache = db.cache_stats()
+    c1, c2, c3 = st.columns(3)
+    c1.metric("Cache: acertos", cache['hits']); c2.metric("Cache: faltas", cache['misses']); c3.metric("Entradas no cache", cache['size'])
+    engine = db.analytical_engine()
+    if engine is None:
+        st.caption("Relatórios analíticos: SQLite (instale o pacote duckdb para usar o motor colunar)")
+    else:
+        snap = engine.snapshot_stats()
+        st.caption(f"Relatórios analíticos: DuckDB · {snap['users']} usuários carregados · {snap['loads']} cargas ({snap['rows']} linhas, {snap['load_seconds']:.1f}s)")
+    for w in db.write_queue_stats().values():
+        st.caption(f"Fila de escrita: {w['operations']} escritas em {w['batches']} commits (maior lote: {w['largest_batch']}) · {w['errors']} erros")
+
+    cols = ["calls", "errors", "rows", "mean_ms", "p50_le_ms", "p99_le_ms", "total_s"]
+    st.markdown("#### Funções")
+    if data['functions']:
+        df_f = pd.DataFrame.from_dict(data['functions'], orient='index')[cols].sort_values("total_s", ascending=False)
+        st.dataframe(df_f, use_container_width=True)
+    else:
+        st.info("Nenhuma chamada registrada. Ative a instrumentação e navegue pelo app.")
+    st.markdown("#### Comandos SQL")
+    if data['statements']:
+        df_s = pd.DataFrame.from_dict(data['statements'], orient='index')[cols + ["vm_steps"]].sort_values("total_s", ascending=False)
+        st.dataframe(df_s, use_container_width=True)
+    st.markdown(f"#### Consultas lentas (≥ {data['slow_query_ms']:.0f} ms)")
+    for q in reversed(data['slow_queries']):
+        with st.expander(f"{q['at']} · {q['ms']:.1f} ms · {q['rows']} linhas"):
+            st.code(q['sql'], language="sql")
+            st.text("Plano:\n" + "\n".join(q['plan']))
+
+    d1, d2 = st.columns(2)
+    d1.download_button("Baixar JSON", json.dumps(data, indent=2, default=str), "metricas.json", "application/json")
+    d2.download_button("Baixar Prometheus", instrumentation.export_prometheus(), "metricas.prom", "text/plain")
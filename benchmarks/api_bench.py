@@ -0,0 +1,114 @@
+"""Latência e vazão da API JSON (api.py): respostas completas (200) x revalidação com If-None-Match (304).
+
+Uso: python -m benchmarks.api_bench --clients 16 --requests 200 --years 5 --output api.json
+
+Sobe o servidor do api.py numa porta livre do próprio processo, loga um usuário por cliente e, em cada
+thread cliente, percorre as rotas GET. Modo "full": sem If-None-Match (toda resposta é montada e
+serializada). Modo "conditional": o cliente guarda o ETag de cada URL e o reenvia; a cada --write-every
+pedidos a própria sessão grava uma despesa, o que muda o ETag e força um 200 na rodada seguinte.
+"""
+import sys
+import json
+import time
+import argparse
+import threading
+import urllib.request
+import urllib.error
+from collections import defaultdict
+from benchmarks.common import percentiles, prepare_environment, run_metadata
+
+MODES = ("full", "conditional")
+
+def _request(base, path, token=None, etag=None, body=None):
+    request = urllib.request.Request(base + path, data=None if body is None else json.dumps(body).encode())
+    if token:
+        request.add_header("Authorization", f"Bearer {token}")
+    if etag:
+        request.add_header("If-None-Match", etag)
+    try:
+        with urllib.request.urlopen(request, timeout=60) as response:
+            return response.status, response.headers.get("ETag"), response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers.get("ETag"), e.read()
+
+def _client(db, base, user, paths, mode, args, samples, failures):
+    status, _, body = _request(base, "/api/login", body={"user": user["username"], "password": user["password"]})
+    if status != 200:
+        failures["login"] += 1
+        return
+    token = json.loads(body)["token"]
+    etags = {}
+    for k in range(args.requests):
+        path = paths[k % len(paths)]
+        if mode == "conditional" and args.write_every and k % args.write_every == args.write_every - 1:
+            db.add_expense(user["id"], "Café", 800, "Alimentação", 1, user["year"])
+        started = time.perf_counter()
+        status, etag, _ = _request(base, path, token, etags.get(path) if mode == "conditional" else None)
+        samples[status].append(time.perf_counter() - started)
+        if status not in (200, 304):
+            failures["http"] += 1
+        elif etag:
+            etags[path] = etag
+
+def _run(db, base, users, mode, args):
+    year = users[0]["year"]
+    paths = [f"/api/month?month=1&year={year}", f"/api/annual?year={year}",
+             f"/api/projection?month=1&year={year}&months=12", "/api/goals"]
+    samples, failures = defaultdict(list), {"login": 0, "http": 0}
+    threads = [threading.Thread(target=_client, args=(db, base, user, paths, mode, args, samples, failures))
+               for user in users]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    total = sum(len(v) for v in samples.values())
+    return {"seconds": elapsed, "requests_per_second": total / elapsed, **failures,
+            "status": {str(code): percentiles(values) for code, values in sorted(samples.items())}}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=16, help="clientes simultâneos (um usuário cada)")
+    parser.add_argument("--requests", type=int, default=200, help="pedidos por cliente")
+    parser.add_argument("--workers", type=int, help="threads do servidor (padrão: api.WORKERS)")
+    parser.add_argument("--years", type=int, default=5, help="anos de histórico de cada usuário")
+    parser.add_argument("--write-every", type=int, default=20, help="no modo conditional, uma escrita a cada N pedidos (0 = nunca)")
+    parser.add_argument("--rounds", type=int, default=4, help="custo do bcrypt das senhas")
+    parser.add_argument("--cache", action="store_true", help="liga o cache de leituras")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--output", help="grava o relatório JSON neste arquivo")
+    args = parser.parse_args(argv)
+
+    prepare_environment(cache=args.cache, bcrypt_rounds=args.rounds)
+    import database as db
+    import api
+    from benchmarks import datagen
+    dataset = datagen.generate(users=args.clients, years=args.years, bcrypt_rounds=args.rounds)
+    users = [{"id": user_id, "username": f"user{user_id}", "password": datagen.PASSWORD, "year": dataset["last_year"]}
+             for user_id in range(dataset["user_ids"][0], dataset["user_ids"][1] + 1)]
+
+    server = api.make_server("127.0.0.1", 0, args.workers or api.WORKERS)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    results = {}
+    try:
+        for mode in args.modes:
+            results[mode] = r = _run(db, base, users, mode, args)
+            codes = "   ".join(f"{code}: {p['n']} p50 {p['p50_ms']:.1f} ms p99 {p['p99_ms']:.1f} ms"
+                               for code, p in r["status"].items())
+            print(f"{mode:<12} {r['requests_per_second']:7.0f} pedidos/s   {codes}   falhas {r['http'] + r['login']}",
+                  file=sys.stderr)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    report = {"meta": run_metadata(), "config": vars(args), "modes": results, "cache": db.cache_stats()}
+    db.close_all_connections()
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    return report
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+import os
+import sys
+import time
+import sqlite3
+import platform
+import statistics
+import subprocess
+import tempfile
+
+def percentiles(samples):
+    ordered = sorted(samples)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+    return {"n": len(ordered), "p50_ms": pick(0.50), "p90_ms": pick(0.90), "p99_ms": pick(0.99),
+            "mean_ms": statistics.fmean(ordered) * 1000}
+
+def prepare_environment(db_path=None, cache=False, bcrypt_rounds=None, hash_workers=None):
+    """Define as variáveis lidas por database.py na importação; chame antes de importar database."""
+    if db_path is None:
+        db_path = os.path.join(tempfile.mkdtemp(prefix="finance_bench_"), "bench.db")
+    os.environ["FINANCE_DB"] = db_path
+    os.environ["FINANCE_CACHE"] = "1" if cache else "0"
+    if bcrypt_rounds is not None:
+        os.environ["FINANCE_BCRYPT_ROUNDS"] = str(bcrypt_rounds)
+    if hash_workers is not None:
+        os.environ["FINANCE_HASH_WORKERS"] = str(hash_workers)
+    return db_path
+
+def run_metadata():
+    # Identifica a execução para comparar resultados entre commits
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=root, capture_output=True,
+                                text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {"commit": commit, "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": sys.version.split()[0],
+            "sqlite": sqlite3.sqlite_version, "platform": platform.platform(), "cpus": os.cpu_count()}
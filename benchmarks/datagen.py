@@ -0,0 +1,104 @@
+"""Gerador determinístico de dados sintéticos para finance_control.db.
+
+Uso: python -m benchmarks.datagen bench.db --users 100 --years 5 --seed 42
+
+A mesma semente produz sempre os mesmos lançamentos (só os hashes bcrypt, que têm salt, variam).
+Todos os usuários se chamam userN / userN@example.com e usam a senha PASSWORD.
+"""
+import os
+import sys
+import json
+import argparse
+import numpy as np
+
+PASSWORD = "senha123"
+INCOME_SOURCES = np.array(["Salário", "Freelance", "Dividendos", "Outros"])
+EXPENSE_DESCRIPTIONS = np.array(["Mercado", "Restaurante", "Combustível", "Farmácia", "Cinema", "Roupas",
+                                 "Uber", "Presentes", "Manutenção", "Viagem"])
+INVESTMENT_CATEGORIES = np.array(["Ações", "FIIs", "Renda Fixa", "Reserva", "Outros"])
+
+def _cents(reais):
+    return int(round(float(reais) * 100))
+
+def _user_rows(rng, user_id, first_year, years):
+    incomes, expenses, investments = [], [], []
+    for year in range(first_year, first_year + years):
+        for month in range(1, 13):
+            salary = _cents(rng.normal(6000, 300))
+            incomes.append((user_id, "Salário", salary, "Salário", 0, month, year))
+            for _ in range(rng.poisson(0.6)):
+                source = str(rng.choice(INCOME_SOURCES[1:]))
+                incomes.append((user_id, source, _cents(rng.lognormal(6.5, 0.6)), source, 0, month, year))
+            n = rng.poisson(12)
+            values = np.rint(rng.lognormal(4.0, 0.9, n) * 100).astype(np.int64)
+            names = rng.choice(EXPENSE_DESCRIPTIONS, n)
+            for name, value in zip(names.tolist(), values.tolist()):
+                expenses.append((user_id, name, value, "Ocasional", 0, month, year))
+            for _ in range(rng.poisson(1.5)):
+                category = str(rng.choice(INVESTMENT_CATEGORIES))
+                investments.append((user_id, _cents(rng.lognormal(6.0, 0.7)), category, 0, month, year))
+    return incomes, expenses, investments
+
+def generate(users=10, years=3, seed=42, first_year=2022, bcrypt_rounds=None):
+    """Popula o banco configurado em database.DB_NAME e devolve a contagem de linhas geradas."""
+    import database as db
+    db.init_db()
+    rng = np.random.default_rng(seed)
+    # Um único hash para todos: gerar milhares de hashes bcrypt dominaria o tempo de geração
+    password_hash = db.hash_password(PASSWORD, bcrypt_rounds)
+    start, end = db.to_period(1, first_year), db.to_period(12, first_year + years - 1)
+    counts = {"users": 0, "incomes": 0, "expenses": 0, "investments": 0, "recurrences": 0, "goals": 0}
+    with db.connection() as conn:
+        first_id = conn.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM users").fetchone()[0]
+    for user_id in range(first_id, first_id + users):
+        incomes, expenses, investments = _user_rows(rng, user_id, first_year, years)
+        recurrences = [
+            (user_id, "expense", "Aluguel", _cents(rng.uniform(900, 3000)), "Fixa", start, None, 1),
+            (user_id, "expense", "Internet", 11990, "Fixa", start, None, 1),
+            (user_id, "expense", "Academia", 9990, "Fixa", start + int(rng.integers(0, 12)), end, 1),
+            (user_id, "expense", "IPVA", _cents(rng.uniform(800, 2500)), "Fixa", start, None, 12),
+            (user_id, "investment", None, 50000, "Renda Fixa", start, None, 1),
+        ]
+        goals = [
+            (user_id, "Reserva de Emergência", 3000000, f"{first_year + years}-12-31"),
+            (user_id, "Viagem", 1200000, f"{first_year + years - 1}-07-01"),
+            (user_id, "Carro", 6000000, None),
+        ]
+        with db.connection() as conn:
+            conn.execute("INSERT INTO users (id, username, email, password) VALUES (?, ?, ?, ?)",
+                         (user_id, f"user{user_id}", f"user{user_id}@example.com", password_hash))
+        # Com FINANCE_SHARDS, os lançamentos vão para o shard do usuário (users fica no diretório)
+        with db.connection(user_id=user_id) as conn:
+            conn.executemany("INSERT INTO incomes (user_id, source_name, value, category, is_recurring, month, year) VALUES (?, ?, ?, ?, ?, ?, ?)", incomes)
+            conn.executemany("INSERT INTO expenses (user_id, description, value, category, is_recurring, month, year) VALUES (?, ?, ?, ?, ?, ?, ?)", expenses)
+            conn.executemany("INSERT INTO investments (user_id, amount, category, is_recurring, month, year) VALUES (?, ?, ?, ?, ?, ?)", investments)
+            conn.executemany("""INSERT INTO recurrences (user_id, kind, description, value, category, start_period, end_period, interval_months)
+                                VALUES (?, ?, ?, ?, ?, ?, ?, ?)""", recurrences)
+            conn.executemany("INSERT INTO goals (user_id, name, target_value, deadline) VALUES (?, ?, ?, ?)", goals)
+            # Aportes vinculados: a regra de Renda Fixa alimenta a reserva; os avulsos de "Reserva", a viagem
+            reserve, trip = [row[0] for row in conn.execute("SELECT id FROM goals WHERE user_id = ? ORDER BY id LIMIT 2", (user_id,))]
+            conn.execute("UPDATE recurrences SET goal_id = ? WHERE user_id = ? AND kind = 'investment'", (reserve, user_id))
+            conn.execute("UPDATE investments SET goal_id = ? WHERE user_id = ? AND category = 'Reserva'", (trip, user_id))
+        db.bump_data_version(user_id)
+        counts["users"] += 1
+        counts["incomes"] += len(incomes)
+        counts["expenses"] += len(expenses)
+        counts["investments"] += len(investments)
+        counts["recurrences"] += len(recurrences)
+        counts["goals"] += len(goals)
+    counts["user_ids"] = [first_id, first_id + users - 1]
+    counts["first_year"], counts["last_year"] = first_year, first_year + years - 1
+    return counts
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera dados sintéticos para benchmarks")
+    parser.add_argument("path", help="arquivo SQLite a popular (criado se não existir)")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--first-year", type=int, default=2022)
+    parser.add_argument("--bcrypt-rounds", type=int, default=None)
+    args = parser.parse_args()
+    os.environ["FINANCE_DB"] = args.path
+    json.dump(generate(args.users, args.years, args.seed, args.first_year, args.bcrypt_rounds), sys.stdout, indent=2)
+    print()
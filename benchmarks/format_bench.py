@@ -0,0 +1,57 @@
+"""Formatação de moeda: Series.apply(format_currency) x format_currency_array, de 10 mil a 1 milhão de valores.
+
+Uso: python -m benchmarks.format_bench --sizes 10000,100000,1000000 --output formato.json
+
+"distinct" usa valores quase todos diferentes (pior caso); "repeated" usa poucos valores que se repetem,
+como lançamentos reais (aluguel, assinaturas, salário).
+"""
+import sys
+import json
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from benchmarks.common import run_metadata
+
+def _best(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - started)
+    return min(times) * 1000
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="grava o relatório JSON neste arquivo")
+    args = parser.parse_args(argv)
+
+    import utils
+    rng = np.random.default_rng(42)
+    report = {"meta": run_metadata(), "config": vars(args), "results": []}
+    for size in map(int, args.sizes.split(",")):
+        data = {
+            "distinct": pd.Series(rng.integers(-10**9, 10**9, size)),
+            "repeated": pd.Series(rng.integers(0, 500, size) * 100),
+        }
+        for name, values in data.items():
+            if not (utils.format_currency_array(values) == values.apply(utils.format_currency)).all():
+                raise AssertionError(f"resultados diferentes ({name}, {size})")
+            # O cache do formatador escalar favoreceria o apply nas repetições seguintes
+            utils._format_cents.cache_clear()
+            row = {"size": size, "data": name,
+                   "apply_ms": _best(lambda: (utils._format_cents.cache_clear(), values.apply(utils.format_currency)), args.repeat),
+                   "vectorized_ms": _best(lambda: utils.format_currency_array(values), args.repeat)}
+            row["speedup"] = row["apply_ms"] / row["vectorized_ms"]
+            report["results"].append(row)
+            print(f"{size:>9} {name:9} apply {row['apply_ms']:9.1f} ms   vetorizado {row['vectorized_ms']:8.1f} ms"
+                  f"   {row['speedup']:5.1f}x", file=sys.stderr)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    return report
+
+if __name__ == "__main__":
+    main()
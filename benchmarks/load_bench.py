@@ -0,0 +1,242 @@
+"""Carga de várias sessões logadas no app.py ao mesmo tempo: latência dos reruns por página, fração do tempo
+gasta no banco e taxa de erros.
+
+Uso: python -m benchmarks.load_bench --sessions 1 4 8 16 --iterations 5 --output carga.json
+
+Cada sessão é um AppTest numa thread própria (como o servidor do Streamlit, que roda o script de cada
+sessão numa thread do mesmo processo), todas sobre o mesmo arquivo de banco. O roteiro de cada sessão:
+login e, a cada iteração, troca de mês na barra lateral, nova despesa recorrente, "Resumo Anual",
+"🔮 Projeção 12 Meses" e volta para "Mensal". Cada nível de --sessions roda com sessões novas; a
+vazão (reruns/s) e o p99 por nível mostram onde a instância satura.
+
+"wall" é o rerun visto pela sessão (inclui a fila pela GIL e pelo banco); "script" é só a execução
+do app.py; "banco" é a fração do script gasta dentro das funções de database.py (no login, inclui o
+bcrypt; nas escritas, a espera pelo commit da fila de escrita).
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import functools
+import threading
+from collections import defaultdict
+from benchmarks.common import percentiles, prepare_environment, run_metadata
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+MONTHS = ["Janeiro", "Fevereiro", "Março", "Abril", "Maio", "Junho", "Julho", "Agosto", "Setembro", "Outubro",
+          "Novembro", "Dezembro"]
+
+_runs = {}  # id do SessionState da sessão -> (tempo do script, tempo no banco) do rerun em curso
+_db_time = threading.local()
+
+def _share_test_runtime():
+    # O AppTest instala um Runtime simulado global no início de cada run e o remove no fim; com sessões
+    # em paralelo, o fim de uma derrubaria as outras. Aqui o último Runtime instalado vale para todas.
+    from streamlit import config
+    from streamlit.runtime import Runtime
+    config.set_option("global.appTest", True)
+    shared = []
+
+    def instance(cls):
+        if cls._instance is not None:
+            shared[:] = [cls._instance]
+        if not shared:
+            raise RuntimeError("Runtime hasn't been created!")
+        return shared[0]
+    Runtime.instance = classmethod(instance)
+    Runtime.exists = classmethod(lambda cls: cls._instance is not None or bool(shared))
+
+def _share_script_cache():
+    # Cada run do AppTest cria um ScriptCache novo e recompila o app.py; o servidor compila uma vez só.
+    # Compilar em várias threads ao mesmo tempo ainda esbarra num bug do ast do CPython 3.11.
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    original = ScriptCache.get_bytecode
+    compiled = {}
+    lock = threading.Lock()
+
+    def get_bytecode(self, script_path):
+        with lock:
+            if script_path not in compiled:
+                compiled[script_path] = original(self, script_path)
+            return compiled[script_path]
+    ScriptCache.get_bytecode = get_bytecode
+
+def _time_database(db):
+    # Soma, na thread do script, o tempo dentro das funções públicas de database.py (só a chamada externa)
+    def timed(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if getattr(_db_time, "depth", 0):
+                return func(*args, **kwargs)
+            _db_time.depth = 1
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                _db_time.depth = 0
+                _db_time.seconds = getattr(_db_time, "seconds", 0.0) + time.perf_counter() - started
+        return wrapper
+    for name, value in list(vars(db).items()):
+        if getattr(value, "__wrapped_for_instrumentation__", False):
+            setattr(db, name, timed(value))
+
+def _time_script_execution():
+    from streamlit.runtime.scriptrunner import script_runner
+    original = script_runner.exec_func_with_error_handling
+
+    def timed(func, ctx):
+        _db_time.seconds = 0.0
+        started = time.perf_counter()
+        try:
+            return original(func, ctx)
+        finally:
+            # Um st.rerun() executa o script de novo dentro do mesmo at.run(): os tempos se somam
+            key = id(ctx.session_state._state)
+            script, db_seconds = _runs.get(key, (0.0, 0.0))
+            _runs[key] = (script + time.perf_counter() - started, db_seconds + _db_time.seconds)
+    script_runner.exec_func_with_error_handling = timed
+
+class Session:
+    def __init__(self, username, password, samples):
+        from streamlit.testing.v1 import AppTest
+        self.at = AppTest.from_file(APP, default_timeout=120)
+        self.username, self.password = username, password
+        self.samples = samples  # página -> lista de (wall, script, db, erro?)
+
+    def _run(self, page):
+        at = self.at
+        started = time.perf_counter()
+        try:
+            at.run()
+            failed = bool(at.exception)
+        except Exception:  # timeout do AppTest, erro interno do runner
+            failed = True
+        wall = time.perf_counter() - started
+        script, db_seconds = _runs.pop(id(at._session_state._state), (0.0, 0.0))
+        self.samples[page].append((wall, script, db_seconds, failed))
+        return not failed
+
+    def _form(self, kind, form_id):
+        return [w for w in self.at.get(kind) if w.proto.form_id == form_id]
+
+    def login(self):
+        self._run("login (tela)")
+        self.at.text_input[0].input(self.username)
+        self.at.text_input[1].input(self.password)
+        self.at.button[0].click()
+        return self._run("login (entrar)") and self.at.session_state["logged_in"]
+
+    def iteration(self, rng, think):
+        at = self.at
+        steps = [
+            ("Mensal (troca de mês)", lambda: at.sidebar.selectbox[0].set_value(rng.choice(MONTHS))),
+            ("Mensal (nova despesa recorrente)", self._fill_expense),
+            ("Resumo Anual", lambda: at.sidebar.radio[0].set_value("Resumo Anual")),
+            ("🔮 Projeção 12 Meses", lambda: at.sidebar.radio[0].set_value("🔮 Projeção 12 Meses")),
+            ("Mensal", lambda: at.sidebar.radio[0].set_value("Mensal")),
+        ]
+        for page, action in steps:
+            try:
+                action()
+            except (IndexError, KeyError, ValueError):  # a tela anterior falhou e o widget não existe
+                self.samples[page].append((0.0, 0.0, 0.0, True))
+                continue
+            self._run(page)
+            if think:
+                time.sleep(rng.uniform(0, 2 * think))
+
+    def _fill_expense(self):
+        self._form("text_input", "ex_f")[0].input("Assinatura")
+        self._form("number_input", "ex_f")[0].set_value(39.9)
+        self._form("checkbox", "ex_f")[0].check()
+        self._form("button", "ex_f")[0].click()
+
+def _level(sessions, dataset, args):
+    samples = defaultdict(list)
+    lock = threading.Lock()
+    login_failures = []
+
+    def drive(n):
+        rng = random.Random(n)
+        local = defaultdict(list)
+        user_id = dataset["user_ids"][0] + n
+        session = Session(f"user{user_id}", dataset["password"], local)
+        if not session.login():
+            login_failures.append(n)
+        else:
+            session.at.sidebar.number_input[0].set_value(dataset["last_year"])
+            for _ in range(args.iterations):
+                session.iteration(rng, args.think_ms / 1000)
+        with lock:
+            for page, values in local.items():
+                samples[page].extend(values)
+
+    threads = [threading.Thread(target=drive, args=(n,)) for n in range(sessions)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    pages = {}
+    for page, values in samples.items():
+        ok = [v for v in values if not v[3]]
+        script_total = sum(v[1] for v in ok)
+        pages[page] = {"reruns": len(values), "errors": len(values) - len(ok), "error_rate": 1 - len(ok) / len(values),
+                       "wall": percentiles([v[0] for v in ok]) if ok else None,
+                       "script": percentiles([v[1] for v in ok]) if ok else None,
+                       "db_share": sum(v[2] for v in ok) / script_total if script_total else None}
+    reruns = sum(p["reruns"] - p["errors"] for p in pages.values())
+    errors = sum(p["errors"] for p in pages.values())
+    return {"sessions": sessions, "seconds": elapsed, "reruns_per_second": reruns / elapsed,
+            "error_rate": errors / (reruns + errors) if reruns + errors else 0.0,
+            "login_failures": len(login_failures), "pages": pages}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 4, 8, 16], help="sessões simultâneas (um nível por valor)")
+    parser.add_argument("--iterations", type=int, default=5, help="repetições do roteiro por sessão")
+    parser.add_argument("--years", type=int, default=3, help="anos de histórico de cada usuário")
+    parser.add_argument("--think-ms", type=float, default=0, help="pausa média entre ações (0 = carga máxima)")
+    parser.add_argument("--rounds", type=int, default=12, help="custo do bcrypt das senhas")
+    parser.add_argument("--cache", action="store_true", help="liga o cache de leituras")
+    parser.add_argument("--db", help="arquivo de banco (padrão: temporário)")
+    parser.add_argument("--output", help="grava o relatório JSON neste arquivo")
+    args = parser.parse_args(argv)
+
+    prepare_environment(args.db, cache=args.cache, bcrypt_rounds=args.rounds)
+    import database as db
+    from benchmarks import datagen
+    _share_test_runtime()
+    _share_script_cache()
+    _time_script_execution()
+    dataset = datagen.generate(users=max(args.sessions), years=args.years, bcrypt_rounds=args.rounds)
+    dataset["password"] = datagen.PASSWORD
+    _time_database(db)
+
+    levels = []
+    for sessions in args.sessions:
+        level = _level(sessions, dataset, args)
+        levels.append(level)
+        print(f"{sessions:>3} sessões  {level['reruns_per_second']:6.1f} reruns/s  erros {level['error_rate']:.1%}", file=sys.stderr)
+        for page, p in level["pages"].items():
+            if p["wall"] is None:
+                print(f"      {page:<34} todas as {p['reruns']} execuções falharam", file=sys.stderr)
+                continue
+            print(f"      {page:<34} wall p50 {p['wall']['p50_ms']:7.1f} ms  p99 {p['wall']['p99_ms']:7.1f} ms   "
+                  f"script p50 {p['script']['p50_ms']:6.1f} ms   banco {p['db_share']:.0%}   erros {p['error_rate']:.1%}",
+                  file=sys.stderr)
+
+    report = {"meta": run_metadata(), "config": vars(args), "levels": levels,
+              "write_queue": db.write_queue_stats(), "cache": db.cache_stats()}
+    db.close_all_connections()
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    return report
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Latência de login (p50/p99) sob uma rajada de tentativas concorrentes.
+
+Uso: python -m benchmarks.login_bench --sessions 32 --attempts 4 --rounds 12 --workers 2
+
+Enquanto os logins rodam, uma sessão "leitora" faz consultas simples; a latência dela mostra
+se a rajada de hashes bcrypt está travando as demais sessões do servidor.
+"""
+import sys
+import json
+import time
+import argparse
+import threading
+from benchmarks.common import percentiles, prepare_environment
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--sessions", type=int, default=32, help="threads tentando logar ao mesmo tempo")
+    parser.add_argument("--attempts", type=int, default=4, help="logins por sessão")
+    parser.add_argument("--rounds", type=int, default=12, help="custo do bcrypt")
+    parser.add_argument("--workers", type=int, default=2, help="tamanho do pool de hashing")
+    args = parser.parse_args(argv)
+
+    prepare_environment(bcrypt_rounds=args.rounds, hash_workers=args.workers)
+    import database as db
+
+    db.init_db()
+    for i in range(args.users):
+        db.create_user(f"user{i}", f"user{i}@example.com", f"senha{i}")
+        db.add_expense(i + 1, "Aluguel", 150000, "Fixa", 1, 2026)
+
+    logins, reads, failures = [], [], []
+    done = threading.Event()
+
+    def session(n):
+        for k in range(args.attempts):
+            i = (n + k) % args.users
+            # Metade das tentativas com senha errada, como acontece na prática
+            password = f"senha{i}" if k % 2 == 0 else "errada"
+            started = time.perf_counter()
+            user = db.login_user(f"user{i}", password)
+            logins.append(time.perf_counter() - started)
+            if (user is not None) != (password != "errada"):
+                failures.append(i)
+
+    def reader():
+        while not done.is_set():
+            started = time.perf_counter()
+            db.get_month_totals(1, 1, 2026)
+            reads.append(time.perf_counter() - started)
+            time.sleep(0.005)
+
+    probe = threading.Thread(target=reader)
+    probe.start()
+    threads = [threading.Thread(target=session, args=(n,)) for n in range(args.sessions)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    done.set()
+    probe.join()
+
+    report = {
+        "config": vars(args),
+        "seconds": elapsed,
+        "logins_per_second": len(logins) / elapsed,
+        "login": percentiles(logins),
+        "concurrent_read": percentiles(reads),
+        "wrong_results": len(failures),
+    }
+    json.dump(report, sys.stdout, indent=2)
+    print()
+    db.close_all_connections()
+    return report
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Dinheiro em REAL (reais) x INTEGER (centavos): tempo de agregação, tamanho em disco e erro acumulado.
+
+Uso: python -m benchmarks.money_bench --rows 1000000 --repeat 5
+
+Duas tabelas com os mesmos lançamentos, uma em cada representação, com o índice coberto usado pelo app.
+"""
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import tempfile
+import numpy as np
+import pandas as pd
+from benchmarks.common import run_metadata
+
+def _build(path, column_type, users, years, cents):
+    conn = sqlite3.connect(path)
+    conn.execute(f"""CREATE TABLE entries (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, year INTEGER NOT NULL,
+                     month INTEGER NOT NULL, value {column_type} NOT NULL)""")
+    values = cents.tolist() if column_type == "INTEGER" else (cents / 100).tolist()
+    n = len(cents)
+    rng = np.random.default_rng(7)
+    rows = zip(rng.integers(1, users + 1, n).tolist(), rng.integers(2000, 2000 + years, n).tolist(),
+               rng.integers(1, 13, n).tolist(), values)
+    conn.executemany("INSERT INTO entries (user_id, year, month, value) VALUES (?, ?, ?, ?)", rows)
+    conn.execute("CREATE INDEX idx_entries_user_period ON entries (user_id, year, month, value)")
+    conn.commit()
+    conn.execute("VACUUM")
+    return conn
+
+def _best(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - started)
+    return min(times) * 1000, result
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="grava o relatório JSON neste arquivo")
+    args = parser.parse_args(argv)
+
+    # Valores com centavos "difíceis" (0,10, 0,20...), onde o binário de ponto flutuante não é exato
+    cents = np.random.default_rng(42).integers(1, 500_000, args.rows) // 10 * 10 + 10
+    exact = int(cents.sum())
+    workdir = tempfile.mkdtemp(prefix="finance_money_")
+    report = {"meta": run_metadata(), "config": vars(args), "exact_total_cents": exact, "variants": {}}
+    for column_type in ("REAL", "INTEGER"):
+        path = os.path.join(workdir, f"{column_type.lower()}.db")
+        conn = _build(path, column_type, args.users, args.years, cents)
+        queries = {
+            "sum_all": "SELECT SUM(value) FROM entries",
+            "group_user_month": "SELECT user_id, year, month, SUM(value) FROM entries GROUP BY user_id, year, month",
+            "one_user_year": "SELECT month, SUM(value) FROM entries WHERE user_id = 1 AND year = 2005 GROUP BY month",
+        }
+        variant = {"file_mb": os.path.getsize(path) / 2**20}
+        for name, sql in queries.items():
+            variant[f"{name}_ms"], _ = _best(lambda: conn.execute(sql).fetchall(), args.repeat)
+        frame = pd.read_sql_query("SELECT user_id, year, month, value FROM entries", conn)
+        variant["pandas_dtype"] = str(frame["value"].dtype)
+        variant["pandas_groupby_ms"], _ = _best(lambda: frame.groupby(["user_id", "year", "month"])["value"].sum(), args.repeat)
+        variant["numpy_sum_ms"], _ = _best(lambda: frame["value"].to_numpy().sum(), args.repeat)
+        # Erro acumulado: soma corrida em ordem de inserção, como um saldo somado mês a mês
+        total = conn.execute("SELECT SUM(value) FROM entries").fetchone()[0]
+        running = 0
+        for (value,) in conn.execute("SELECT value FROM entries ORDER BY id"):
+            running += value
+        scale = 1 if column_type == "INTEGER" else 100
+        variant["sql_sum_error_cents"] = abs(total * scale - exact)
+        variant["running_sum_error_cents"] = abs(running * scale - exact)
+        conn.close()
+        report["variants"][column_type] = variant
+
+    real, integer = report["variants"]["REAL"], report["variants"]["INTEGER"]
+    for key in real:
+        if key.endswith("_ms") or key == "file_mb" or key.endswith("_cents"):
+            print(f"{key:26} REAL {real[key]:12.4f}   INTEGER {integer[key]:12.4f}", file=sys.stderr)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    return report
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Relatórios pesados no SQLite x na cópia colunar em DuckDB (olap.py), num histórico sintético grande.
+
+Uso: python -m benchmarks.olap_bench --rows 1000000 --users 4 --years 20 --output olap.json
+
+"cold" inclui a carga da cópia do usuário (primeiro relatório depois de uma escrita); "warm" é o
+relatório com a cópia já carregada. breakeven = quantos relatórios pagam a carga.
+"""
+import sys
+import json
+import time
+import argparse
+import numpy as np
+from benchmarks.common import prepare_environment, run_metadata
+
+CATEGORIES = {
+    "incomes": ["Salário", "Freelance", "Dividendos", "Aluguel", "Outros"],
+    "expenses": ["Fixa", "Alimentação", "Transporte", "Lazer", "Saúde", "Educação", "Moradia", "Ocasional"],
+    "investments": ["CDB", "Tesouro", "Ações", "FII"],
+}
+
+def _populate(db, rows, users, years, first_year=2006, seed=11):
+    rng = np.random.default_rng(seed)
+    shares = {"incomes": 0.2, "expenses": 0.7, "investments": 0.1}
+    with db.connection() as conn:
+        user_ids = [conn.execute("INSERT INTO users (username, email, password) VALUES (?, ?, 'x')",
+                                 (f"olap{i}", f"olap{i}@bench")).lastrowid for i in range(users)]
+    by_user = {user_id: {} for user_id in user_ids}
+    for table, share in shares.items():
+        n = int(rows * share)
+        value_col, _ = db.ROLLUP_SOURCES[table]
+        name = {"incomes": "source_name, ", "expenses": "description, "}.get(table, "")
+        labels = np.array(CATEGORIES[table], dtype=object)
+        columns = [np.array(user_ids)[rng.integers(0, users, n)].tolist(),
+                   rng.integers(1_000, 500_000, n).tolist(),
+                   labels[rng.integers(0, len(labels), n)].tolist(),
+                   rng.integers(1, 13, n).tolist(),
+                   rng.integers(first_year, first_year + years, n).tolist()]
+        if name:
+            columns.insert(1, ["lançamento"] * n)
+        marks = ", ".join("?" * len(columns))
+        sql = f"INSERT INTO {table} (user_id, {name}{value_col}, category, month, year) VALUES ({marks})"
+        for row in zip(*columns):
+            by_user[row[0]].setdefault(sql, []).append(row)
+    # Uma transação por usuário: com FINANCE_SHARDS, cada um no seu shard
+    for user_id, inserts in by_user.items():
+        with db.connection(user_id=user_id) as conn:
+            for sql, values in inserts.items():
+                conn.executemany(sql, values)
+            conn.execute("""INSERT INTO recurrences (user_id, kind, description, value, category, start_period, interval_months)
+                            VALUES (?, 'expense', 'Aluguel', 250000, 'Moradia', ?, 1)""", (user_id, first_year * 12))
+    return user_ids, first_year
+
+def _best(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - started)
+    return min(times) * 1000
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000, help="lançamentos no total (todos os usuários)")
+    parser.add_argument("--users", type=int, default=4)
+    parser.add_argument("--years", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="grava o relatório JSON neste arquivo")
+    args = parser.parse_args(argv)
+
+    prepare_environment(cache=False)
+    import database as db
+    import olap
+    if not olap.available():
+        parser.error("o pacote duckdb não está instalado")
+    db.init_db()
+    started = time.perf_counter()
+    user_ids, first_year = _populate(db, args.rows, args.users, args.years)
+    print(f"{args.rows} lançamentos gerados em {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    user_id = user_ids[0]
+    last_year = first_year + args.years - 1
+    reports = {
+        "category_totals_all": lambda engine: engine.get_category_totals(user_id, db.to_period(1, first_year), db.to_period(12, last_year)),
+        "category_totals_year": lambda engine: engine.get_category_totals(user_id, db.to_period(1, last_year), db.to_period(12, last_year)),
+        "annual_summary": lambda engine: engine.get_annual_summary(user_id, last_year),
+    }
+    results = {}
+    for name, report in reports.items():
+        db.ANALYTICS_ENGINE = "sqlite"
+        sqlite_ms = _best(lambda: report(db), args.repeat)
+        cold = []
+        for _ in range(args.repeat):
+            olap.drop_snapshots()
+            cold.append(_best(lambda: report(olap), 1))
+        warm_ms = _best(lambda: report(olap), args.repeat)
+        cold_ms = min(cold)
+        gain = sqlite_ms - warm_ms
+        results[name] = {"sqlite_ms": sqlite_ms, "duckdb_cold_ms": cold_ms, "duckdb_warm_ms": warm_ms,
+                         "speedup_warm": sqlite_ms / warm_ms if warm_ms else None,
+                         "breakeven_reports": (cold_ms - warm_ms) / gain if gain > 0 else None}
+        print(f"{name:<22} sqlite {sqlite_ms:9.1f} ms   duckdb frio {cold_ms:9.1f} ms   quente {warm_ms:7.1f} ms   "
+              f"({results[name]['speedup_warm'] or 0:.1f}x)", file=sys.stderr)
+
+    report = {"meta": run_metadata(), "config": vars(args), "snapshot": olap.snapshot_stats(), "reports": results}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    return report
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Tempo de cada rerun do app.py (p50/p99 por página), medido com o AppTest do Streamlit.
+
+Uso: python -m benchmarks.rerun_bench --reruns 40 --output rerun.json
+
+O rerun da tela de login mede o custo fixo do script (bootstrap do banco, estilos, cabeçalho);
+as páginas da área logada somam a esse custo as consultas de cada página. "script" é só a execução
+do app.py; "wall" inclui a sobrecarga do AppTest (thread do runner, espera por eventos).
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from benchmarks.common import percentiles, prepare_environment, run_metadata
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+
+_script_times = []
+
+def _time_script_execution():
+    # O runner executa o corpo do app.py por esta função; cronometrá-la isola o tempo do script
+    from streamlit.runtime.scriptrunner import script_runner
+    original = script_runner.exec_func_with_error_handling
+
+    def timed(func, ctx):
+        started = time.perf_counter()
+        try:
+            return original(func, ctx)
+        finally:
+            _script_times.append(time.perf_counter() - started)
+    script_runner.exec_func_with_error_handling = timed
+
+def _timed_reruns(at, reruns):
+    wall = []
+    del _script_times[:]
+    for _ in range(reruns):
+        started = time.perf_counter()
+        at.run()
+        wall.append(time.perf_counter() - started)
+        if at.exception:
+            raise RuntimeError(at.exception[0].message)
+    return {"script": percentiles(_script_times), "wall": percentiles(wall)}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--reruns", type=int, default=40)
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--cache", action="store_true", help="liga o cache de leituras")
+    parser.add_argument("--output", help="grava o relatório JSON neste arquivo")
+    args = parser.parse_args(argv)
+
+    prepare_environment(cache=args.cache, bcrypt_rounds=4)
+    from streamlit.testing.v1 import AppTest
+    from benchmarks import datagen
+    _time_script_execution()
+    dataset = datagen.generate(users=1, years=args.years)
+    user_id = dataset["user_ids"][0]
+
+    at = AppTest.from_file(APP, default_timeout=60)
+    at.run()  # primeiro rerun: importações e bootstrap, fora da medição
+    pages = {"login": _timed_reruns(at, args.reruns)}
+
+    at.session_state["logged_in"] = True
+    at.session_state["user_id"] = user_id
+    at.session_state["username"] = f"user{user_id}"
+    at.run()
+    at.sidebar.number_input[0].set_value(dataset["last_year"])
+    for page in at.sidebar.radio[0].options:
+        at.sidebar.radio[0].set_value(page)
+        at.run()
+        pages[page] = _timed_reruns(at, args.reruns)
+
+    report = {"meta": run_metadata(), "config": vars(args), "pages": pages}
+    for page, stats in pages.items():
+        script, wall = stats["script"], stats["wall"]
+        print(f"{page:<24} script p50 {script['p50_ms']:7.2f} ms  p99 {script['p99_ms']:7.2f} ms   "
+              f"wall p50 {wall['p50_ms']:7.2f} ms", file=sys.stderr)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    return report
+
+if __name__ == "__main__":
+    main()
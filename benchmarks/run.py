@@ -0,0 +1,335 @@
+"""Cenários cronometrados para as funções públicas de database.py.
+
+Uso: python -m benchmarks --users 50 --years 5 --output resultado.json [--compare anterior.json]
+
+Cada cenário prepara seus argumentos fora do cronômetro e mede só a chamada. O relatório JSON traz
+percentis de latência, linhas por segundo e pico de memória Python (tracemalloc) por cenário, além do
+commit e da máquina, para comparar execuções entre commits.
+"""
+import sys
+import json
+import time
+import random
+import argparse
+import tracemalloc
+import pandas as pd
+from benchmarks.common import percentiles, prepare_environment, run_metadata
+
+SCENARIOS = []
+
+def scenario(name, iterations=200):
+    def register(setup):
+        SCENARIOS.append((name, iterations, setup))
+        return setup
+    return register
+
+class Context:
+    def __init__(self, db, dataset, seed):
+        self.db = db
+        self.dataset = dataset
+        self.rng = random.Random(seed)
+
+    def user(self):
+        return self.rng.randint(*self.dataset["user_ids"])
+
+    def month(self):
+        return self.user(), self.rng.randint(1, 12), self.rng.randint(self.dataset["first_year"], self.dataset["last_year"])
+
+    def last_id(self, table, user_id):
+        with self.db.connection(user_id=user_id) as conn:
+            return conn.execute(f"SELECT MAX(id) FROM {table} WHERE user_id = ?", (user_id,)).fetchone()[0]
+
+def count_rows(result):
+    if isinstance(result, pd.DataFrame):
+        return len(result)
+    if isinstance(result, tuple) and any(isinstance(v, pd.DataFrame) for v in result):
+        return sum(len(v) for v in result if isinstance(v, pd.DataFrame))
+    return 1
+
+# --- Leituras ---
+@scenario("get_incomes")
+def _(ctx):
+    u, m, y = ctx.month()
+    return lambda: ctx.db.get_incomes(u, m, y)
+
+@scenario("get_expenses")
+def _(ctx):
+    u, m, y = ctx.month()
+    return lambda: ctx.db.get_expenses(u, m, y)
+
+@scenario("get_investments")
+def _(ctx):
+    u, m, y = ctx.month()
+    return lambda: ctx.db.get_investments(u, m, y)
+
+@scenario("get_month_snapshot")
+def _(ctx):
+    u, m, y = ctx.month()
+    return lambda: ctx.db.get_month_snapshot(u, m, y)
+
+@scenario("get_entries_page")
+def _(ctx):
+    u, m, y = ctx.month()
+    return lambda: ctx.db.get_entries_page("expenses", u, m, y, 1)
+
+@scenario("get_monthly_trends")
+def _(ctx):
+    import analytics
+    u, _, _ = ctx.month()
+    return lambda: analytics.get_monthly_trends(u)
+
+@scenario("get_yearly_trends")
+def _(ctx):
+    import analytics
+    u, _, _ = ctx.month()
+    return lambda: analytics.get_yearly_trends(u)
+
+@scenario("get_month_totals")
+def _(ctx):
+    u, m, y = ctx.month()
+    return lambda: ctx.db.get_month_totals(u, m, y)
+
+@scenario("get_annual_summary")
+def _(ctx):
+    u, _, y = ctx.month()
+    return lambda: ctx.db.get_annual_summary(u, y)
+
+@scenario("get_category_totals")
+def _(ctx):
+    u, _, y = ctx.month()
+    # Três anos por categoria (DuckDB só para históricos grandes; FINANCE_ANALYTICS=sqlite força o SQLite)
+    return lambda: ctx.db.get_category_totals(u, ctx.db.to_period(1, y - 2), ctx.db.to_period(12, y))
+
+@scenario("get_category_pivot")
+def _(ctx):
+    import analytics
+    u, _, y = ctx.month()
+    return lambda: analytics.get_category_pivot(u, "expense", ctx.db.to_period(1, y), ctx.db.to_period(12, y),
+                                                top=analytics.CATEGORY_TOP)
+
+@scenario("get_future_projection_12")
+def _(ctx):
+    u, m, y = ctx.month()
+    return lambda: ctx.db.get_future_projection(u, m, y)
+
+@scenario("get_future_projection_120")
+def _(ctx):
+    u, m, y = ctx.month()
+    return lambda: ctx.db.get_future_projection(u, m, y, periods=120)
+
+@scenario("simulate_projection_10k_x_120", iterations=20)
+def _(ctx):
+    # Meta: 10 000 caminhos x 120 meses bem abaixo de 1 s (semente nova a cada iteração, fora do cache)
+    import analytics
+    u, m, y = ctx.month()
+    seed = ctx.rng.randrange(10**9)
+    return lambda: analytics.simulate_projection(u, ctx.db.to_period(m, y), 120, 10_000, seed)
+
+@scenario("get_goals")
+def _(ctx):
+    u = ctx.user()
+    return lambda: ctx.db.get_goals(u)
+
+@scenario("forecast_goals")
+def _(ctx):
+    import analytics
+    u, _, _ = ctx.month()
+    return lambda: analytics.forecast_goals(u)
+
+@scenario("get_recurrences")
+def _(ctx):
+    u = ctx.user()
+    return lambda: ctx.db.get_recurrences(u)
+
+@scenario("check_monthly_totals", iterations=3)
+def _(ctx):
+    return lambda: ctx.db.check_monthly_totals()
+
+# --- Escritas ---
+@scenario("add_income")
+def _(ctx):
+    u, m, y = ctx.month()
+    return lambda: ctx.db.add_income(u, "Bench", 10000, "Outros", m, y)
+
+@scenario("add_expense_recurring")
+def _(ctx):
+    u, m, y = ctx.month()
+    return lambda: ctx.db.add_expense(u, "Bench", 5000, "Fixa", m, y, 1)
+
+@scenario("add_investment_recurring")
+def _(ctx):
+    u, m, y = ctx.month()
+    return lambda: ctx.db.add_investment(u, 20000, "FIIs", m, y, 1)
+
+@scenario("add_recurrence_open_ended")
+def _(ctx):
+    u, m, y = ctx.month()
+    return lambda: ctx.db.add_recurrence(u, "income", "Bench", 1000, "Outros", m, y)
+
+@scenario("delete_income")
+def _(ctx):
+    u, m, y = ctx.month()
+    ctx.db.add_income(u, "Bench", 100, "Outros", m, y)
+    row_id = ctx.last_id("incomes", u)
+    return lambda: ctx.db.delete_income(row_id, u)
+
+@scenario("delete_expense")
+def _(ctx):
+    u, m, y = ctx.month()
+    ctx.db.add_expense(u, "Bench", 100, "Ocasional", m, y)
+    row_id = ctx.last_id("expenses", u)
+    return lambda: ctx.db.delete_expense(row_id, u)
+
+@scenario("delete_investment")
+def _(ctx):
+    u, m, y = ctx.month()
+    ctx.db.add_investment(u, 100, "Outros", m, y)
+    row_id = ctx.last_id("investments", u)
+    return lambda: ctx.db.delete_investment(row_id, u)
+
+@scenario("delete_entries_100")
+def _(ctx):
+    # Exclusão em lote: 100 lançamentos numa transação (compare com 100 x delete_expense)
+    u, m, y = ctx.month()
+    with ctx.db.connection(user_id=u) as conn:
+        conn.executemany("INSERT INTO expenses (user_id, description, value, category, month, year) VALUES (?, 'Bench', 100, 'Ocasional', ?, ?)",
+                         [(u, m, y)] * 100)
+        ids = [r[0] for r in conn.execute("SELECT id FROM expenses WHERE user_id = ? ORDER BY id DESC LIMIT 100", (u,))]
+    return lambda: ctx.db.delete_entries("expenses", ids, u)
+
+@scenario("skip_recurrence")
+def _(ctx):
+    u, m, y = ctx.month()
+    rec_id = ctx.last_id("recurrences", u)
+    return lambda: ctx.db.skip_recurrence(rec_id, u, m, y)
+
+@scenario("override_recurrence")
+def _(ctx):
+    u, m, y = ctx.month()
+    rec_id = ctx.last_id("recurrences", u)
+    return lambda: ctx.db.override_recurrence(rec_id, u, m, y, 12300)
+
+@scenario("end_recurrence")
+def _(ctx):
+    u, m, y = ctx.month()
+    rec_id = ctx.db.add_recurrence(u, "expense", "Bench", 100, "Fixa", m, y)
+    return lambda: ctx.db.end_recurrence(rec_id, u, m, y + 1)
+
+@scenario("delete_recurrence")
+def _(ctx):
+    u, m, y = ctx.month()
+    rec_id = ctx.db.add_recurrence(u, "expense", "Bench", 100, "Fixa", m, y)
+    return lambda: ctx.db.delete_recurrence(rec_id, u)
+
+@scenario("add_goal")
+def _(ctx):
+    u = ctx.user()
+    return lambda: ctx.db.add_goal(u, "Bench", 100000)
+
+@scenario("update_goal_progress")
+def _(ctx):
+    u = ctx.user()
+    goal_id = ctx.last_id("goals", u)
+    return lambda: ctx.db.update_goal_progress(goal_id, u, 1000)
+
+@scenario("delete_goal")
+def _(ctx):
+    u = ctx.user()
+    ctx.db.add_goal(u, "Bench", 100)
+    goal_id = ctx.last_id("goals", u)
+    return lambda: ctx.db.delete_goal(goal_id, u)
+
+@scenario("rebuild_monthly_totals", iterations=3)
+def _(ctx):
+    return lambda: ctx.db.rebuild_monthly_totals()
+
+# --- Usuários (dominados pelo custo do bcrypt) ---
+@scenario("login_user", iterations=10)
+def _(ctx):
+    u = ctx.user()
+    return lambda: ctx.db.login_user(f"user{u}", "senha123")
+
+@scenario("create_user", iterations=5)
+def _(ctx):
+    n = ctx.rng.randrange(10**9)
+    return lambda: ctx.db.create_user(f"bench{n}", f"bench{n}@example.com", "senha")
+
+@scenario("reset_password_flow", iterations=5)
+def _(ctx):
+    email = f"user{ctx.user()}@example.com"
+    return lambda: ctx.db.verify_reset_code(email, ctx.db.generate_reset_code(email))
+
+def run_scenario(ctx, setup, iterations):
+    latencies, rows = [], 0
+    for _ in range(iterations):
+        op = setup(ctx)
+        started = time.perf_counter()
+        result = op()
+        latencies.append(time.perf_counter() - started)
+        rows += count_rows(result)
+    # Uma execução extra sob tracemalloc mede o pico de memória sem distorcer os tempos acima
+    op = setup(ctx)
+    tracemalloc.start()
+    op()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    report = percentiles(latencies)
+    report["rows_per_s"] = rows / sum(latencies) if sum(latencies) else 0.0
+    report["peak_kib"] = peak / 1024
+    return report
+
+def compare(current, baseline):
+    print(f"{'cenário':32} {'p50 antes':>11} {'p50 agora':>11} {'razão':>7}", file=sys.stderr)
+    for name, result in current["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if before:
+            ratio = result["p50_ms"] / before["p50_ms"] if before["p50_ms"] else float("inf")
+            print(f"{name:32} {before['p50_ms']:11.3f} {result['p50_ms']:11.3f} {ratio:7.2f}", file=sys.stderr)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks de database.py")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplica o número de iterações de cada cenário")
+    parser.add_argument("--only", default=None, help="lista de cenários separados por vírgula")
+    parser.add_argument("--cache", action="store_true", help="mantém o cache de leitura ligado")
+    parser.add_argument("--bcrypt-rounds", type=int, default=10)
+    parser.add_argument("--output", default=None, help="grava o relatório JSON neste arquivo")
+    parser.add_argument("--compare", default=None, help="relatório JSON anterior para comparar p50")
+    args = parser.parse_args(argv)
+
+    prepare_environment(cache=args.cache, bcrypt_rounds=args.bcrypt_rounds)
+    import database as db
+    from benchmarks import datagen
+
+    started = time.perf_counter()
+    dataset = datagen.generate(args.users, args.years, args.seed)
+    dataset["seconds"] = time.perf_counter() - started
+    ctx = Context(db, dataset, args.seed)
+    selected = set(args.only.split(",")) if args.only else None
+
+    results = {}
+    for name, iterations, setup in SCENARIOS:
+        if selected and name not in selected:
+            continue
+        results[name] = run_scenario(ctx, setup, max(1, int(iterations * args.scale)))
+        print(f"{name:32} p50 {results[name]['p50_ms']:9.3f} ms  p99 {results[name]['p99_ms']:9.3f} ms", file=sys.stderr)
+
+    report = {"meta": run_metadata(), "config": vars(args), "dataset": dataset, "scenarios": results}
+    if args.cache:
+        report["cache"] = db.cache_stats()
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as out:
+            out.write(text + "\n")
+    else:
+        print(text)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(report, json.load(f))
+    db.close_all_connections()
+    return report
+
+if __name__ == "__main__":
+    main()
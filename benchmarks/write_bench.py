@@ -0,0 +1,111 @@
+"""Vazão de escrita e taxa de "database is locked" com várias sessões escrevendo ao mesmo tempo.
+
+Uso: python -m benchmarks.write_bench --sessions 32 --writes 200 --busy-timeout 5000 --output writes.json
+
+Cada sessão é uma thread com o seu usuário, alternando lançamentos avulsos, regras recorrentes e
+exclusões; depois de cada escrita ela lê o total do mês e confere que a própria escrita já aparece
+(read-your-writes, com o cache de leitura ligado). O mesmo roteiro roda com a fila de escrita
+(database.WRITE_QUEUE, commits em lote) e com cada escrita na sua conexão do pool ("direct").
+Com --shards 1 2 4 8, o roteiro se repete com os usuários espalhados por esse número de arquivos
+(database.SHARDS), cada um com seu lock e sua fila de escrita; 0 = sem shards.
+"""
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import threading
+from benchmarks.common import percentiles, prepare_environment, run_metadata
+
+MODES = ("direct", "queue")
+
+def _session(db, user_id, writes, year, latencies, failures):
+    expected = 0  # total de dezembro: regras de 12 ocorrências do ano todo + avulsos do próprio mês
+    for k in range(writes):
+        month = k % 12 + 1
+        rule_id = None
+        started = time.perf_counter()
+        try:
+            if k % 10 == 9:
+                # Regra recorrente (um ano), que também entra no total de dezembro
+                db.add_expense(user_id, "Assinatura", 1000, "Fixa", month, year, 1, 12)
+                expected += 1000
+            elif k % 5 == 4:
+                rule_id = db.add_recurrence(user_id, "expense", "Estorno", 700, "Ocasional", month, year)
+                db.delete_recurrence(rule_id, user_id)
+            else:
+                db.add_expense(user_id, "Mercado", 500, "Alimentação", month, year)
+                expected += 500 if month == 12 else 0
+        except sqlite3.OperationalError as e:
+            failures["locked" if "locked" in str(e) else "other"] += 1
+            if rule_id is not None:
+                expected += 700  # a regra foi criada, a exclusão é que falhou
+            continue
+        finally:
+            latencies.append(time.perf_counter() - started)
+        if month == 12 and db.get_month_totals(user_id, 12, year)[1] != expected:
+            failures["stale_reads"] += 1
+
+def _run(db, mode, args, year):
+    db.WRITE_QUEUE = mode == "queue"
+    with db.connection() as conn:
+        user_ids = [conn.execute("INSERT INTO users (username, email, password) VALUES (?, ?, 'x')",
+                                 (f"{mode}{i}", f"{mode}{i}@bench")).lastrowid for i in range(args.sessions)]
+    latencies, failures = [], {"locked": 0, "other": 0, "stale_reads": 0}
+    threads = [threading.Thread(target=_session, args=(db, user_id, args.writes, year, latencies, failures))
+               for user_id in user_ids]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    done = len(latencies) - failures["locked"] - failures["other"]
+    return {"seconds": elapsed, "writes_per_second": done / elapsed,
+            "lock_error_rate": failures["locked"] / len(latencies), "latency": percentiles(latencies), **failures}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=32, help="threads escrevendo ao mesmo tempo")
+    parser.add_argument("--writes", type=int, default=200, help="escritas por sessão")
+    parser.add_argument("--busy-timeout", type=int, help="ms de espera pelo lock (padrão: database.PRAGMAS)")
+    parser.add_argument("--batch-size", type=int, help="operações por COMMIT na fila (padrão: database.WRITE_BATCH_SIZE)")
+    parser.add_argument("--synchronous", choices=("OFF", "NORMAL", "FULL"),
+                        help="PRAGMA synchronous (FULL = fsync a cada COMMIT; padrão: database.PRAGMAS)")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--shards", nargs="+", type=int, default=[0], help="números de shards a comparar (0 = sem shards)")
+    parser.add_argument("--output", help="grava o relatório JSON neste arquivo")
+    args = parser.parse_args(argv)
+
+    db_path = prepare_environment(cache=True)
+    import database as db
+    if args.busy_timeout is not None:
+        db.PRAGMAS["busy_timeout"] = args.busy_timeout
+    if args.batch_size is not None:
+        db.WRITE_BATCH_SIZE = args.batch_size
+    if args.synchronous is not None:
+        db.PRAGMAS["synchronous"] = args.synchronous
+    results, queues = {}, {}
+    for shards in args.shards:
+        # Arquivos novos para cada número de shards: os níveis não herdam lançamentos nem locks do anterior
+        db.close_all_connections()
+        db.SHARDS = shards
+        db.DB_NAME = os.path.join(os.path.dirname(db_path), f"shards{shards}.db")
+        db.init_db()
+        level = results[str(shards)] = {}
+        for n, mode in enumerate(args.modes):
+            level[mode] = r = _run(db, mode, args, 2026 + n)
+            print(f"shards {shards:<3} {mode:<7} {r['writes_per_second']:8.0f} escritas/s   p50 {r['latency']['p50_ms']:7.1f} ms   "
+                  f"p99 {r['latency']['p99_ms']:7.1f} ms   locked {r['lock_error_rate']:.1%}   "
+                  f"leituras defasadas {r['stale_reads']}", file=sys.stderr)
+        queues[str(shards)] = db.write_queue_stats()
+    report = {"meta": run_metadata(), "config": vars(args), "shards": results, "write_queue": queues}
+    db.close_all_connections()
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    return report
+
+if __name__ == "__main__":
+    main()
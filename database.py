@@ -1,22 +1,644 @@
 import sqlite3
+import numpy as np
 import pandas as pd
 import hashlib
+import hmac
+import bcrypt
 import random
 import string
+import os
+import re
+import queue
+import atexit
+import threading
+import time
+import inspect
+import functools
+from collections import OrderedDict, namedtuple
+from contextlib import contextmanager
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, timedelta
 
-DB_NAME = "finance_control.db"
+import instrumentation
 
-def get_connection():
-    return sqlite3.connect(DB_NAME)
+DB_NAME = os.environ.get("FINANCE_DB", "finance_control.db")
 
-def hash_password(password):
+# PRAGMAs aplicados em toda conexão nova do pool (podem ser ajustados antes do primeiro uso)
+PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,      # ms esperando o lock antes de "database is locked"
+    "cache_size": -16000,      # negativo = KiB (~16 MB por conexão)
+    "mmap_size": 134217728,    # 128 MB
+}
+POOL_SIZE = 8
+
+# --- Pool de Conexões ---
+class ConnectionPool:
+    """Mantém conexões SQLite abertas e reaproveitadas entre chamadas e threads."""
+
+    def __init__(self, path, size=POOL_SIZE, pragmas=None):
+        self.path = path
+        self.pragmas = dict(PRAGMAS if pragmas is None else pragmas)
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._lock = threading.Lock()
+        self._all = {}  # conexão -> geração em que foi aberta
+        self._generation = 0
+        self._closed = False
+
+    def _open(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, factory=instrumentation.connection_factory())
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        with self._lock:
+            self._all[conn] = self._generation
+        return conn
+
+    def _discard(self, conn):
+        with self._lock:
+            self._all.pop(conn, None)
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    def _healthy(self, conn):
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def acquire(self):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                return self._open()
+            if self._healthy(conn):
+                return conn
+            self._discard(conn)
+
+    def release(self, conn):
+        if self._closed or self._all.get(conn) != self._generation:
+            self._discard(conn)
+            return
+        if conn.in_transaction:
+            conn.rollback()
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            self._discard(conn)
+
+    def recycle(self):
+        # Conexões ociosas são fechadas agora; as emprestadas, quando forem devolvidas
+        with self._lock:
+            self._generation += 1
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                break
+
+    def close(self):
+        self._closed = True
+        with self._lock:
+            conns = list(self._all)
+            self._all.clear()
+        for conn in conns:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def get_pool(path=None):
+    path = path or DB_NAME
+    pool = _pools.get(path)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(path)
+            if pool is None:
+                pool = _pools[path] = ConnectionPool(path)
+    return pool
+
+def recycle_connections():
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.recycle()
+
+def set_instrumentation(enabled):
+    """Liga/desliga a instrumentação; as conexões do pool são recriadas com a fábrica correspondente."""
+    instrumentation.enable(enabled)
+    recycle_connections()
+
+def close_all_connections():
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+        writers = list(_writers.values())
+        _writers.clear()
+        # Sem conexões abertas o arquivo pode ter sido trocado; a próxima init_db volta a conferir o schema
+        _schema_checked.clear()
+        _placements.clear()
+    # Escritas já enfileiradas são gravadas antes de a conexão do escritor fechar
+    for writer in writers:
+        writer.close()
+    for pool in pools:
+        pool.close()
+
+atexit.register(close_all_connections)
+
+@contextmanager
+def connection(path=None, user_id=None):
+    """Empresta uma conexão do pool: commit ao final, rollback em caso de erro.
+    Com user_id (e sem path), a conexão é do arquivo onde estão os dados do usuário (shard_path)."""
+    if path is None:
+        path = DB_NAME if user_id is None else shard_path(user_id)
+    if getattr(_writer_local, "path", None) == path:
+        # Dentro da thread de escrita: usa a conexão dela; commit/rollback ficam com o lote (WriteQueue)
+        yield _writer_local.conn
+        return
+    pool = get_pool(path)
+    conn = pool.acquire()
+    try:
+        yield conn
+        if conn.in_transaction:
+            conn.commit()
+    except BaseException:
+        if conn.in_transaction:
+            conn.rollback()
+        raise
+    finally:
+        pool.release(conn)
+
+def get_connection(user_id=None):
+    # Mantida por compatibilidade: conexão avulsa, fora do pool (quem chama deve fechar)
+    conn = sqlite3.connect(DB_NAME if user_id is None else shard_path(user_id))
+    for name, value in PRAGMAS.items():
+        conn.execute(f"PRAGMA {name} = {value}")
+    return conn
+
+# --- Shards por Usuário ---
+# Com FINANCE_SHARDS=N, os dados de cada usuário ficam num de N arquivos SQLite ao lado de DB_NAME
+# (finance_control.shard0.db, ...), escolhido pelo hash do user_id. DB_NAME vira o diretório: usuários,
+# códigos de recuperação e user_shards (user_id -> shard onde os dados estão). Cada shard tem seu
+# próprio lock de escrita, pool e fila de escrita, então escritas de usuários em shards diferentes não
+# disputam o mesmo arquivo. Sem FINANCE_SHARDS (padrão), tudo fica em DB_NAME, como antes.
+# O shard -1 é o próprio DB_NAME: quem já tinha dados ali quando os shards foram ligados continua lá
+# até ser movido (rebalance_shards). Todos os arquivos têm o mesmo schema.
+SHARDS = int(os.environ.get("FINANCE_SHARDS", "0"))
+SHARD_DIRECTORY = -1
+SHARD_MAP_TTL = 10  # segundos até reler do diretório o shard de um usuário (pode ter sido movido por outro processo)
+SHARD_PURGE_AFTER = 60  # segundos até os dados antigos de um usuário movido poderem ser apagados (> SHARD_MAP_TTL)
+
+_placements = {}  # user_id -> (shard, instante da leitura do diretório)
+
+class ShardMoved(Exception):
+    """A escrita chegou ao shard antigo de um usuário já movido; é refeita no shard novo."""
+
+    def __init__(self, user_id, shard):
+        super().__init__(f"usuário {user_id} movido para o shard {shard}")
+        self.user_id = user_id
+        self.shard = shard
+
+def shard_file(shard):
+    if shard == SHARD_DIRECTORY:
+        return DB_NAME
+    root, ext = os.path.splitext(DB_NAME)
+    return f"{root}.shard{shard}{ext}"
+
+def data_files():
+    """Arquivos que podem ter lançamentos: DB_NAME e, com shards, cada um deles."""
+    return [DB_NAME] + [shard_file(k) for k in range(SHARDS)]
+
+def hash_shard(user_id, shards=None):
+    # Hash estável entre processos (o hash() do Python não é), espalha ids sequenciais
+    digest = hashlib.blake2b(str(user_id).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % (shards or SHARDS)
+
+def _has_data(conn, user_id):
+    return conn.execute("""
+        SELECT 1 FROM monthly_totals WHERE user_id = :u UNION ALL
+        SELECT 1 FROM recurrences WHERE user_id = :u UNION ALL
+        SELECT 1 FROM goals WHERE user_id = :u LIMIT 1
+    """, {"u": user_id}).fetchone() is not None
+
+def shard_of(user_id):
+    """Shard com os dados do usuário; na primeira consulta a escolha fica registrada em user_shards."""
+    if not SHARDS:
+        return SHARD_DIRECTORY
+    found = _placements.get(user_id)
+    if found is not None and time.monotonic() - found[1] < SHARD_MAP_TTL:
+        return found[0]
+    with connection(DB_NAME) as conn:
+        row = conn.execute("SELECT shard FROM user_shards WHERE user_id = ?", (user_id,)).fetchone()
+        if row is None:
+            # Dados de antes dos shards ficam onde estão; usuário novo vai para o shard do hash. A escolha
+            # não muda enquanto ninguém move o usuário, então gravá-la é só um atalho: se o diretório
+            # estiver ocupado, fica para a próxima consulta
+            shard = SHARD_DIRECTORY if _has_data(conn, user_id) else hash_shard(user_id)
+            try:
+                conn.execute("INSERT OR IGNORE INTO user_shards (user_id, shard) VALUES (?, ?)", (user_id, shard))
+            except sqlite3.OperationalError:
+                pass
+            row = (shard,)
+    _placements[user_id] = (row[0], time.monotonic())
+    return row[0]
+
+def _record_placement(user_id, shard):
+    with connection(DB_NAME) as conn:
+        conn.execute("""INSERT INTO user_shards (user_id, shard) VALUES (?, ?)
+                        ON CONFLICT (user_id) DO UPDATE SET shard = excluded.shard""", (user_id, shard))
+    _placements[user_id] = (shard, time.monotonic())
+
+def shard_path(user_id):
+    return shard_file(shard_of(user_id))
+
+def _check_moved(conn, user_id):
+    # Marca deixada por move_user no shard de origem: a escrita não pode cair nos dados antigos
+    row = conn.execute("SELECT shard FROM moved_users WHERE user_id = ?", (user_id,)).fetchone()
+    if row is not None:
+        raise ShardMoved(user_id, row[0])
+
+def run_user_transaction(user_id, func, *args, **kwargs):
+    """Roda func(conn, *args, **kwargs) numa transação BEGIN IMMEDIATE no arquivo do usuário, para escritas
+    em massa que não passam pela fila (importação, restauração). Se o usuário acabou de ser movido de
+    shard, a transação é desfeita e refeita no shard novo, como as escritas da fila."""
+    while True:
+        try:
+            with connection(user_id=user_id) as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                if SHARDS:
+                    _check_moved(conn, user_id)
+                return func(conn, *args, **kwargs)
+        except ShardMoved as moved:
+            _record_placement(user_id, moved.shard)
+
+# --- Fila de Escrita (group commit) ---
+# Com várias sessões escrevendo, cada escrita numa conexão própria disputa o lock de escrita do SQLite
+# e, passado o busy_timeout, falha com "database is locked". Em vez disso, as escritas (funções
+# @invalidates) entram numa fila atendida por uma única thread, dona da conexão de escrita. Ela junta
+# o que estiver na fila (até WRITE_BATCH_SIZE operações) numa transação só, cada operação no seu
+# SAVEPOINT: o erro de uma operação desfaz só ela, e um COMMIT serve o lote inteiro. Quem chamou
+# espera o Future da sua operação, que só é resolvido depois do COMMIT — recebe o resultado ou a
+# exceção da própria operação, e a leitura seguinte já enxerga o que foi escrito.
+WRITE_QUEUE = os.environ.get("FINANCE_WRITE_QUEUE", "1") != "0"
+WRITE_BATCH_SIZE = 128
+WRITE_BEGIN_RETRIES = 5  # BEGIN IMMEDIATE ainda pode esbarrar em outro processo (ou importação em massa)
+
+_writer_local = threading.local()
+
+class WriteQueue:
+    """Thread única de escrita para um arquivo de banco, com commits em lote."""
+
+    def __init__(self, path, batch_size=WRITE_BATCH_SIZE):
+        self.path = path
+        self.batch_size = batch_size
+        self.stats = {"operations": 0, "batches": 0, "errors": 0, "redirected": 0, "begin_retries": 0, "largest_batch": 0}
+        self._queue = queue.Queue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name=f"writer:{os.path.basename(path)}", daemon=True)
+        self._thread.start()
+
+    def submit(self, func, *args, **kwargs):
+        if self._closed:
+            raise RuntimeError("Fila de escrita encerrada")
+        future = Future()
+        self._queue.put((future, func, args, kwargs))
+        return future
+
+    def close(self, timeout=30):
+        self._closed = True
+        self._queue.put(None)
+        if threading.current_thread() is not self._thread:
+            self._thread.join(timeout)
+
+    def _open(self):
+        # Sem isolation_level: as transações do lote são abertas e fechadas explicitamente
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None,
+                               factory=instrumentation.connection_factory())
+        for name, value in PRAGMAS.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        return conn
+
+    def _run(self):
+        try:
+            conn = self._open()
+        except sqlite3.Error as e:
+            conn, error = None, e
+        _writer_local.conn, _writer_local.path = conn, self.path
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            if conn is None:
+                for future, *_ in batch:
+                    if future.set_running_or_notify_cancel():
+                        future.set_exception(error)
+            else:
+                self._commit(conn, batch)
+        if conn is not None:
+            conn.close()
+
+    def _begin(self, conn):
+        for attempt in range(WRITE_BEGIN_RETRIES):
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                return
+            except sqlite3.OperationalError as e:
+                if "locked" not in str(e) or attempt == WRITE_BEGIN_RETRIES - 1:
+                    raise
+                self.stats["begin_retries"] += 1
+                time.sleep(0.05 * 2 ** attempt)
+
+    def _commit(self, conn, batch):
+        batch = [item for item in batch if item[0].set_running_or_notify_cancel()]
+        results = []
+        # Usuários alterados no lote: a versão gravada sobe no próprio lote; a da memória, depois do COMMIT
+        touched = _writer_local.touched = set()
+        try:
+            self._begin(conn)
+            for _, func, args, kwargs in batch:
+                conn.execute("SAVEPOINT operation")
+                try:
+                    results.append((True, func(*args, **kwargs)))
+                except Exception as e:
+                    conn.execute("ROLLBACK TO operation")
+                    results.append((False, e))
+                conn.execute("RELEASE operation")
+            _store_data_versions(conn, touched)
+            conn.execute("COMMIT")
+        except Exception as e:
+            # Falha do lote (BEGIN, COMMIT, disco cheio...): nenhuma operação foi gravada
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            results = [(False, e)] * len(batch)
+        finally:
+            _writer_local.touched = None
+            for user_id in touched:
+                _bump_local(user_id)
+        self.stats["batches"] += 1
+        self.stats["operations"] += len(batch)
+        self.stats["largest_batch"] = max(self.stats["largest_batch"], len(batch))
+        for (future, *_), (ok, value) in zip(batch, results):
+            if ok:
+                future.set_result(value)
+            else:
+                # ShardMoved não é erro: quem chamou refaz a escrita no shard novo
+                self.stats["redirected" if isinstance(value, ShardMoved) else "errors"] += 1
+                future.set_exception(value)
+
+_writers = {}
+
+def get_writer(path=None):
+    path = path or DB_NAME
+    writer = _writers.get(path)
+    if writer is None:
+        with _pools_lock:
+            writer = _writers.get(path)
+            if writer is None:
+                writer = _writers[path] = WriteQueue(path)
+    return writer
+
+def submit_write(func, *args, **kwargs):
+    """Enfileira uma escrita (função @invalidates) e devolve o Future, sem esperar o COMMIT.
+    Com shards, o Future pode falhar com ShardMoved se o usuário acabou de mudar de shard."""
+    user_id = inspect.signature(func).bind(*args, **kwargs).arguments["user_id"]
+    return get_writer(shard_path(user_id)).submit(func, *args, **kwargs)
+
+def write_queue_stats():
+    with _pools_lock:
+        return {path: dict(writer.stats) for path, writer in _writers.items()}
+
+# --- Cache de Leitura ---
+# Leituras memoizadas por (função, argumentos, versão dos dados do usuário). Toda escrita incrementa
+# a versão do usuário, então uma leitura nunca devolve dados anteriores à última escrita deste processo.
+# O TTL limita o tempo de vida das entradas caso outro processo escreva no mesmo arquivo.
+CACHE_MAX_ENTRIES = 512
+CACHE_TTL = 300  # segundos
+
+class ReadCache:
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.enabled = os.environ.get("FINANCE_CACHE", "1") != "0"
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] < self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return False, None
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._entries),
+                    "hit_rate": self.hits / total if total else 0.0}
+
+read_cache = ReadCache()
+_data_versions = {}
+_versions_lock = threading.Lock()
+_stored_versions = {}  # user_id -> última versão gravada vista por sync_data_version
+
+def data_version(user_id):
+    return _data_versions.get(user_id, 0)
+
+def _bump_local(user_id):
+    with _versions_lock:
+        _data_versions[user_id] = _data_versions.get(user_id, 0) + 1
+
+def _store_data_versions(conn, user_ids):
+    # Versão gravada no banco (data_versions, no mesmo arquivo dos dados): vale entre processos,
+    # ao contrário da versão em memória
+    conn.executemany("""
+        INSERT INTO data_versions (user_id, version) VALUES (?, 1)
+        ON CONFLICT (user_id) DO UPDATE SET version = version + 1
+    """, [(u,) for u in user_ids])
+
+def bump_data_version(user_id):
+    """Marca os dados do usuário como alterados: neste processo (cache) e no banco (ETag da API, outros processos)."""
+    with connection(user_id=user_id) as conn:
+        _store_data_versions(conn, [user_id])
+    _bump_local(user_id)
+
+def sync_data_version(user_id):
+    """Versão gravada dos dados do usuário (0 se ele nunca escreveu). Se mudou desde a última consulta
+    (escrita de outro processo), a versão em memória também muda e o cache deixa de usar leituras antigas."""
+    with connection(user_id=user_id) as conn:
+        row = conn.execute("SELECT version FROM data_versions WHERE user_id = ?", (user_id,)).fetchone()
+    version = row[0] if row else 0
+    with _versions_lock:
+        changed = _stored_versions.get(user_id, version) != version
+        _stored_versions[user_id] = version
+    if changed:
+        _bump_local(user_id)
+    return version
+
+def cache_stats():
+    return read_cache.stats()
+
+def _copy_result(value):
+    # DataFrames em cache são copiados para que quem chama possa alterá-los livremente
+    if isinstance(value, pd.DataFrame):
+        return value.copy()
+    if isinstance(value, tuple):
+        items = [_copy_result(v) for v in value]
+        return value._make(items) if hasattr(value, "_fields") else tuple(items)
+    return value
+
+def cached_read(func):
+    signature = inspect.signature(func)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not read_cache.enabled:
+            return func(*args, **kwargs)
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        user_id = bound.arguments["user_id"]
+        key = (func.__name__, data_version(user_id), tuple(bound.arguments.items()))
+        found, value = read_cache.get(key)
+        if not found:
+            value = func(*args, **kwargs)
+            read_cache.put(key, value)
+        return _copy_result(value)
+    return wrapper
+
+def invalidates(func):
+    signature = inspect.signature(func)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        user_id = signature.bind(*args, **kwargs).arguments["user_id"]
+        touched = getattr(_writer_local, "touched", None)
+        if touched is not None:
+            # Já na thread de escrita (operação do lote ou escrita aninhada): roda ali mesmo
+            if SHARDS and user_id not in touched:
+                _check_moved(_writer_local.conn, user_id)
+            touched.add(user_id)
+            return func(*args, **kwargs)
+        if WRITE_QUEUE:
+            while True:
+                try:
+                    return get_writer(shard_path(user_id)).submit(wrapper, *args, **kwargs).result()
+                except ShardMoved as moved:
+                    # O mapa deste processo estava velho (ou o move caiu antes de atualizar o diretório)
+                    _record_placement(user_id, moved.shard)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            # Incrementa mesmo em caso de erro: a escrita pode ter sido parcial
+            bump_data_version(user_id)
+    return wrapper
+
+# --- Caminho Analítico ---
+# Relatórios pesados (agregações sobre todo o histórico, por categoria) marcados com @analytical rodam
+# numa cópia colunar dos dados em DuckDB (olap.py), longe das leituras e escritas interativas do SQLite.
+# Os relatórios leem os totais pré-agregados por mês e categoria (category_totals), então o custo cresce
+# com meses x categorias, não com o número de lançamentos. Em "auto", só usuários com pelo menos
+# ANALYTICS_MIN_ROWS linhas agregadas vão para o DuckDB: abaixo disso o SQLite responde mais rápido do
+# que custa carregar a cópia. Sem o pacote duckdb, tudo fica no SQLite.
+ANALYTICS_ENGINE = os.environ.get("FINANCE_ANALYTICS", "auto")  # auto | duckdb | sqlite
+ANALYTICS_MIN_ROWS = int(os.environ.get("FINANCE_ANALYTICS_MIN_ROWS", "50000"))
+
+def history_rows(user_id):
+    """Linhas de category_totals do usuário (meses x categorias com lançamentos)."""
+    with connection(user_id=user_id) as conn:
+        return conn.execute("SELECT COUNT(*) FROM category_totals WHERE user_id = ?", (user_id,)).fetchone()[0]
+
+def analytical_engine(user_id=None):
+    """Módulo que atende os relatórios analíticos (olap) ou None para usar o SQLite."""
+    if ANALYTICS_ENGINE == "sqlite":
+        return None
+    import olap
+    if not olap.available():
+        if ANALYTICS_ENGINE == "duckdb":
+            raise RuntimeError("FINANCE_ANALYTICS=duckdb requer o pacote duckdb")
+        return None
+    if ANALYTICS_ENGINE == "auto" and user_id is not None and history_rows(user_id) < ANALYTICS_MIN_ROWS:
+        return None
+    return olap
+
+def analytical(func):
+    signature = inspect.signature(func)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        engine = analytical_engine(signature.bind(*args, **kwargs).arguments["user_id"])
+        if engine is None:
+            return func(*args, **kwargs)
+        return getattr(engine, func.__name__)(*args, **kwargs)
+    return wrapper
+
+# --- Senhas ---
+BCRYPT_ROUNDS = int(os.environ.get("FINANCE_BCRYPT_ROUNDS", "12"))
+HASH_WORKERS = int(os.environ.get("FINANCE_HASH_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+
+# bcrypt libera o GIL: o pool limita quantos hashes rodam ao mesmo tempo, então uma rajada
+# de logins ocupa no máximo HASH_WORKERS núcleos e as demais sessões continuam respondendo
+_hash_pool = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="bcrypt")
+_dummy_hash = None
+
+def _password_bytes(password):
+    # bcrypt considera no máximo 72 bytes
+    return password.encode("utf-8")[:72]
+
+def _legacy_hash(password):
     return hashlib.sha256(str.encode(password)).hexdigest()
 
-def init_db():
-    conn = get_connection()
-    cursor = conn.cursor()
-    
+def hash_password(password, rounds=None):
+    salt = bcrypt.gensalt(rounds or BCRYPT_ROUNDS)
+    return _hash_pool.submit(bcrypt.hashpw, _password_bytes(password), salt).result().decode()
+
+def verify_password(password, stored):
+    if stored.startswith("$2"):
+        return _hash_pool.submit(bcrypt.checkpw, _password_bytes(password), stored.encode()).result()
+    # Hash legado: SHA-256 sem salt
+    return hmac.compare_digest(_legacy_hash(password), stored)
+
+def needs_rehash(stored):
+    return not stored.startswith("$2") or int(stored.split("$")[2]) != BCRYPT_ROUNDS
+
+# --- Esquema e Migrações ---
+# Cada migração roda uma única vez, em ordem, e fica registrada em schema_version.
+# Bancos antigos (criados só com CREATE TABLE IF NOT EXISTS) são atualizados no lugar.
+def _migration_001_base_tables(cursor):
     # Tabela de Usuários
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS users (
@@ -27,7 +649,7 @@ def init_db():
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
     ''')
-    
+
     # Tabela de Recuperação de Senha
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS password_resets (
@@ -37,7 +659,7 @@ def init_db():
             expires_at TIMESTAMP NOT NULL
         )
     ''')
-    
+
     # Tabelas Financeiras com user_id obrigatório
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS incomes (
@@ -52,7 +674,7 @@ def init_db():
             FOREIGN KEY (user_id) REFERENCES users (id)
         )
     ''')
-    
+
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS expenses (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -66,7 +688,7 @@ def init_db():
             FOREIGN KEY (user_id) REFERENCES users (id)
         )
     ''')
-    
+
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS investments (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -93,214 +715,1143 @@ def init_db():
             FOREIGN KEY (user_id) REFERENCES users (id)
         )
     ''')
-    
-    conn.commit()
-    conn.close()
+
+def _migration_002_indexes(cursor):
+    # Índices compostos que cobrem os filtros por usuário/período e as somas de valor
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_incomes_user_period ON incomes (user_id, year, month, value)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_expenses_user_period ON expenses (user_id, year, month, value)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_investments_user_period ON investments (user_id, year, month, amount)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_goals_user ON goals (user_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_users_username ON users (username)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_password_resets_email ON password_resets (email)")
+
+# Tabela de origem -> (coluna de valor, coluna em monthly_totals)
+ROLLUP_SOURCES = {
+    "incomes": ("value", "income"),
+    "expenses": ("value", "expense"),
+    "investments": ("amount", "investment"),
+}
+
+def _create_rollup_triggers(cursor):
+    # Mantém monthly_totals na mesma transação de cada INSERT/UPDATE/DELETE nas tabelas de origem
+    for table, (value_col, total_col) in ROLLUP_SOURCES.items():
+        add = f"""
+            INSERT INTO monthly_totals (user_id, year, month, {total_col}, n_rows)
+            VALUES (NEW.user_id, NEW.year, NEW.month, NEW.{value_col}, 1)
+            ON CONFLICT (user_id, year, month)
+            DO UPDATE SET {total_col} = {total_col} + excluded.{total_col}, n_rows = n_rows + 1;
+        """
+        remove = f"""
+            UPDATE monthly_totals SET {total_col} = {total_col} - OLD.{value_col}, n_rows = n_rows - 1
+            WHERE user_id = OLD.user_id AND year = OLD.year AND month = OLD.month;
+            DELETE FROM monthly_totals
+            WHERE user_id = OLD.user_id AND year = OLD.year AND month = OLD.month AND n_rows <= 0;
+        """
+        cursor.execute(f"DROP TRIGGER IF EXISTS trg_{table}_rollup_insert")
+        cursor.execute(f"DROP TRIGGER IF EXISTS trg_{table}_rollup_delete")
+        cursor.execute(f"DROP TRIGGER IF EXISTS trg_{table}_rollup_update")
+        cursor.execute(f"CREATE TRIGGER trg_{table}_rollup_insert AFTER INSERT ON {table} BEGIN {add} END")
+        cursor.execute(f"CREATE TRIGGER trg_{table}_rollup_delete AFTER DELETE ON {table} BEGIN {remove} END")
+        cursor.execute(f"""CREATE TRIGGER trg_{table}_rollup_update
+            AFTER UPDATE OF user_id, year, month, {value_col} ON {table} BEGIN {remove} {add} END""")
+
+def _migration_003_monthly_totals(cursor):
+    # Totais mensais pré-agregados: resumo anual e métricas mensais leem 12 linhas em vez dos lançamentos
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS monthly_totals (
+            user_id INTEGER NOT NULL,
+            year INTEGER NOT NULL,
+            month INTEGER NOT NULL,
+            income REAL NOT NULL DEFAULT 0,
+            expense REAL NOT NULL DEFAULT 0,
+            investment REAL NOT NULL DEFAULT 0,
+            n_rows INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, year, month)
+        ) WITHOUT ROWID
+    ''')
+    _create_rollup_triggers(cursor)
+    _rebuild_monthly_totals(cursor)
+
+# Tabela de lançamentos -> coluna de nome usada nas regras de recorrência (investimentos usam a categoria)
+ENTRY_NAME_COLUMNS = {
+    "incomes": "source_name",
+    "expenses": "description",
+    "investments": None,
+}
+
+def _migration_004_recurrences(cursor):
+    # Regras de recorrência: uma linha por item recorrente, expandida virtualmente nas consultas.
+    # Períodos são numerados como year * 12 + (month - 1); end_period NULL = sem data de término.
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS recurrences (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            kind TEXT NOT NULL CHECK (kind IN ('income', 'expense', 'investment')),
+            description TEXT,
+            value REAL NOT NULL,
+            category TEXT,
+            start_period INTEGER NOT NULL,
+            end_period INTEGER,
+            interval_months INTEGER NOT NULL DEFAULT 1 CHECK (interval_months >= 1),
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+    # Exceções por mês: skip = 1 remove a ocorrência; value substitui o valor da regra
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS recurrence_overrides (
+            recurrence_id INTEGER NOT NULL,
+            period INTEGER NOT NULL,
+            value REAL,
+            skip INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (recurrence_id, period),
+            FOREIGN KEY (recurrence_id) REFERENCES recurrences (id)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_recurrences_user ON recurrences (user_id, kind, start_period)")
+
+    # Converte as 12 linhas replicadas de cada item recorrente em regras (uma por sequência de meses)
+    for table, (value_col, kind) in ROLLUP_SOURCES.items():
+        name_col = ENTRY_NAME_COLUMNS[table] or "category"
+        rows = cursor.execute(f"""
+            SELECT user_id, {name_col}, category, {value_col}, year * 12 + month - 1
+            FROM {table} WHERE is_recurring = 1
+        """).fetchall()
+        series = {}
+        for user_id, name, category, value, period in rows:
+            series.setdefault((user_id, name, category, value), []).append(period)
+        for (user_id, name, category, value), periods in series.items():
+            periods.sort()
+            # Itens cadastrados em duplicidade geram períodos repetidos: cada cópia vira uma regra própria
+            while periods:
+                unique = sorted(set(periods))
+                for p in unique:
+                    periods.remove(p)
+                start = prev = unique[0]
+                for p in unique[1:] + [None]:
+                    if p is not None and p == prev + 1:
+                        prev = p
+                        continue
+                    cursor.execute("""
+                        INSERT INTO recurrences (user_id, kind, description, value, category, start_period, end_period)
+                        VALUES (?, ?, ?, ?, ?, ?, ?)
+                    """, (user_id, kind, None if ENTRY_NAME_COLUMNS[table] is None else name, value, category, start, prev))
+                    start = prev = p
+        cursor.execute(f"DELETE FROM {table} WHERE is_recurring = 1")
+
+def _migration_005_import_hash(cursor):
+    # Impressão digital de 64 bits (data, valor, descrição) das linhas importadas de extratos: evita duplicar reimportações
+    for table in ("incomes", "expenses"):
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN import_hash INTEGER")
+        cursor.execute(f"""CREATE UNIQUE INDEX IF NOT EXISTS idx_{table}_import_hash
+            ON {table} (user_id, import_hash) WHERE import_hash IS NOT NULL""")
+
+# Tabela -> colunas de dinheiro, guardadas em centavos (INTEGER) a partir da migração 6
+MONEY_COLUMNS = {
+    "incomes": ("value",),
+    "expenses": ("value",),
+    "investments": ("amount",),
+    "goals": ("target_value", "current_value"),
+    "recurrences": ("value",),
+    "recurrence_overrides": ("value",),
+    "monthly_totals": ("income", "expense", "investment"),
+}
+
+def _migration_006_integer_cents(cursor):
+    # Valores em centavos inteiros: somas exatas, sem o erro acumulado do ponto flutuante.
+    # O SQLite não muda o tipo de uma coluna, então cada tabela é recriada a partir do próprio DDL.
+    for table in ROLLUP_SOURCES:
+        for event in ("insert", "delete", "update"):
+            cursor.execute(f"DROP TRIGGER IF EXISTS trg_{table}_rollup_{event}")
+    for table, money in MONEY_COLUMNS.items():
+        ddl = cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()[0]
+        indexes = [sql for (sql,) in cursor.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL", (table,))]
+        columns = [row[1] for row in cursor.execute(f"PRAGMA table_info({table})")]
+        ddl = ddl.replace(f"CREATE TABLE {table}", f"CREATE TABLE {table}_cents", 1)
+        for col in money:
+            ddl = re.sub(rf"\b{col} REAL\b", f"{col} INTEGER", ddl)
+        select = ", ".join(f"CAST(ROUND({c} * 100) AS INTEGER)" if c in money else c for c in columns)
+        cursor.execute(ddl)
+        cursor.execute(f"INSERT INTO {table}_cents ({', '.join(columns)}) SELECT {select} FROM {table}")
+        cursor.execute(f"DROP TABLE {table}")
+        cursor.execute(f"ALTER TABLE {table}_cents RENAME TO {table}")
+        for sql in indexes:
+            cursor.execute(sql)
+    _create_rollup_triggers(cursor)
+    # Arredondar cada lançamento e depois somar pode diferir em 1 centavo do total arredondado
+    _rebuild_monthly_totals(cursor)
+
+def _migration_007_goal_links(cursor):
+    # Investimentos (avulsos e regras) passam a apontar para a meta que alimentam; o progresso da meta
+    # é a soma desses aportes pelo índice parcial abaixo. goals.current_value deixa de ser incrementado
+    # e vira o saldo inicial da meta: nos bancos antigos ele já contém os aportes lançados até aqui,
+    # que não têm vínculo registrado, então nada é contado duas vezes.
+    for table in ("investments", "recurrences"):
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN goal_id INTEGER REFERENCES goals (id)")
+    cursor.execute("""CREATE INDEX IF NOT EXISTS idx_investments_goal
+        ON investments (goal_id, year, month, amount) WHERE goal_id IS NOT NULL""")
+    cursor.execute("""CREATE INDEX IF NOT EXISTS idx_recurrences_goal
+        ON recurrences (goal_id) WHERE goal_id IS NOT NULL""")
+
+def _create_category_triggers(cursor):
+    # Mesmo esquema de monthly_totals, com uma linha por (mês, tipo, categoria). Categoria nula vira 'Geral'
+    # (a chave primária não iguala NULLs, e é assim que os relatórios já a exibem).
+    for table, (value_col, kind) in ROLLUP_SOURCES.items():
+        add = f"""
+            INSERT INTO category_totals (user_id, year, month, kind, category, total, n_rows)
+            VALUES (NEW.user_id, NEW.year, NEW.month, '{kind}', COALESCE(NEW.category, 'Geral'), NEW.{value_col}, 1)
+            ON CONFLICT (user_id, year, month, kind, category)
+            DO UPDATE SET total = total + excluded.total, n_rows = n_rows + 1;
+        """
+        key = f"user_id = OLD.user_id AND year = OLD.year AND month = OLD.month AND kind = '{kind}' AND category = COALESCE(OLD.category, 'Geral')"
+        remove = f"""
+            UPDATE category_totals SET total = total - OLD.{value_col}, n_rows = n_rows - 1 WHERE {key};
+            DELETE FROM category_totals WHERE {key} AND n_rows <= 0;
+        """
+        for event in ("insert", "delete", "update"):
+            cursor.execute(f"DROP TRIGGER IF EXISTS trg_{table}_category_{event}")
+        cursor.execute(f"CREATE TRIGGER trg_{table}_category_insert AFTER INSERT ON {table} BEGIN {add} END")
+        cursor.execute(f"CREATE TRIGGER trg_{table}_category_delete AFTER DELETE ON {table} BEGIN {remove} END")
+        cursor.execute(f"""CREATE TRIGGER trg_{table}_category_update
+            AFTER UPDATE OF user_id, year, month, category, {value_col} ON {table} BEGIN {remove} {add} END""")
+
+def _migration_008_category_totals(cursor):
+    # Totais por categoria pré-agregados: os relatórios por categoria leem no máximo
+    # meses x categorias linhas, qualquer que seja o número de lançamentos do período
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS category_totals (
+            user_id INTEGER NOT NULL,
+            year INTEGER NOT NULL,
+            month INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            category TEXT NOT NULL,
+            total INTEGER NOT NULL DEFAULT 0,
+            n_rows INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, year, month, kind, category)
+        ) WITHOUT ROWID
+    ''')
+    _create_category_triggers(cursor)
+    _rebuild_category_totals(cursor)
+
+def _migration_009_data_version(cursor):
+    # Versão dos dados de cada usuário, incrementada a cada escrita (uma vez por lote da fila de escrita).
+    # É o ETag da API e permite a outro processo saber que seu cache daquele usuário envelheceu.
+    cursor.execute("ALTER TABLE users ADD COLUMN data_version INTEGER NOT NULL DEFAULT 0")
+
+def _migration_010_shards(cursor):
+    # Preparação para os shards por usuário (FINANCE_SHARDS). A versão dos dados passa para data_versions,
+    # que fica no mesmo arquivo dos lançamentos (com shards, users fica no diretório); users.data_version
+    # deixa de ser usada. user_shards só tem linhas no diretório; moved_users marca, no arquivo de origem,
+    # os usuários movidos para outro shard.
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS data_versions (
+            user_id INTEGER PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    cursor.execute("INSERT OR IGNORE INTO data_versions (user_id, version) SELECT id, data_version FROM users WHERE data_version > 0")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS user_shards (
+            user_id INTEGER PRIMARY KEY,
+            shard INTEGER NOT NULL
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS moved_users (
+            user_id INTEGER PRIMARY KEY,
+            shard INTEGER NOT NULL,
+            moved_at REAL NOT NULL
+        )
+    """)
+
+def _migration_011_drop_user_data_version(cursor):
+    # users.data_version ficou sem uso depois da migração 10. Sem depender do DROP COLUMN (SQLite 3.35+),
+    # a tabela é recriada sem a coluna, como na migração 6; o contador do AUTOINCREMENT é mantido para
+    # que ids de usuários removidos (ainda citados em user_shards e moved_users) não sejam reaproveitados.
+    columns = [row[1] for row in cursor.execute("PRAGMA table_info(users)")]
+    if "data_version" not in columns:
+        return
+    cursor.execute("INSERT OR IGNORE INTO data_versions (user_id, version) SELECT id, data_version FROM users WHERE data_version > 0")
+    columns.remove("data_version")
+    ddl = cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'users'").fetchone()[0]
+    indexes = [sql for (sql,) in cursor.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'index' AND tbl_name = 'users' AND sql IS NOT NULL")]
+    sequence = cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'users'").fetchone()
+    ddl = ddl.replace("CREATE TABLE users", "CREATE TABLE users_new", 1)
+    ddl = re.sub(r",\s*data_version INTEGER NOT NULL DEFAULT 0", "", ddl)
+    cursor.execute(ddl)
+    cursor.execute(f"INSERT INTO users_new ({', '.join(columns)}) SELECT {', '.join(columns)} FROM users")
+    cursor.execute("DROP TABLE users")
+    cursor.execute("ALTER TABLE users_new RENAME TO users")
+    for sql in indexes:
+        cursor.execute(sql)
+    if sequence is not None:
+        cursor.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'users'", sequence)
+
+MIGRATIONS = [
+    (1, _migration_001_base_tables),
+    (2, _migration_002_indexes),
+    (3, _migration_003_monthly_totals),
+    (4, _migration_004_recurrences),
+    (5, _migration_005_import_hash),
+    (6, _migration_006_integer_cents),
+    (7, _migration_007_goal_links),
+    (8, _migration_008_category_totals),
+    (9, _migration_009_data_version),
+    (10, _migration_010_shards),
+    (11, _migration_011_drop_user_data_version),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+def get_schema_version(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    return conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+
+def migrate(conn):
+    """Aplica as migrações pendentes, cada uma em sua própria transação. Retorna a versão final."""
+    version = get_schema_version(conn)
+    for target, migration in MIGRATIONS:
+        if target <= version:
+            continue
+        # BEGIN IMMEDIATE serializa processos migrando ao mesmo tempo; a versão é relida após o lock
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if get_schema_version(conn) >= target:
+                conn.rollback()
+                continue
+            migration(conn.cursor())
+            conn.execute("INSERT INTO schema_version (version) VALUES (?)", (target,))
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        version = target
+    return version
+
+# Versão do schema já confirmada neste processo, por arquivo de banco
+_schema_checked = {}
+_schema_lock = threading.Lock()
+
+def init_db(path=None):
+    """Aplica as migrações pendentes uma vez por processo; chamadas seguintes não tocam no banco.
+    Sem path (ou com DB_NAME), migra também todos os shards."""
+    path = path or DB_NAME
+    if path == DB_NAME and SHARDS:
+        for shard in range(SHARDS):
+            init_db(shard_file(shard))
+    if _schema_checked.get(path) == SCHEMA_VERSION:
+        return SCHEMA_VERSION
+    with _schema_lock:
+        if _schema_checked.get(path) != SCHEMA_VERSION:
+            with connection(path) as conn:
+                _schema_checked[path] = migrate(conn)
+        return _schema_checked[path]
 
 # --- Funções de Usuário ---
+# Usuários com acesso à página de diagnóstico (nomes separados por vírgula)
+ADMINS = {name.strip() for name in os.environ.get("FINANCE_ADMINS", "").split(",") if name.strip()}
+
+def is_admin(username):
+    return username in ADMINS
+
 def create_user(username, email, password):
-    conn = get_connection()
-    cursor = conn.cursor()
+    # O hash (lento) é calculado antes de pegar uma conexão do pool
+    hashed = hash_password(password)
     try:
-        cursor.execute("INSERT INTO users (username, email, password) VALUES (?, ?, ?)", 
-                       (username, email, hash_password(password)))
-        conn.commit()
+        with connection() as conn:
+            user_id = conn.execute("INSERT INTO users (username, email, password) VALUES (?, ?, ?)", 
+                                   (username, email, hashed)).lastrowid
+            if SHARDS:
+                conn.execute("INSERT OR REPLACE INTO user_shards (user_id, shard) VALUES (?, ?)", (user_id, hash_shard(user_id)))
         return True
     except sqlite3.IntegrityError:
         return False
-    finally:
-        conn.close()
 
 def login_user(email_or_user, password):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, username FROM users WHERE (email = ? OR username = ?) AND password = ?", 
-                   (email_or_user, email_or_user, hash_password(password)))
-    user = cursor.fetchone()
-    conn.close()
-    return user if user else None
+    global _dummy_hash
+    with connection() as conn:
+        # Busca indexada (email UNIQUE, idx_users_username); a senha é conferida fora do SQL
+        candidates = conn.execute("SELECT id, username, password FROM users WHERE email = ? OR username = ?", 
+                                  (email_or_user, email_or_user)).fetchall()
+    if not candidates:
+        # Mesmo custo de um login real, para não revelar se o usuário existe
+        _dummy_hash = _dummy_hash or hash_password("")
+        verify_password(password, _dummy_hash)
+        return None
+    for user_id, username, stored in candidates:
+        if verify_password(password, stored):
+            if needs_rehash(stored):
+                # Migração transparente de SHA-256 (ou de outro custo) para bcrypt com BCRYPT_ROUNDS
+                rehashed = hash_password(password)
+                with connection() as conn:
+                    conn.execute("UPDATE users SET password = ? WHERE id = ? AND password = ?", 
+                                 (rehashed, user_id, stored))
+            return (user_id, username)
+    return None
 
 # --- Recuperação de Senha ---
 def generate_reset_code(email):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT id FROM users WHERE email = ?", (email,))
-    if not cursor.fetchone():
-        conn.close()
-        return None
-    code = ''.join(random.choices(string.digits, k=6))
-    expires_at = datetime.now() + timedelta(minutes=15)
-    cursor.execute("INSERT INTO password_resets (email, code, expires_at) VALUES (?, ?, ?)", 
-                   (email, code, expires_at))
-    conn.commit()
-    conn.close()
+    with connection() as conn:
+        if not conn.execute("SELECT id FROM users WHERE email = ?", (email,)).fetchone():
+            return None
+        code = ''.join(random.choices(string.digits, k=6))
+        expires_at = datetime.now() + timedelta(minutes=15)
+        conn.execute("INSERT INTO password_resets (email, code, expires_at) VALUES (?, ?, ?)", 
+                     (email, code, expires_at))
     return code
 
 def verify_reset_code(email, code):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT id FROM password_resets WHERE email = ? AND code = ? AND expires_at > ?", 
-                   (email, code, datetime.now()))
-    reset = cursor.fetchone()
-    conn.close()
+    with connection() as conn:
+        reset = conn.execute("SELECT id FROM password_resets WHERE email = ? AND code = ? AND expires_at > ?", 
+                             (email, code, datetime.now())).fetchone()
     return True if reset else False
 
 def reset_password(email, new_password):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("UPDATE users SET password = ? WHERE email = ?", (hash_password(new_password), email))
-    cursor.execute("DELETE FROM password_resets WHERE email = ?", (email,))
-    conn.commit()
-    conn.close()
+    hashed = hash_password(new_password)
+    with connection() as conn:
+        conn.execute("UPDATE users SET password = ? WHERE email = ?", (hashed, email))
+        conn.execute("DELETE FROM password_resets WHERE email = ?", (email,))
     return True
 
 # --- Funções de Dados (ISOLAMENTO GARANTIDO POR user_id) ---
+# Todos os valores monetários entram e saem em centavos (int); a conversão para reais fica em utils
+
+def to_period(month, year):
+    return year * 12 + month - 1
+
+def from_period(period):
+    return period % 12 + 1, period // 12
+
+# Condição de ocorrência de uma regra (alias r) no período informado
+_RECURRENCE_ACTIVE = """
+    r.start_period <= {p} AND (r.end_period IS NULL OR r.end_period >= {p})
+    AND ({p} - r.start_period) % r.interval_months = 0
+"""
+
+def _entries_query(table, compact):
+    value_col, _ = ROLLUP_SOURCES[table]
+    name_col = ENTRY_NAME_COLUMNS[table]
+    name, r_name = (f"{name_col}, ", "r.description, ") if name_col else ("", "")
+    if compact:
+        # Versão enxuta (tela Mensal): só as colunas exibidas
+        select = f"id, {name}{value_col}, category"
+        r_select = f"NULL, {r_name}COALESCE(o.value, r.value), r.category"
+    else:
+        select = f"id, user_id, {name}{value_col}, category, is_recurring, month, year"
+        r_select = f"NULL, r.user_id, {r_name}COALESCE(o.value, r.value), r.category, 1, :month, :year"
+    # Lançamentos do mês + ocorrências virtuais das regras de recorrência (recurrence_id preenchido)
+    return f"""
+        SELECT {select}, NULL AS recurrence_id
+        FROM {table} WHERE user_id = :user_id AND month = :month AND year = :year
+        UNION ALL
+        SELECT {r_select}, r.id
+        FROM recurrences r
+        LEFT JOIN recurrence_overrides o ON o.recurrence_id = r.id AND o.period = :period
+        WHERE r.user_id = :user_id AND r.kind = :kind AND {_RECURRENCE_ACTIVE.format(p=":period")}
+          AND COALESCE(o.skip, 0) = 0
+    """
+
+def _entries_params(table, user_id, month, year):
+    return {"user_id": user_id, "month": month, "year": year, "period": to_period(month, year),
+            "kind": ROLLUP_SOURCES[table][1]}
+
+def _read_entries(conn, table, user_id, month, year, compact=False, limit=None, offset=0):
+    query, params = _entries_query(table, compact), _entries_params(table, user_id, month, year)
+    if limit is not None:
+        # Página estável: lançamentos avulsos por id, depois as ocorrências recorrentes por regra
+        query = f"SELECT * FROM ({query}) ORDER BY recurrence_id IS NOT NULL, id, recurrence_id LIMIT :limit OFFSET :offset"
+        params.update(limit=limit, offset=offset)
+    dtype = {"id": "Int64", "recurrence_id": "Int64", ROLLUP_SOURCES[table][0]: "int64"} if compact else None
+    return pd.read_sql_query(query, conn, params=params, dtype=dtype)
+
+def _count_entries(conn, table, user_id, month, year):
+    return conn.execute(f"SELECT COUNT(*) FROM ({_entries_query(table, True)})",
+                        _entries_params(table, user_id, month, year)).fetchone()[0]
+
+def _get_entries(table, user_id, month, year):
+    with connection(user_id=user_id) as conn:
+        return _read_entries(conn, table, user_id, month, year)
+
+# Totais de cada período em [:start, :end] com lançamentos ou ocorrências (rollup mensal + regras).
+# Parâmetros: user_id, start, end, first_year, last_year; meses vazios não aparecem.
+PERIOD_TOTALS_QUERY = f"""
+    WITH RECURSIVE periods (period) AS (
+        SELECT :start UNION ALL SELECT period + 1 FROM periods WHERE period < :end
+    )
+    SELECT period, SUM(income) AS income, SUM(expense) AS expense, SUM(investment) AS investment FROM (
+        SELECT year * 12 + month - 1 AS period, income, expense, investment FROM monthly_totals
+        WHERE user_id = :user_id AND year BETWEEN :first_year AND :last_year
+          AND year * 12 + month - 1 BETWEEN :start AND :end
+        UNION ALL
+        SELECT p.period,
+               CASE WHEN r.kind = 'income' THEN COALESCE(o.value, r.value) ELSE 0 END,
+               CASE WHEN r.kind = 'expense' THEN COALESCE(o.value, r.value) ELSE 0 END,
+               CASE WHEN r.kind = 'investment' THEN COALESCE(o.value, r.value) ELSE 0 END
+        FROM periods p
+        JOIN recurrences r ON r.user_id = :user_id AND {_RECURRENCE_ACTIVE.format(p="p.period")}
+        LEFT JOIN recurrence_overrides o ON o.recurrence_id = r.id AND o.period = p.period
+        WHERE COALESCE(o.skip, 0) = 0
+    )
+    GROUP BY period
+"""
+
+def period_params(user_id, start, end):
+    return {"user_id": user_id, "start": start, "end": end, "first_year": start // 12, "last_year": end // 12}
+
+def _read_period_totals(conn, user_id, start, end):
+    # Uma consulta para a janela toda; meses sem lançamentos ficam com zero
+    rows = conn.execute(PERIOD_TOTALS_QUERY, period_params(user_id, start, end)).fetchall()
+    totals = np.zeros((end - start + 1, 3), dtype=np.int64)
+    if rows:
+        found = np.array(rows, dtype=np.int64)
+        totals[found[:, 0] - start] = found[:, 1:]
+    return pd.DataFrame(totals, columns=["income", "expense", "investment"],
+                        index=pd.RangeIndex(start, end + 1, name="period"))
+
+def _period_totals(user_id, start, end):
+    """Totais (income, expense, investment) de cada período em [start, end]: rollup + recorrências."""
+    with connection(user_id=user_id) as conn:
+        return _read_period_totals(conn, user_id, start, end)
+
+def _check_goal(conn, user_id, goal_id):
+    # Vínculo só com meta do próprio usuário: um id de outro usuário somaria aportes ao progresso dele
+    if goal_id is not None and conn.execute("SELECT 1 FROM goals WHERE id = ? AND user_id = ?",
+                                            (goal_id, user_id)).fetchone() is None:
+        raise ValueError(f"meta inexistente: {goal_id}")
+
+@invalidates
+def add_recurrence(user_id, kind, description, value, category, month, year, occurrences=None, interval=1, goal_id=None):
+    """Cria uma regra recorrente a partir de month/year; occurrences=None não tem data de término."""
+    start = to_period(month, year)
+    end = None if occurrences is None else start + (occurrences - 1) * interval
+    with connection(user_id=user_id) as conn:
+        _check_goal(conn, user_id, goal_id)
+        cursor = conn.execute("""
+            INSERT INTO recurrences (user_id, kind, description, value, category, start_period, end_period, interval_months, goal_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (user_id, kind, description, value, category, start, end, interval, goal_id))
+        return cursor.lastrowid
+
+@cached_read
+def get_recurrences(user_id, kind=None):
+    with connection(user_id=user_id) as conn:
+        query = "SELECT * FROM recurrences WHERE user_id = ?" + (" AND kind = ?" if kind else "")
+        return pd.read_sql_query(query, conn, params=(user_id, kind) if kind else (user_id,))
+
+@invalidates
+def _set_override(recurrence_id, user_id, month, year, value=None, skip=0):
+    with connection(user_id=user_id) as conn:
+        # O SELECT garante que a regra pertence ao usuário
+        conn.execute("""
+            INSERT OR REPLACE INTO recurrence_overrides (recurrence_id, period, value, skip)
+            SELECT id, ?, ?, ? FROM recurrences WHERE id = ? AND user_id = ?
+        """, (to_period(month, year), value, skip, recurrence_id, user_id))
+
+def override_recurrence(recurrence_id, user_id, month, year, value):
+    # Altera o valor de uma única ocorrência
+    _set_override(recurrence_id, user_id, month, year, value=value)
 
-def add_income(user_id, source, value, category, month, year, is_recurring=0):
-    conn = get_connection()
-    cursor = conn.cursor()
-    for i in range(12 if is_recurring else 1):
-        m = (month + i - 1) % 12 + 1
-        y = year + (month + i - 1) // 12
-        cursor.execute("INSERT INTO incomes (user_id, source_name, value, category, is_recurring, month, year) VALUES (?, ?, ?, ?, ?, ?, ?)", 
-                       (user_id, source, value, category, is_recurring, m, y))
-    conn.commit()
-    conn.close()
+def skip_recurrence(recurrence_id, user_id, month, year):
+    # Remove uma única ocorrência (exceção)
+    _set_override(recurrence_id, user_id, month, year, skip=1)
 
+@invalidates
+def end_recurrence(recurrence_id, user_id, month, year):
+    # Encerra a regra: a última ocorrência passa a ser a anterior a month/year
+    with connection(user_id=user_id) as conn:
+        conn.execute("UPDATE recurrences SET end_period = ? WHERE id = ? AND user_id = ?", 
+                     (to_period(month, year) - 1, recurrence_id, user_id))
+
+@invalidates
+def delete_recurrence(recurrence_id, user_id):
+    with connection(user_id=user_id) as conn:
+        conn.execute("DELETE FROM recurrence_overrides WHERE recurrence_id IN (SELECT id FROM recurrences WHERE id = ? AND user_id = ?)", 
+                     (recurrence_id, user_id))
+        conn.execute("DELETE FROM recurrences WHERE id = ? AND user_id = ?", (recurrence_id, user_id))
+
+def _delete_recurrences_by_name(conn, user_id, kind, column, name):
+    ids = "SELECT id FROM recurrences WHERE user_id = ? AND kind = ? AND " + column + " = ?"
+    conn.execute(f"DELETE FROM recurrence_overrides WHERE recurrence_id IN ({ids})", (user_id, kind, name))
+    conn.execute("DELETE FROM recurrences WHERE user_id = ? AND kind = ? AND " + column + " = ?", (user_id, kind, name))
+
+@invalidates
+def add_income(user_id, source, value, category, month, year, is_recurring=0, occurrences=12):
+    if is_recurring:
+        return add_recurrence(user_id, "income", source, value, category, month, year, occurrences)
+    with connection(user_id=user_id) as conn:
+        conn.execute("INSERT INTO incomes (user_id, source_name, value, category, is_recurring, month, year) VALUES (?, ?, ?, ?, ?, ?, ?)", 
+                     (user_id, source, value, category, 0, month, year))
+
+@cached_read
 def get_incomes(user_id, month, year):
-    conn = get_connection()
     # Filtro obrigatório por user_id para evitar vazamento de dados
-    df = pd.read_sql_query("SELECT * FROM incomes WHERE user_id = ? AND month = ? AND year = ?", conn, params=(user_id, month, year))
-    conn.close()
-    return df
+    return _get_entries("incomes", user_id, month, year)
 
+@invalidates
 def delete_income(income_id, user_id, delete_all_recurring=False, source_name=None):
-    conn = get_connection()
-    cursor = conn.cursor()
-    if delete_all_recurring and source_name:
-        # Garante que só deleta itens do próprio usuário
-        cursor.execute("DELETE FROM incomes WHERE user_id = ? AND source_name = ? AND is_recurring = 1", (user_id, source_name))
-    else:
-        # Garante que só deleta o ID se pertencer ao usuário
-        cursor.execute("DELETE FROM incomes WHERE id = ? AND user_id = ?", (income_id, user_id))
-    conn.commit()
-    conn.close()
-
-def add_expense(user_id, description, value, category, month, year, is_recurring=0):
-    conn = get_connection()
-    cursor = conn.cursor()
-    for i in range(12 if is_recurring else 1):
-        m = (month + i - 1) % 12 + 1
-        y = year + (month + i - 1) // 12
-        cursor.execute("INSERT INTO expenses (user_id, description, value, category, is_recurring, month, year) VALUES (?, ?, ?, ?, ?, ?, ?)", 
-                       (user_id, description, value, category, is_recurring, m, y))
-    conn.commit()
-    conn.close()
+    with connection(user_id=user_id) as conn:
+        if delete_all_recurring and source_name:
+            # Garante que só deleta itens do próprio usuário (prefira delete_recurrence pelo id da regra)
+            _delete_recurrences_by_name(conn, user_id, "income", "description", source_name)
+        else:
+            # Garante que só deleta o ID se pertencer ao usuário
+            conn.execute("DELETE FROM incomes WHERE id = ? AND user_id = ?", (income_id, user_id))
+
+@invalidates
+def add_expense(user_id, description, value, category, month, year, is_recurring=0, occurrences=12):
+    if is_recurring:
+        return add_recurrence(user_id, "expense", description, value, category, month, year, occurrences)
+    with connection(user_id=user_id) as conn:
+        conn.execute("INSERT INTO expenses (user_id, description, value, category, is_recurring, month, year) VALUES (?, ?, ?, ?, ?, ?, ?)", 
+                     (user_id, description, value, category, 0, month, year))
 
+@cached_read
 def get_expenses(user_id, month, year):
-    conn = get_connection()
     # Filtro obrigatório por user_id
-    df = pd.read_sql_query("SELECT * FROM expenses WHERE user_id = ? AND month = ? AND year = ?", conn, params=(user_id, month, year))
-    conn.close()
-    return df
+    return _get_entries("expenses", user_id, month, year)
 
+@invalidates
 def delete_expense(expense_id, user_id, delete_all_recurring=False, description=None):
-    conn = get_connection()
-    cursor = conn.cursor()
-    if delete_all_recurring and description:
-        cursor.execute("DELETE FROM expenses WHERE user_id = ? AND description = ? AND is_recurring = 1", (user_id, description))
-    else:
-        cursor.execute("DELETE FROM expenses WHERE id = ? AND user_id = ?", (expense_id, user_id))
-    conn.commit()
-    conn.close()
-
-def add_investment(user_id, amount, category, month, year, is_recurring=0):
-    conn = get_connection()
-    cursor = conn.cursor()
-    for i in range(12 if is_recurring else 1):
-        m = (month + i - 1) % 12 + 1
-        y = year + (month + i - 1) // 12
-        cursor.execute("INSERT INTO investments (user_id, amount, category, is_recurring, month, year) VALUES (?, ?, ?, ?, ?, ?)", 
-                       (user_id, amount, category, is_recurring, m, y))
-    conn.commit()
-    conn.close()
+    with connection(user_id=user_id) as conn:
+        if delete_all_recurring and description:
+            _delete_recurrences_by_name(conn, user_id, "expense", "description", description)
+        else:
+            conn.execute("DELETE FROM expenses WHERE id = ? AND user_id = ?", (expense_id, user_id))
 
+@invalidates
+def add_investment(user_id, amount, category, month, year, is_recurring=0, occurrences=12, goal_id=None):
+    """goal_id vincula o aporte (ou todas as ocorrências da regra) a uma meta do usuário."""
+    if is_recurring:
+        return add_recurrence(user_id, "investment", None, amount, category, month, year, occurrences, goal_id=goal_id)
+    with connection(user_id=user_id) as conn:
+        _check_goal(conn, user_id, goal_id)
+        conn.execute("INSERT INTO investments (user_id, amount, category, is_recurring, month, year, goal_id) VALUES (?, ?, ?, ?, ?, ?, ?)", 
+                     (user_id, amount, category, 0, month, year, goal_id))
+
+@cached_read
 def get_investments(user_id, month, year):
-    conn = get_connection()
     # Filtro obrigatório por user_id
-    df = pd.read_sql_query("SELECT * FROM investments WHERE user_id = ? AND month = ? AND year = ?", conn, params=(user_id, month, year))
-    conn.close()
-    return df
+    return _get_entries("investments", user_id, month, year)
 
+@invalidates
 def delete_investment(inv_id, user_id, delete_all_recurring=False, category=None):
-    conn = get_connection()
-    cursor = conn.cursor()
-    if delete_all_recurring and category:
-        cursor.execute("DELETE FROM investments WHERE user_id = ? AND category = ? AND is_recurring = 1", (user_id, category))
-    else:
-        cursor.execute("DELETE FROM investments WHERE id = ? AND user_id = ?", (inv_id, user_id))
-    conn.commit()
-    conn.close()
+    with connection(user_id=user_id) as conn:
+        if delete_all_recurring and category:
+            _delete_recurrences_by_name(conn, user_id, "investment", "category", category)
+        else:
+            conn.execute("DELETE FROM investments WHERE id = ? AND user_id = ?", (inv_id, user_id))
 
+# Fica no SQLite mesmo com FINANCE_ANALYTICS=duckdb: o rollup mensal responde em ~1 ms, o DuckDB em ~7 ms
+@cached_read
 def get_annual_summary(user_id, year):
-    conn = get_connection()
-    # Todas as agregações filtradas por user_id
-    incomes = pd.read_sql_query("SELECT value, month FROM incomes WHERE user_id = ? AND year = ?", conn, params=(user_id, year))
-    expenses = pd.read_sql_query("SELECT value, month FROM expenses WHERE user_id = ? AND year = ?", conn, params=(user_id, year))
-    investments = pd.read_sql_query("SELECT amount, month FROM investments WHERE user_id = ? AND year = ?", conn, params=(user_id, year))
-    conn.close()
-    return incomes, expenses, investments
+    # 12 meses do ano: totais pré-agregados em monthly_totals + ocorrências recorrentes
+    totals = _period_totals(user_id, to_period(1, year), to_period(12, year))
+    totals.insert(0, "month", totals.index % 12 + 1)
+    return totals.reset_index(drop=True)
+
+# Totais por (período, tipo, categoria) em [:start, :end]: totais pré-agregados em category_totals
+# + ocorrências das regras de recorrência (expandidas mês a mês, como em _period_totals).
+CATEGORY_COLUMNS = ["period", "kind", "category", "total"]
+CATEGORY_TOTALS_QUERY = f"""
+    WITH RECURSIVE periods (period) AS (
+        SELECT :start UNION ALL SELECT period + 1 FROM periods WHERE period < :end
+    )
+    SELECT period, kind, category, SUM(value) AS total FROM (
+        SELECT year * 12 + month - 1 AS period, kind, category, total AS value
+        FROM category_totals WHERE user_id = :user_id AND year BETWEEN :first_year AND :last_year
+          AND year * 12 + month - 1 BETWEEN :start AND :end
+        UNION ALL
+        SELECT p.period, r.kind, COALESCE(r.category, 'Geral'), COALESCE(o.value, r.value)
+        FROM periods p
+        JOIN recurrences r ON r.user_id = :user_id AND {_RECURRENCE_ACTIVE.format(p="p.period")}
+        LEFT JOIN recurrence_overrides o ON o.recurrence_id = r.id AND o.period = p.period
+        WHERE COALESCE(o.skip, 0) = 0
+    )
+    GROUP BY period, kind, category
+    ORDER BY period, kind, category
+"""
+
+def category_frame(rows):
+    # Mesmo formato nos dois caminhos (SQLite e olap)
+    frame = pd.DataFrame(rows, columns=CATEGORY_COLUMNS)
+    return frame.astype({"period": "int64", "kind": object, "category": object, "total": "int64"})
+
+@cached_read
+@analytical
+def get_category_totals(user_id, start, end):
+    """Uma linha por (period, kind, category) com lançamentos ou ocorrências em [start, end], total em centavos."""
+    with connection(user_id=user_id) as conn:
+        return category_frame(conn.execute(CATEGORY_TOTALS_QUERY, period_params(user_id, start, end)).fetchall())
+
+@cached_read
+def get_month_totals(user_id, month, year):
+    period = to_period(month, year)
+    income, expense, investment = _period_totals(user_id, period, period).to_numpy()[0].tolist()
+    return income, expense, investment
 
+# Tudo o que a tela Mensal precisa, lido numa única transação (visão consistente do mês).
+# incomes/expenses/investments trazem só a página pedida; counts tem o total de linhas de cada lista.
+MonthSnapshot = namedtuple("MonthSnapshot", ["incomes", "expenses", "investments", "totals", "goals", "counts", "pages"])
+ENTRY_TABLES = ("incomes", "expenses", "investments")
+PAGE_SIZE = 50
+
+def page_count(rows, page_size=PAGE_SIZE):
+    return max(1, -(-rows // page_size))
+
+@cached_read
+def get_month_snapshot(user_id, month, year, pages=(1, 1, 1), page_size=PAGE_SIZE):
+    period = to_period(month, year)
+    frames, counts, used = [], [], []
+    with connection(user_id=user_id) as conn:
+        conn.execute("BEGIN")
+        for table, page in zip(ENTRY_TABLES, pages):
+            rows = _count_entries(conn, table, user_id, month, year)
+            # Página fora do intervalo (ex.: após excluir linhas ou trocar de mês) vira a última existente
+            page = min(max(int(page), 1), page_count(rows, page_size))
+            frames.append(_read_entries(conn, table, user_id, month, year, compact=True,
+                                        limit=page_size, offset=(page - 1) * page_size))
+            counts.append(rows)
+            used.append(page)
+        totals = _read_period_totals(conn, user_id, period, period).to_numpy()[0].tolist()
+        goals = pd.read_sql_query("SELECT id, name FROM goals WHERE user_id = ? ORDER BY id", conn, params=(user_id,))
+    return MonthSnapshot(*frames, tuple(totals), goals, tuple(counts), tuple(used))
+
+@cached_read
+def get_entries_page(table, user_id, month, year, page=1, page_size=PAGE_SIZE):
+    """Uma página (LIMIT/OFFSET) dos lançamentos do mês e o total de linhas: (DataFrame, total)."""
+    if table not in ENTRY_TABLES:
+        raise ValueError(f"tabela desconhecida: {table}")
+    with connection(user_id=user_id) as conn:
+        conn.execute("BEGIN")
+        rows = _count_entries(conn, table, user_id, month, year)
+        frame = _read_entries(conn, table, user_id, month, year, compact=True,
+                              limit=page_size, offset=(max(int(page), 1) - 1) * page_size)
+    return frame, rows
+
+# O SQLite antigo limita uma instrução a 999 parâmetros
+ID_BATCH = 900
+
+def _batches(ids):
+    ids = [int(i) for i in ids]
+    return [ids[i:i + ID_BATCH] for i in range(0, len(ids), ID_BATCH)]
+
+@invalidates
+def delete_entries(table, entry_ids, user_id):
+    """Exclui vários lançamentos do usuário numa única transação; devolve quantos foram removidos."""
+    if table not in ENTRY_TABLES:
+        raise ValueError(f"tabela desconhecida: {table}")
+    deleted = 0
+    with connection(user_id=user_id) as conn:
+        for batch in _batches(entry_ids):
+            marks = ", ".join("?" * len(batch))
+            deleted += conn.execute(f"DELETE FROM {table} WHERE id IN ({marks}) AND user_id = ?", (*batch, user_id)).rowcount
+    return deleted
+
+@invalidates
+def skip_recurrences(recurrence_ids, user_id, month, year):
+    # Remove a ocorrência de month/year de várias regras de uma vez
+    with connection(user_id=user_id) as conn:
+        for batch in _batches(recurrence_ids):
+            marks = ", ".join("?" * len(batch))
+            conn.execute(f"""
+                INSERT OR REPLACE INTO recurrence_overrides (recurrence_id, period, value, skip)
+                SELECT id, ?, NULL, 1 FROM recurrences WHERE id IN ({marks}) AND user_id = ?
+            """, (to_period(month, year), *batch, user_id))
+
+@invalidates
+def end_recurrences(recurrence_ids, user_id, month, year):
+    with connection(user_id=user_id) as conn:
+        for batch in _batches(recurrence_ids):
+            marks = ", ".join("?" * len(batch))
+            conn.execute(f"UPDATE recurrences SET end_period = ? WHERE id IN ({marks}) AND user_id = ?",
+                         (to_period(month, year) - 1, *batch, user_id))
+
+@cached_read
 def get_future_projection(user_id, start_month, start_year, periods=12):
-    conn = get_connection()
-    results = []
-    current_m, current_y = start_month, start_year
-    for _ in range(periods):
-        # Filtros por user_id garantidos em cada mês da projeção
-        inc = pd.read_sql_query("SELECT SUM(value) as total FROM incomes WHERE user_id = ? AND month = ? AND year = ?", conn, params=(user_id, current_m, current_y))['total'].iloc[0] or 0.0
-        exp = pd.read_sql_query("SELECT SUM(value) as total FROM expenses WHERE user_id = ? AND month = ? AND year = ?", conn, params=(user_id, current_m, current_y))['total'].iloc[0] or 0.0
-        inv = pd.read_sql_query("SELECT SUM(amount) as total FROM investments WHERE user_id = ? AND month = ? AND year = ?", conn, params=(user_id, current_m, current_y))['total'].iloc[0] or 0.0
-        results.append({
-            "Mês": current_m, 
-            "Ano": current_y, 
-            "Receita": inc, 
-            "Despesa": exp, 
-            "Investimento": inv, 
-            "Saldo": inc - exp
-        })
-        current_m += 1
-        if current_m > 12:
-            current_m = 1
-            current_y += 1
-    conn.close()
-    return pd.DataFrame(results)
+    # Períodos numerados como year * 12 + (month - 1): uma consulta por fonte cobre toda a janela
+    start = to_period(start_month, start_year)
+    totals = _period_totals(user_id, start, start + periods - 1)
+    result = pd.DataFrame({"Mês": totals.index % 12 + 1, "Ano": totals.index // 12})
+    result["Receita"] = totals["income"].to_numpy()
+    result["Despesa"] = totals["expense"].to_numpy()
+    result["Investimento"] = totals["investment"].to_numpy()
+    result["Saldo"] = result["Receita"] - result["Despesa"]
+    return result
+
+# --- Manutenção dos Totais Mensais ---
+_ROLLUP_FROM_RAW = """
+    SELECT user_id, year, month, SUM(inc) AS income, SUM(exp) AS expense, SUM(inv) AS investment, COUNT(*) AS n_rows
+    FROM (
+        SELECT user_id, year, month, value AS inc, 0 AS exp, 0 AS inv FROM incomes WHERE {where}
+        UNION ALL
+        SELECT user_id, year, month, 0, value, 0 FROM expenses WHERE {where}
+        UNION ALL
+        SELECT user_id, year, month, 0, 0, amount FROM investments WHERE {where}
+    )
+    GROUP BY user_id, year, month
+"""
+
+def _rebuild_monthly_totals(cursor, user_id=None):
+    where, params = ("user_id = ?", (user_id,) * 3) if user_id is not None else ("1", ())
+    if user_id is None:
+        cursor.execute("DELETE FROM monthly_totals")
+    else:
+        cursor.execute("DELETE FROM monthly_totals WHERE user_id = ?", (user_id,))
+    cursor.execute("INSERT INTO monthly_totals (user_id, year, month, income, expense, investment, n_rows) "
+                   + _ROLLUP_FROM_RAW.format(where=where), params)
+
+_CATEGORY_FROM_RAW = " UNION ALL ".join(f"""
+    SELECT user_id, year, month, '{kind}', COALESCE(category, 'Geral'), SUM({value_col}), COUNT(*)
+    FROM {table} WHERE {{where}} GROUP BY user_id, year, month, COALESCE(category, 'Geral')"""
+    for table, (value_col, kind) in ROLLUP_SOURCES.items())
+
+def _rebuild_category_totals(cursor, user_id=None):
+    where, params = ("user_id = ?", (user_id,) * 3) if user_id is not None else ("1", ())
+    if user_id is None:
+        cursor.execute("DELETE FROM category_totals")
+    else:
+        cursor.execute("DELETE FROM category_totals WHERE user_id = ?", (user_id,))
+    cursor.execute("INSERT INTO category_totals (user_id, year, month, kind, category, total, n_rows) "
+                   + _CATEGORY_FROM_RAW.format(where=where), params)
+
+def _maintenance_files(user_id):
+    # Um usuário: o arquivo dos dados dele; todos: cada arquivo, conferido separadamente
+    return data_files() if user_id is None else [shard_path(user_id)]
+
+def rebuild_monthly_totals(user_id=None):
+    """Recalcula monthly_totals e category_totals a partir das tabelas de lançamentos (todos os usuários ou um só)."""
+    for path in _maintenance_files(user_id):
+        with connection(path) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            _rebuild_monthly_totals(conn.cursor(), user_id)
+            _rebuild_category_totals(conn.cursor(), user_id)
+    read_cache.clear()
+
+def check_monthly_totals(user_id=None, tolerance=0):
+    """Compara monthly_totals com a agregação dos lançamentos e devolve as linhas divergentes."""
+    where, params = ("user_id = ?", (user_id,) * 3) if user_id is not None else ("1", ())
+    keys = ["user_id", "year", "month"]
+    divergent = []
+    for path in _maintenance_files(user_id):
+        with connection(path) as conn:
+            conn.execute("BEGIN")  # leitura consistente das duas fontes
+            raw = pd.read_sql_query(_ROLLUP_FROM_RAW.format(where=where), conn, params=params)
+            stored = pd.read_sql_query("SELECT * FROM monthly_totals" + (" WHERE user_id = ?" if user_id is not None else ""), 
+                                       conn, params=(user_id,) if user_id is not None else ())
+        merged = raw.merge(stored, on=keys, how="outer", suffixes=("_raw", "_stored")).fillna(0)
+        mismatch = merged["n_rows_raw"] != merged["n_rows_stored"]
+        for col in ("income", "expense", "investment"):
+            mismatch |= (merged[f"{col}_raw"] - merged[f"{col}_stored"]).abs() > tolerance
+        divergent.append(merged[mismatch])
+    return pd.concat(divergent, ignore_index=True)
+
+
+def check_category_totals(user_id=None):
+    """Compara category_totals com a agregação dos lançamentos e devolve as linhas divergentes."""
+    where, params = ("user_id = ?", (user_id,) * 3) if user_id is not None else ("1", ())
+    keys = ["user_id", "year", "month", "kind", "category"]
+    divergent = []
+    for path in _maintenance_files(user_id):
+        with connection(path) as conn:
+            conn.execute("BEGIN")
+            raw = pd.DataFrame(conn.execute(_CATEGORY_FROM_RAW.format(where=where), params).fetchall(),
+                               columns=keys + ["total", "n_rows"])
+            stored = pd.read_sql_query("SELECT * FROM category_totals" + (" WHERE user_id = ?" if user_id is not None else ""),
+                                       conn, params=(user_id,) if user_id is not None else ())
+        merged = raw.merge(stored, on=keys, how="outer", suffixes=("_raw", "_stored")).fillna(0)
+        mismatch = (merged["n_rows_raw"] != merged["n_rows_stored"]) | (merged["total_raw"] != merged["total_stored"])
+        divergent.append(merged[mismatch])
+    return pd.concat(divergent, ignore_index=True)
 
 # --- Funções de Metas ---
+@invalidates
 def add_goal(user_id, name, target_value, deadline=None):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("INSERT INTO goals (user_id, name, target_value, deadline) VALUES (?, ?, ?, ?)", 
-                   (user_id, name, target_value, deadline))
-    conn.commit()
-    conn.close()
+    with connection(user_id=user_id) as conn:
+        conn.execute("INSERT INTO goals (user_id, name, target_value, deadline) VALUES (?, ?, ?, ?)", 
+                     (user_id, name, target_value, deadline))
 
+# Aportes de cada meta até o período :now: investimentos avulsos vinculados (índice idx_investments_goal;
+# o "+" em +user_id deixa o filtro de dono fora da escolha do índice, que não cai no histórico inteiro)
+# + ocorrências já vencidas das regras vinculadas, contadas sem expandir as regras mês a mês
+# (exceções de valor e meses pulados entram como ajuste sobre valor x ocorrências).
+GOAL_PROGRESS_QUERY = f"""
+    SELECT g.id, COALESCE(i.total, 0) + COALESCE(r.total, 0) AS linked
+    FROM goals g
+    LEFT JOIN (
+        SELECT goal_id, SUM(amount) AS total FROM investments
+        WHERE +user_id = :user_id AND goal_id IN (SELECT id FROM goals WHERE user_id = :user_id)
+          AND year * 12 + month - 1 <= :now AND year <= :now / 12
+        GROUP BY goal_id
+    ) i ON i.goal_id = g.id
+    LEFT JOIN (
+        SELECT r.goal_id,
+               SUM(r.value * ((MIN(COALESCE(r.end_period, :now), :now) - r.start_period) / r.interval_months + 1)
+                   + COALESCE((SELECT SUM(CASE WHEN o.skip THEN 0 ELSE COALESCE(o.value, r.value) END - r.value)
+                               FROM recurrence_overrides o
+                               WHERE o.recurrence_id = r.id AND o.period <= :now AND {_RECURRENCE_ACTIVE.format(p="o.period")}), 0)
+               ) AS total
+        FROM recurrences r
+        WHERE r.user_id = :user_id AND r.kind = 'investment' AND r.goal_id IS NOT NULL AND r.start_period <= :now
+          AND COALESCE(r.end_period, r.start_period) >= r.start_period
+        GROUP BY r.goal_id
+    ) r ON r.goal_id = g.id
+    WHERE g.user_id = :user_id
+"""
+
+def current_period():
+    today = datetime.now()
+    return to_period(today.month, today.year)
+
+@cached_read
 def get_goals(user_id):
-    conn = get_connection()
-    df = pd.read_sql_query("SELECT * FROM goals WHERE user_id = ?", conn, params=(user_id,))
-    conn.close()
-    return df
+    """Metas do usuário; current_value é o progresso: saldo inicial (initial_value) + aportes vinculados até o mês atual."""
+    with connection(user_id=user_id) as conn:
+        goals = pd.read_sql_query("SELECT * FROM goals WHERE user_id = ? ORDER BY id", conn, params=(user_id,))
+        linked = dict(conn.execute(GOAL_PROGRESS_QUERY, {"user_id": user_id, "now": current_period()}).fetchall())
+    goals = goals.rename(columns={"current_value": "initial_value"})
+    initial = goals["initial_value"].fillna(0).astype("int64")
+    goals["current_value"] = initial + goals["id"].map(linked).fillna(0).astype("int64")
+    return goals
 
+@invalidates
 def update_goal_progress(goal_id, user_id, amount):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("UPDATE goals SET current_value = current_value + ? WHERE id = ? AND user_id = ?", 
-                   (amount, goal_id, user_id))
-    conn.commit()
-    conn.close()
+    """Ajuste manual do saldo inicial da meta (valores guardados fora do app). Aportes lançados no app
+    devem ser vinculados com add_investment(..., goal_id=...), que entram no progresso automaticamente."""
+    with connection(user_id=user_id) as conn:
+        conn.execute("UPDATE goals SET current_value = current_value + ? WHERE id = ? AND user_id = ?", 
+                     (amount, goal_id, user_id))
 
+@invalidates
 def delete_goal(goal_id, user_id):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM goals WHERE id = ? AND user_id = ?", (goal_id, user_id))
-    conn.commit()
-    conn.close()
+    with connection(user_id=user_id) as conn:
+        # Os investimentos continuam existindo, só perdem o vínculo
+        for table in ("investments", "recurrences"):
+            conn.execute(f"UPDATE {table} SET goal_id = NULL WHERE goal_id = ? AND user_id = ?", (goal_id, user_id))
+        conn.execute("DELETE FROM goals WHERE id = ? AND user_id = ?", (goal_id, user_id))
+
+# --- Shards: Movimentação e Consultas Administrativas ---
+# Tabelas com dados de um usuário, referenciadas antes das que apontam para elas. Os ids são de cada
+# arquivo: metas e regras ganham ids novos no destino e goal_id/recurrence_id são traduzidos.
+USER_TABLES = ("goals", "recurrences", "recurrence_overrides", "incomes", "expenses", "investments")
+USER_REFERENCES = {"goal_id": "goals", "recurrence_id": "recurrences"}
+
+def _user_rows(table, schema):
+    if table == "recurrence_overrides":
+        return f"t.recurrence_id IN (SELECT id FROM {schema}.recurrences WHERE user_id = :user_id)"
+    return "t.user_id = :user_id"
+
+def _delete_user_rows(conn, user_id, schema="main"):
+    # Os gatilhos de monthly_totals/category_totals descontam as linhas apagadas
+    for table in reversed(USER_TABLES):
+        conn.execute(f"DELETE FROM {schema}.{table} AS t WHERE {_user_rows(table, schema)}", {"user_id": user_id})
+    conn.execute(f"DELETE FROM {schema}.data_versions WHERE user_id = ?", (user_id,))
+
+def _copy_user_rows(conn, user_id):
+    # main = destino, src = origem (ATTACH); devolve as linhas copiadas por tabela
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS moved_ids (tbl TEXT NOT NULL, old INTEGER NOT NULL, new INTEGER NOT NULL, PRIMARY KEY (tbl, old))")
+    conn.execute("DELETE FROM temp.moved_ids")
+    counts = {}
+    for table in USER_TABLES:
+        columns = [row[1] for row in conn.execute(f"PRAGMA main.table_info({table})") if row[1] != "id"]
+        select = ", ".join(f"(SELECT new FROM temp.moved_ids WHERE tbl = '{USER_REFERENCES[c]}' AND old = t.{c})"
+                           if c in USER_REFERENCES else f"t.{c}" for c in columns)
+        insert = f"INSERT INTO main.{table} ({', '.join(columns)})"
+        query = f"SELECT {select} FROM src.{table} AS t WHERE {_user_rows(table, 'src')}"
+        if table in USER_REFERENCES.values():
+            # Poucas linhas (metas, regras): uma a uma, para guardar o id novo
+            rows = conn.execute(f"SELECT t.id, {select} FROM src.{table} AS t WHERE {_user_rows(table, 'src')} ORDER BY t.id",
+                                {"user_id": user_id}).fetchall()
+            for old, *values in rows:
+                new = conn.execute(f"{insert} VALUES ({', '.join('?' * len(values))})", values).lastrowid
+                conn.execute("INSERT INTO temp.moved_ids VALUES (?, ?, ?)", (table, old, new))
+            counts[table] = len(rows)
+        else:
+            counts[table] = conn.execute(f"{insert} {query}", {"user_id": user_id}).rowcount
+    return counts
+
+def move_user(user_id, shard):
+    """Move os dados do usuário para `shard` (SHARD_DIRECTORY = DB_NAME) com o app no ar; devolve as linhas
+    copiadas por tabela. Pode ser repetido se falhar no meio. Os dados antigos ficam no arquivo de origem
+    até purge_moved_users (leitores com o mapa ainda não relido continuam vendo algo coerente).
+    Sem a fila de escrita (WRITE_QUEUE), as escritas não conferem moved_users: mova com o app parado."""
+    if not SHARDS:
+        raise RuntimeError("Shards desligados (defina FINANCE_SHARDS)")
+    if shard != SHARD_DIRECTORY and not 0 <= shard < SHARDS:
+        raise ValueError(f"shard inexistente: {shard}")
+    _placements.pop(user_id, None)
+    source = shard_of(user_id)
+    while True:
+        init_db(shard_file(source))
+        with connection(shard_file(source)) as conn:
+            row = conn.execute("SELECT shard FROM moved_users WHERE user_id = ?", (user_id,)).fetchone()
+        if row is None:
+            break
+        # Move anterior gravado, mas o diretório não chegou a ser atualizado
+        _record_placement(user_id, row[0])
+        source = row[0]
+    if source == shard:
+        return {}
+    source_path, target_path = shard_file(source), shard_file(shard)
+    init_db(target_path)
+    started = time.perf_counter()
+    # Conexão própria: a transação cobre os dois arquivos (ATTACH) e não passa pelas filas de escrita
+    conn = sqlite3.connect(target_path, isolation_level=None)
+    try:
+        for name, value in PRAGMAS.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        conn.execute("ATTACH DATABASE ? AS src", (source_path,))
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # A marca na origem vem primeiro: segura o lock de escrita da origem até o COMMIT, e escritas
+            # que chegarem lá depois disso são recusadas (ShardMoved) e refeitas no destino
+            conn.execute("INSERT OR REPLACE INTO src.moved_users (user_id, shard, moved_at) VALUES (?, ?, ?)",
+                         (user_id, shard, time.time()))
+            conn.execute("DELETE FROM main.moved_users WHERE user_id = ?", (user_id,))
+            _delete_user_rows(conn, user_id)  # restos de um move anterior para cá
+            counts = _copy_user_rows(conn, user_id)
+            # Versão nova: ETags e caches de outros processos não confundem os dados copiados com os antigos
+            conn.execute("""
+                INSERT INTO main.data_versions (user_id, version)
+                SELECT :user_id, COALESCE((SELECT version FROM src.data_versions WHERE user_id = :user_id), 0) + 1
+            """, {"user_id": user_id})
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.close()
+    _record_placement(user_id, shard)
+    _bump_local(user_id)
+    counts["seconds"] = time.perf_counter() - started
+    return counts
+
+def shard_plan():
+    """(user_id, shard atual, shard do hash) de cada usuário fora do shard do hash."""
+    if not SHARDS:
+        return []
+    with connection(DB_NAME) as conn:
+        placed = dict(conn.execute("SELECT user_id, shard FROM user_shards").fetchall())
+        users = [row[0] for row in conn.execute("SELECT id FROM users ORDER BY id")]
+        plan = []
+        for user_id in users:
+            target = hash_shard(user_id)
+            current = placed.get(user_id)
+            if current is None:
+                current = SHARD_DIRECTORY if _has_data(conn, user_id) else target
+            if current != target:
+                plan.append((user_id, current, target))
+    return plan
+
+def rebalance_shards(limit=None, progress=None):
+    """Move para o shard do hash até `limit` usuários fora dele (inclusive os que ainda estão em DB_NAME).
+    Um usuário por vez: cada um só fica travado para escrita durante a própria cópia."""
+    moved = []
+    for user_id, source, target in shard_plan()[:limit]:
+        counts = move_user(user_id, target)
+        moved.append({"user_id": user_id, "from": source, "to": target, **counts})
+        if progress:
+            progress(moved[-1])
+    return moved
+
+def purge_moved_users(older_than=SHARD_PURGE_AFTER):
+    """Apaga dos arquivos de origem os dados de usuários movidos há mais de `older_than` segundos; devolve
+    quantos usuários foram limpos em cada arquivo. A marca em moved_users continua barrando escritas atrasadas."""
+    with connection(DB_NAME) as conn:
+        placed = dict(conn.execute("SELECT user_id, shard FROM user_shards").fetchall())
+    purged = {}
+    for shard in range(SHARD_DIRECTORY, SHARDS):
+        with connection(shard_file(shard)) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            users = [user_id for user_id, in conn.execute("SELECT user_id FROM moved_users WHERE moved_at < ?",
+                                                          (time.time() - older_than,))
+                     if placed.get(user_id, shard) != shard]
+            for user_id in users:
+                _delete_user_rows(conn, user_id)
+        purged[shard] = len(users)
+    return purged
+
+def query_shards(sql, params=()):
+    """Roda a mesma consulta em DB_NAME e em cada shard (em paralelo) e junta as linhas, com a coluna shard.
+    Para relatórios de administração; as telas sempre leem só o arquivo do usuário."""
+    def run(shard):
+        with connection(shard_file(shard)) as conn:
+            frame = pd.read_sql_query(sql, conn, params=params)
+        frame.insert(0, "shard", shard)
+        return frame
+    shards = list(range(SHARD_DIRECTORY, SHARDS))
+    with ThreadPoolExecutor(max_workers=len(shards), thread_name_prefix="shard-query") as pool:
+        return pd.concat(list(pool.map(run, shards)), ignore_index=True)
+
+def shard_stats():
+    """Uma linha por arquivo: usuários registrados no diretório, usuários com dados, lançamentos e tamanho."""
+    stats = query_shards("""
+        SELECT (SELECT COUNT(*) FROM data_versions) AS users_with_versions,
+               (SELECT COUNT(DISTINCT user_id) FROM monthly_totals) AS users_with_entries,
+               (SELECT COALESCE(SUM(n_rows), 0) FROM monthly_totals) AS entries,
+               (SELECT COUNT(*) FROM moved_users) AS moved_out
+    """)
+    with connection(DB_NAME) as conn:
+        placed = dict(conn.execute("SELECT shard, COUNT(*) FROM user_shards GROUP BY shard").fetchall())
+    stats.insert(1, "path", stats["shard"].map(shard_file))
+    stats.insert(2, "placed_users", stats["shard"].map(placed).fillna(0).astype("int64"))
+    stats["bytes"] = [os.path.getsize(path) if os.path.exists(path) else 0 for path in stats["path"]]
+    return stats
+
+# Métricas por função pública (custo de uma checagem de flag quando a instrumentação está desligada)
+instrumentation.instrument_functions(globals(), exclude={
+    "get_pool", "recycle_connections", "set_instrumentation", "close_all_connections", "connection",
+    "get_connection", "get_writer", "submit_write", "write_queue_stats",
+    "shard_file", "data_files", "hash_shard", "shard_of", "shard_path",
+    "data_version", "bump_data_version", "sync_data_version", "cache_stats", "cached_read", "invalidates",
+    "analytical_engine", "analytical", "category_frame", "history_rows", "current_period",
+    "hash_password", "verify_password", "needs_rehash", "is_admin", "page_count", "period_params", "get_schema_version", "migrate", "to_period", "from_period",
+})
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Manutenção do banco do Controle Financeiro")
+    sub = parser.add_subparsers(dest="command", required=True)
+    rebuild = sub.add_parser("rebuild-totals", help="recalcula monthly_totals/category_totals e confere a consistência")
+    rebuild.add_argument("--user-id", type=int, default=None)
+    sub.add_parser("shards", help="usuários, lançamentos e tamanho de cada arquivo (FINANCE_SHARDS)")
+    move = sub.add_parser("move-user", help="move os dados de um usuário para outro shard (-1 = DB_NAME)")
+    move.add_argument("--user-id", type=int, required=True)
+    move.add_argument("--shard", type=int, required=True)
+    rebalance = sub.add_parser("rebalance", help="move para o shard do hash os usuários fora dele")
+    rebalance.add_argument("--limit", type=int, default=None)
+    rebalance.add_argument("--dry-run", action="store_true", help="só lista os movimentos")
+    purge = sub.add_parser("purge-moved", help="apaga os dados antigos de usuários já movidos")
+    purge.add_argument("--older-than", type=float, default=SHARD_PURGE_AFTER, help="segundos desde o move")
+    args = parser.parse_args()
+
+    init_db()
+    if args.command == "rebuild-totals":
+        rebuild_monthly_totals(args.user_id)
+        divergent = check_monthly_totals(args.user_id)
+        by_category = check_category_totals(args.user_id)
+        if divergent.empty and by_category.empty:
+            print("monthly_totals e category_totals reconstruídas e consistentes.")
+        else:
+            print(pd.concat([divergent, by_category]).to_string())
+            raise SystemExit(1)
+    elif args.command == "shards":
+        print(shard_stats().to_string(index=False))
+    elif args.command == "move-user":
+        print(move_user(args.user_id, args.shard))
+    elif args.command == "rebalance":
+        if args.dry_run:
+            for user_id, source, target in shard_plan()[:args.limit]:
+                print(f"usuário {user_id}: shard {source} -> {target}")
+        else:
+            moved = rebalance_shards(args.limit, progress=lambda m: print(
+                f"usuário {m['user_id']}: shard {m['from']} -> {m['to']} ({m['seconds']:.2f} s)"))
+            print(f"{len(moved)} usuário(s) movido(s).")
+    elif args.command == "purge-moved":
+        for shard, count in purge_moved_users(args.older_than).items():
+            print(f"{shard_file(shard)}: {count} usuário(s) limpo(s)")
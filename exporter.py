@@ -0,0 +1,247 @@
+import io
+import csv
+import json
+import time
+import zipfile
+import argparse
+import tempfile
+from datetime import datetime
+import database as db
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet é opcional; CSV funciona sem dependências extras
+    pa = pq = None
+
+# Backup completo dos dados de um usuário: um .zip com um arquivo por tabela (CSV ou Parquet) e um
+# manifest.json com as colunas e tipos. As linhas saem do SQLite em lotes (fetchmany) e são gravadas
+# direto no zip, então a memória usada não depende do tamanho do histórico. Valores em centavos.
+CHUNK_SIZE = 10000
+EXPORT_VERSION = 1
+FORMATS = ("csv", "parquet")
+
+# Ordem de restauração: tabelas referenciadas antes das que apontam para elas
+EXPORT_TABLES = ("goals", "recurrences", "recurrence_overrides", "incomes", "expenses", "investments")
+# Colunas que apontam para ids de outra tabela do backup (os ids mudam ao restaurar)
+REFERENCES = {
+    "recurrences": {"goal_id": "goals"},
+    "recurrence_overrides": {"recurrence_id": "recurrences"},
+    "investments": {"goal_id": "goals"},
+}
+# Tabelas cujo id precisa ser lembrado para traduzir as referências acima
+REFERENCED = {target for refs in REFERENCES.values() for target in refs.values()}
+
+def parquet_available():
+    return pq is not None
+
+def _columns(conn, table):
+    """(nome, inteiro?, aceita NULL?) de cada coluna exportada; user_id fica de fora (é do banco de destino)."""
+    info = conn.execute(f"PRAGMA table_info({table})").fetchall()
+    return [(name, decl.upper() == "INTEGER", not notnull and not pk)
+            for _, name, decl, notnull, _, pk in info if name != "user_id"]
+
+def _select(table, columns):
+    names = ", ".join(f"t.{name}" for name, _, _ in columns)
+    if table == "recurrence_overrides":
+        return (f"SELECT {names} FROM recurrence_overrides t JOIN recurrences r ON r.id = t.recurrence_id "
+                f"WHERE r.user_id = ? ORDER BY t.recurrence_id, t.period")
+    return f"SELECT {names} FROM {table} t WHERE t.user_id = ? ORDER BY t.id"
+
+def _write_csv(archive, name, header, chunks):
+    with archive.open(name, "w", force_zip64=True) as raw:
+        out = io.TextIOWrapper(raw, encoding="utf-8", newline="")
+        writer = csv.writer(out)
+        writer.writerow(header)
+        for rows in chunks:
+            writer.writerows(rows)
+        out.flush()
+        out.detach()
+
+def _write_parquet(archive, name, columns, chunks):
+    schema = pa.schema([(col, pa.int64() if is_int else pa.string()) for col, is_int, _ in columns])
+    with archive.open(name, "w", force_zip64=True) as raw:
+        with pq.ParquetWriter(raw, schema, compression="zstd") as writer:
+            for rows in chunks:
+                # Um row group por lote
+                values = list(zip(*rows))
+                writer.write_table(pa.Table.from_arrays(
+                    [pa.array(v, type=t) for v, t in zip(values, schema.types)], schema=schema))
+
+def _fetch_chunks(cursor, chunk_size):
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            return
+        yield rows
+
+def export_user(user_id, target, fmt="csv", chunk_size=CHUNK_SIZE):
+    """Grava em `target` (caminho ou arquivo binário) o backup dos dados do usuário e devolve as contagens."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Formato desconhecido: {fmt}")
+    if fmt == "parquet" and not parquet_available():
+        raise ValueError("Exportar em Parquet requer o pacote pyarrow")
+    started = time.perf_counter()
+    # Parquet já é comprimido: guardado sem compressão, o arquivo pode ser lido com seek na restauração.
+    # No CSV, o nível 1 do deflate comprime quase o mesmo que o padrão (6) em menos da metade do tempo.
+    compression = zipfile.ZIP_STORED if fmt == "parquet" else zipfile.ZIP_DEFLATED
+    with zipfile.ZipFile(target, "w", compression, compresslevel=1) as archive, db.connection(user_id=user_id) as conn:
+        manifest = {"version": EXPORT_VERSION, "schema_version": db.get_schema_version(conn), "format": fmt,
+                    "money": "cents", "exported_at": datetime.now().isoformat(timespec="seconds"), "tables": {}}
+        # Uma transação de leitura só: todas as tabelas saem do mesmo instante do banco
+        conn.execute("BEGIN")
+        try:
+            for table in EXPORT_TABLES:
+                columns = _columns(conn, table)
+                cursor = conn.execute(_select(table, columns), (user_id,))
+                counted = {"rows": 0}
+
+                def chunks():
+                    for rows in _fetch_chunks(cursor, chunk_size):
+                        counted["rows"] += len(rows)
+                        yield rows
+                name = f"{table}.{fmt}"
+                if fmt == "csv":
+                    _write_csv(archive, name, [c[0] for c in columns], chunks())
+                else:
+                    _write_parquet(archive, name, columns, chunks())
+                manifest["tables"][table] = {"file": name, "rows": counted["rows"],
+                                             "columns": [{"name": n, "integer": i, "nullable": nl} for n, i, nl in columns]}
+        finally:
+            conn.rollback()
+        archive.writestr("manifest.json", json.dumps(manifest, indent=2))
+    manifest["seconds"] = time.perf_counter() - started
+    return manifest
+
+def export_to_bytes(user_id, fmt="csv", chunk_size=CHUNK_SIZE):
+    """Backup pronto para o st.download_button (bytes). O zip é montado num arquivo temporário, fechado
+    (e apagado) ao final: a memória de pico é a do zip pronto, sem a dos dados intermediários."""
+    with tempfile.TemporaryFile() as out:
+        export_user(user_id, out, fmt, chunk_size)
+        out.seek(0)
+        return out.read()
+
+def _csv_rows(archive, name, columns, chunk_size):
+    converters = []
+    for _, is_int, nullable in columns:
+        if is_int:
+            converters.append(lambda v: int(v) if v != "" else None)
+        elif nullable:
+            converters.append(lambda v: v if v != "" else None)
+        else:
+            converters.append(str)
+    with archive.open(name) as raw:
+        reader = csv.reader(io.TextIOWrapper(raw, encoding="utf-8", newline=""))
+        header = next(reader)
+        if header != [c[0] for c in columns]:
+            raise ValueError(f"Cabeçalho inesperado em {name}")
+        batch = []
+        for record in reader:
+            batch.append([convert(v) for convert, v in zip(converters, record)])
+            if len(batch) >= chunk_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+def _parquet_rows(archive, name, columns, chunk_size):
+    if not parquet_available():
+        raise ValueError("Restaurar um backup em Parquet requer o pacote pyarrow")
+    with archive.open(name) as raw:
+        for batch in pq.ParquetFile(raw).iter_batches(batch_size=chunk_size, columns=[c[0] for c in columns]):
+            yield list(zip(*(batch.column(i).to_pylist() for i in range(batch.num_columns))))
+
+def _user_has_data(conn, user_id):
+    return any(conn.execute(f"SELECT 1 FROM {table} WHERE user_id = ? LIMIT 1", (user_id,)).fetchone()
+               for table in EXPORT_TABLES if table != "recurrence_overrides")
+
+def _clear_user(conn, user_id):
+    conn.execute("DELETE FROM recurrence_overrides WHERE recurrence_id IN (SELECT id FROM recurrences WHERE user_id = ?)",
+                 (user_id,))
+    for table in EXPORT_TABLES:
+        if table != "recurrence_overrides":
+            conn.execute(f"DELETE FROM {table} WHERE user_id = ?", (user_id,))
+
+def _restore_tables(conn, archive, manifest, read_rows, user_id, replace, chunk_size):
+    stats = {}
+    if _user_has_data(conn, user_id):
+        if not replace:
+            raise ValueError("O usuário já tem lançamentos; use replace=True para substituí-los")
+        _clear_user(conn, user_id)
+    new_ids = {table: {} for table in REFERENCED}
+    for table in EXPORT_TABLES:
+        entry = manifest["tables"].get(table)
+        if entry is None:
+            continue
+        existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+        columns = [(c["name"], c["integer"], c["nullable"]) for c in entry["columns"]]
+        names = [c[0] for c in columns]
+        refs = REFERENCES.get(table, {})
+        # id novo gerado pelo banco; colunas que não existem mais neste esquema são descartadas
+        keep = [i for i, n in enumerate(names) if n in existing and n != "id"]
+        targets = [names[i] for i in keep]
+        if table != "recurrence_overrides":
+            targets.append("user_id")
+        sql = f"INSERT INTO {table} ({', '.join(targets)}) VALUES ({', '.join('?' * len(targets))})"
+        remember = table in REFERENCED
+        id_pos = names.index("id") if "id" in names else None
+        ref_pos = {names.index(col): new_ids[target] for col, target in refs.items() if col in names}
+        stats[table] = 0
+        for rows in read_rows(archive, entry["file"], columns, chunk_size):
+            for pos, mapping in ref_pos.items():
+                rows = [row[:pos] + (mapping.get(row[pos]),) + row[pos + 1:] for row in map(tuple, rows)]
+            values = [[row[i] for i in keep] + ([user_id] if table != "recurrence_overrides" else [])
+                      for row in rows]
+            if remember:
+                # Poucas linhas (metas, regras): inseridas uma a uma para guardar o id novo
+                ids = new_ids[table]
+                for row, params in zip(rows, values):
+                    ids[row[id_pos]] = conn.execute(sql, params).lastrowid
+            else:
+                conn.executemany(sql, values)
+            stats[table] += len(values)
+    return stats
+
+def restore_user(source, user_id, replace=False, chunk_size=CHUNK_SIZE):
+    """Restaura um backup de export_user para `user_id` (tudo ou nada) e devolve as linhas inseridas por tabela.
+
+    Os ids mudam; as referências entre tabelas do backup são traduzidas. Sem `replace`, só restaura
+    para um usuário ainda sem lançamentos."""
+    started = time.perf_counter()
+    with zipfile.ZipFile(source) as archive:
+        try:
+            manifest = json.loads(archive.read("manifest.json"))
+        except KeyError:
+            raise ValueError("Arquivo não é um backup do Controle Financeiro (manifest.json ausente)")
+        if manifest.get("version") != EXPORT_VERSION:
+            raise ValueError(f"Versão de backup não suportada: {manifest.get('version')}")
+        read_rows = _parquet_rows if manifest["format"] == "parquet" else _csv_rows
+        # Tudo numa transação: um erro no meio do arquivo não deixa o usuário com metade dos dados
+        stats = db.run_user_transaction(user_id, _restore_tables, archive, manifest, read_rows, user_id, replace, chunk_size)
+    db.bump_data_version(user_id)
+    stats["seconds"] = time.perf_counter() - started
+    return stats
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backup (exportação/restauração) dos dados de um usuário")
+    sub = parser.add_subparsers(dest="command", required=True)
+    exp = sub.add_parser("export", help="grava o backup de um usuário em FILE (.zip)")
+    exp.add_argument("file")
+    exp.add_argument("--user-id", type=int, required=True)
+    exp.add_argument("--format", choices=FORMATS, default="csv")
+    exp.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    res = sub.add_parser("restore", help="restaura o backup FILE para um usuário")
+    res.add_argument("file")
+    res.add_argument("--user-id", type=int, required=True)
+    res.add_argument("--replace", action="store_true", help="apaga os dados atuais do usuário antes de restaurar")
+    res.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+
+    db.init_db()
+    if args.command == "export":
+        result = export_user(args.user_id, args.file, args.format, args.chunk_size)
+        counts = ", ".join(f"{t}: {v['rows']}" for t, v in result["tables"].items())
+    else:
+        result = restore_user(args.file, args.user_id, args.replace, args.chunk_size)
+        counts = ", ".join(f"{t}: {v}" for t, v in result.items() if t != "seconds")
+    print(f"{args.command} em {result['seconds']:.1f}s — {counts}")
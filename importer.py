@@ -0,0 +1,234 @@
+import io
+import os
+import re
+import time
+import hashlib
+import argparse
+import numpy as np
+import pandas as pd
+import database as db
+
+# Linhas processadas por transação; a memória fica limitada ao tamanho do lote
+CHUNK_SIZE = 20000
+OFX_READ_SIZE = 64 * 1024
+
+# Nomes de colunas reconhecidos automaticamente nos CSVs dos bancos
+COLUMN_CANDIDATES = {
+    "date": ["data", "date", "data lançamento", "data lancamento", "data_lancamento", "dt"],
+    "amount": ["valor", "valor (r$)", "amount", "value", "quantia"],
+    "description": ["descrição", "descricao", "description", "histórico", "historico", "lançamento", "lancamento", "memo"],
+}
+
+# (tipo, expressão regular sobre a descrição, categoria) - a primeira regra que casar vence
+DEFAULT_RULES = [
+    ("income", r"SAL[AÁ]RIO|FOLHA|PAGTO|PROVENTOS", "Salário"),
+    ("income", r"DIVIDENDO|JCP|RENDIMENTO", "Dividendos"),
+    ("income", r"FREELA|SERVI[CÇ]O PRESTADO|NOTA FISCAL", "Freelance"),
+    ("expense", r"ALUGUEL|CONDOM[IÍ]NIO|ENERGIA|LUZ|[AÁ]GUA|INTERNET|TELEFONE|CELULAR|NETFLIX|SPOTIFY|"
+                r"ESCOLA|MENSALIDADE|SEGURO|FINANCIAMENTO|PLANO DE SA[UÚ]DE", "Fixa"),
+]
+DEFAULT_CATEGORY = {"income": "Outros", "expense": "Ocasional"}
+
+def _match_column(columns, field):
+    normalized = {str(c).strip().lower(): c for c in columns}
+    for candidate in COLUMN_CANDIDATES[field]:
+        if candidate in normalized:
+            return normalized[candidate]
+    raise ValueError(f"Coluna de '{field}' não encontrada no arquivo ({', '.join(map(str, columns))}).")
+
+def parse_amounts(values):
+    # Aceita "1.234,56", "1,234.56", "-1234.56" e "R$ 10,00"; inválidos viram NaN.
+    # O separador que aparece por último é o decimal; o outro é de milhar
+    s = pd.Series(values, dtype="string").str.replace("R$", "", regex=False).str.strip()
+    br = (s.str.rfind(",") > s.str.rfind(".")).fillna(False)
+    s = s.where(~br, s.str.replace(".", "", regex=False).str.replace(",", ".", regex=False))
+    s = s.where(br, s.str.replace(",", "", regex=False))
+    return pd.to_numeric(s, errors="coerce")
+
+DATE_FORMATS = ["%d/%m/%Y", "%Y-%m-%d", "%d/%m/%y", "%d-%m-%Y"]
+
+def parse_dates(values):
+    # Formatos fixos são convertidos de forma vetorizada; só caímos no parser genérico se nenhum servir
+    values = pd.Series(values, dtype="string").str.strip()
+    filled = values.notna() & (values != "")
+    for fmt in DATE_FORMATS:
+        parsed = pd.to_datetime(values, format=fmt, errors="coerce")
+        if parsed[filled].notna().all():
+            return parsed
+    return pd.to_datetime(values, dayfirst=True, errors="coerce", format="mixed")
+
+def _open_text(source, encoding):
+    if isinstance(source, (str, os.PathLike)):
+        return open(source, "r", encoding=encoding, newline="")
+    # Arquivo binário (ex.: st.file_uploader) ou já em texto
+    if isinstance(source, io.TextIOBase):
+        return source
+    return io.TextIOWrapper(source, encoding=encoding, newline="")
+
+def _sniff_delimiter(stream):
+    first = stream.readline()
+    stream.seek(0)
+    return ";" if first.count(";") > first.count(",") else ","
+
+def iter_csv_chunks(stream, chunk_size=CHUNK_SIZE, columns=None, delimiter=None):
+    """Lê o CSV em lotes e devolve DataFrames com as colunas date, amount e description."""
+    delimiter = delimiter or _sniff_delimiter(stream)
+    reader = pd.read_csv(stream, sep=delimiter, dtype=str, chunksize=chunk_size, keep_default_na=False)
+    mapping = None
+    for chunk in reader:
+        if mapping is None:
+            mapping = columns or {field: _match_column(chunk.columns, field) for field in COLUMN_CANDIDATES}
+        yield pd.DataFrame({
+            "date": parse_dates(chunk[mapping["date"]]),
+            "amount": parse_amounts(chunk[mapping["amount"]]).to_numpy(),
+            "description": chunk[mapping["description"]].str.strip().to_numpy(),
+        })
+
+_OFX_FIELD = re.compile(r"<(\w+)>([^<\r\n]*)")
+
+def _ofx_frame(transactions):
+    return pd.DataFrame({
+        "date": pd.to_datetime([t.get("DTPOSTED", "")[:8] for t in transactions], format="%Y%m%d", errors="coerce"),
+        "amount": parse_amounts([t.get("TRNAMT") for t in transactions]).to_numpy(),
+        "description": [(t.get("MEMO") or t.get("NAME") or "").strip() for t in transactions],
+    })
+
+def iter_ofx_chunks(stream, chunk_size=CHUNK_SIZE):
+    """Lê blocos <STMTTRN> do OFX (SGML ou XML) sem carregar o arquivo inteiro."""
+    buffer, batch = "", []
+    while True:
+        data = stream.read(OFX_READ_SIZE)
+        buffer += data
+        while True:
+            start = buffer.find("<STMTTRN>")
+            end = buffer.find("</STMTTRN>", start)
+            if start < 0 or end < 0:
+                break
+            block = buffer[start + len("<STMTTRN>"):end]
+            buffer = buffer[end + len("</STMTTRN>"):]
+            batch.append({tag.upper(): value.strip() for tag, value in _OFX_FIELD.findall(block)})
+            if len(batch) >= chunk_size:
+                yield _ofx_frame(batch)
+                batch = []
+        if not data:
+            break
+        # Sem transação aberta no buffer, descarta o que já foi lido (cabeçalhos etc.)
+        if "<STMTTRN>" not in buffer:
+            buffer = buffer[-len("<STMTTRN>"):]
+    if batch:
+        yield _ofx_frame(batch)
+
+def categorize(descriptions, kinds, rules=None):
+    rules = DEFAULT_RULES if rules is None else rules
+    categories = np.where(kinds == "income", DEFAULT_CATEGORY["income"], DEFAULT_CATEGORY["expense"]).astype(object)
+    pending = np.ones(len(descriptions), dtype=bool)
+    upper = pd.Series(descriptions, dtype="string").str.upper()
+    for kind, pattern, category in rules:
+        hit = pending & (kinds == kind) & upper.str.contains(pattern, regex=True, na=False).to_numpy()
+        categories[hit] = category
+        pending &= ~hit
+    return categories
+
+def row_hashes(dates, amounts, descriptions):
+    """Impressão digital de 64 bits (inteiro com sinal) de cada linha: data, valor e descrição normalizada."""
+    keys = (pd.Series(dates).reset_index(drop=True).dt.strftime("%Y-%m-%d") + "|" + pd.Series(amounts).map("{:.2f}".format)
+            + "|" + pd.Series(descriptions, dtype=object).str.strip().str.lower())
+    return [int.from_bytes(hashlib.blake2b(k.encode(), digest_size=8).digest(), "big", signed=True) for k in keys]
+
+def _insert_chunk(conn, user_id, chunk, rules):
+    valid = chunk["date"].notna() & chunk["amount"].notna() & (chunk["amount"] != 0)
+    chunk = chunk[valid]
+    amounts = chunk["amount"].to_numpy()
+    kinds = np.where(amounts > 0, "income", "expense")
+    descriptions = chunk["description"].fillna("").to_numpy(dtype=object)
+    columns = [
+        [int(user_id)] * len(chunk),
+        row_hashes(chunk["date"], amounts, descriptions),
+        descriptions.tolist(),
+        np.rint(np.abs(amounts) * 100).astype(np.int64).tolist(),  # centavos
+        categorize(descriptions, kinds, rules).tolist(),
+        chunk["date"].dt.month.tolist(),
+        chunk["date"].dt.year.tolist(),
+    ]
+    rows = list(zip(*columns))
+    is_income = (kinds == "income").tolist()
+    inserted = {}
+    for kind, table, name_col in (("income", "incomes", "source_name"), ("expense", "expenses", "description")):
+        wanted = kind == "income"
+        # INSERT OR IGNORE + índice único (user_id, import_hash): linhas já importadas são descartadas pelo banco
+        cursor = conn.executemany(f"""
+            INSERT OR IGNORE INTO {table} (user_id, import_hash, {name_col}, value, category, is_recurring, month, year)
+            VALUES (?, ?, ?, ?, ?, 0, ?, ?)
+        """, [row for row, flag in zip(rows, is_income) if flag == wanted])
+        inserted[kind] = max(cursor.rowcount, 0)
+    return len(chunk), int((~valid).sum()), inserted
+
+def import_statement(source, user_id, fmt=None, chunk_size=CHUNK_SIZE, rules=None, columns=None,
+                     encoding="utf-8-sig", delimiter=None, progress=None):
+    """Importa um extrato CSV/OFX em lotes (uma transação por lote) e devolve as contagens."""
+    if fmt is None:
+        name = str(getattr(source, "name", source)).lower()
+        fmt = "ofx" if name.endswith(".ofx") else "csv"
+    stats = {"rows": 0, "incomes": 0, "expenses": 0, "duplicates": 0, "skipped": 0, "seconds": 0.0}
+    started = time.perf_counter()
+    stream = _open_text(source, encoding)
+    try:
+        chunks = iter_ofx_chunks(stream, chunk_size) if fmt == "ofx" else iter_csv_chunks(stream, chunk_size, columns, delimiter)
+        for chunk in chunks:
+            valid, skipped, inserted = db.run_user_transaction(user_id, _insert_chunk, user_id, chunk, rules)
+            db.bump_data_version(user_id)
+            stats["rows"] += valid + skipped
+            stats["skipped"] += skipped
+            stats["incomes"] += inserted["income"]
+            stats["expenses"] += inserted["expense"]
+            stats["duplicates"] += valid - inserted["income"] - inserted["expense"]
+            if progress:
+                progress(stats)
+    finally:
+        if isinstance(source, (str, os.PathLike)):
+            stream.close()
+        elif isinstance(stream, io.TextIOWrapper) and stream is not source:
+            stream.detach()  # não fecha o arquivo de quem chamou
+    stats["seconds"] = time.perf_counter() - started
+    return stats
+
+def write_synthetic_csv(path, rows, seed=0, chunk_size=100_000):
+    """Gera um extrato CSV sintético (formato pt-BR, ';') sem manter o arquivo em memória."""
+    rng = np.random.default_rng(seed)
+    labels = np.array(["PIX ENVIADO", "PIX RECEBIDO", "SALARIO", "ALUGUEL", "MERCADO", "NETFLIX", "POSTO", "DIVIDENDOS"])
+    start = np.datetime64("2015-01-01")
+    with open(path, "w", encoding="utf-8") as out:
+        out.write("Data;Descrição;Valor\n")
+        for offset in range(0, rows, chunk_size):
+            n = min(chunk_size, rows - offset)
+            dates = pd.to_datetime(start + rng.integers(0, 3650, n).astype("timedelta64[D]")).strftime("%d/%m/%Y")
+            amounts = np.round(rng.normal(-80, 400, n), 2)
+            descriptions = labels[rng.integers(0, len(labels), n)]
+            serials = np.arange(offset, offset + n).astype(str)
+            values = pd.Series(amounts).map("{:.2f}".format).str.replace(".", ",", regex=False)
+            lines = pd.Series(dates) + ";" + descriptions + " " + serials + ";" + values
+            out.write("\n".join(lines) + "\n")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Importa extratos bancários (CSV/OFX) para o Controle Financeiro")
+    parser.add_argument("file")
+    parser.add_argument("--user-id", type=int, help="usuário dono dos lançamentos importados")
+    parser.add_argument("--format", choices=["csv", "ofx"], default=None)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--encoding", default="utf-8-sig")
+    parser.add_argument("--delimiter", default=None)
+    parser.add_argument("--synthetic", type=int, metavar="ROWS", help="apenas gera um CSV sintético com ROWS linhas em FILE")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        write_synthetic_csv(args.file, args.synthetic)
+        raise SystemExit(0)
+    if args.user_id is None:
+        parser.error("--user-id é obrigatório para importar")
+    db.init_db()
+    result = import_statement(args.file, args.user_id, args.format, args.chunk_size,
+                              encoding=args.encoding, delimiter=args.delimiter)
+    rate = result["rows"] / result["seconds"] if result["seconds"] else 0.0
+    print(f"{result['rows']} linhas em {result['seconds']:.1f}s ({rate:,.0f} linhas/s): "
+          f"{result['incomes']} receitas, {result['expenses']} despesas, "
+          f"{result['duplicates']} duplicadas, {result['skipped']} ignoradas")
@@ -0,0 +1,278 @@
+import os
+import re
+import time
+import sqlite3
+import logging
+import functools
+import threading
+from collections import deque
+
+# Instrumentação opcional das chamadas ao banco. Desligada, custa uma checagem de flag por função
+# e as conexões do pool são sqlite3.Connection comuns; ligada, as conexões novas passam a ser
+# InstrumentedConnection, que cronometra cada comando SQL (execute + fetch) e conta as linhas.
+ENABLED = os.environ.get("FINANCE_INSTRUMENTATION", "0") == "1"
+SLOW_QUERY_MS = float(os.environ.get("FINANCE_SLOW_QUERY_MS", "50"))
+SLOW_LOG_SIZE = 200
+PROGRESS_STEPS = 1000  # o progress handler é chamado a cada N instruções da VM do SQLite
+
+# Limites superiores dos buckets dos histogramas (segundos)
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, float("inf"))
+
+slow_log = logging.getLogger("finance.slow_query")
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.total = 0.0
+        self.n = 0
+        self.rows = 0
+        self.errors = 0
+        self.vm_steps = 0
+
+    def observe(self, seconds, rows=0):
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.counts[i] += 1
+                break
+        self.total += seconds
+        self.n += 1
+        self.rows += rows
+
+    def quantile(self, q):
+        # Estimativa pelo limite superior do bucket que contém o quantil
+        target, seen = q * self.n, 0
+        for bound, count in zip(BUCKETS, self.counts):
+            seen += count
+            if seen >= target and self.n:
+                return bound
+        return 0.0
+
+    def as_dict(self):
+        return {"calls": self.n, "errors": self.errors, "rows": self.rows, "vm_steps": self.vm_steps,
+                "total_s": self.total, "mean_ms": self.total / self.n * 1000 if self.n else 0.0,
+                "p50_le_ms": self.quantile(0.5) * 1000, "p99_le_ms": self.quantile(0.99) * 1000,
+                "buckets": dict(zip(map(str, BUCKETS), self.counts))}
+
+_lock = threading.Lock()
+_functions = {}
+_statements = {}
+_slow_queries = deque(maxlen=SLOW_LOG_SIZE)
+
+def enable(flag=True):
+    global ENABLED
+    ENABLED = flag
+
+def reset():
+    with _lock:
+        _functions.clear()
+        _statements.clear()
+        _slow_queries.clear()
+
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize_sql(sql):
+    return _WHITESPACE.sub(" ", sql).strip()
+
+def _count_rows(result):
+    if hasattr(result, "shape"):
+        return len(result)
+    if isinstance(result, tuple):
+        return sum(len(v) for v in result if hasattr(v, "shape"))
+    return 0
+
+def _record(registry, key, seconds, rows=0, error=False, vm_steps=0):
+    with _lock:
+        hist = registry.get(key)
+        if hist is None:
+            hist = registry[key] = Histogram()
+        hist.observe(seconds, rows)
+        hist.vm_steps += vm_steps
+        if error:
+            hist.errors += 1
+
+def instrument(func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not ENABLED:
+            return func(*args, **kwargs)
+        started = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        except BaseException:
+            _record(_functions, func.__name__, time.perf_counter() - started, error=True)
+            raise
+        _record(_functions, func.__name__, time.perf_counter() - started, _count_rows(result))
+        return result
+    wrapper.__wrapped_for_instrumentation__ = True
+    return wrapper
+
+def instrument_functions(namespace, exclude=()):
+    """Envolve as funções públicas definidas no módulo `namespace` (um globals())."""
+    module = namespace["__name__"]
+    for name, value in list(namespace.items()):
+        if (name.startswith("_") or name in exclude or not callable(value) or isinstance(value, type)
+                or getattr(value, "__module__", None) != module
+                or getattr(value, "__wrapped_for_instrumentation__", False)):
+            continue
+        namespace[name] = instrument(value)
+
+# --- Comandos SQL ---
+class InstrumentedCursor(sqlite3.Cursor):
+    _pending = None  # [sql, params, tempo acumulado, linhas, passos da VM no início]
+
+    def _begin(self, sql, params):
+        self._finish()
+        self._pending = [sql, params, 0.0, 0, self.connection.vm_steps]
+
+    def _add(self, started, rows=0):
+        if self._pending is not None:
+            self._pending[2] += time.perf_counter() - started
+            self._pending[3] += rows
+
+    def _finish(self):
+        pending, self._pending = self._pending, None
+        if pending is None:
+            return
+        sql, params, seconds, rows, steps = pending
+        key = normalize_sql(sql)
+        _record(_statements, key, seconds, rows, vm_steps=(self.connection.vm_steps - steps) * PROGRESS_STEPS)
+        if seconds * 1000 >= SLOW_QUERY_MS:
+            _log_slow(self.connection, key, sql, params, seconds, rows)
+
+    def execute(self, sql, parameters=()):
+        self._begin(sql, parameters)
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._add(started)
+
+    def executemany(self, sql, seq_of_parameters):
+        self._begin(sql, None)
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._add(started, max(self.rowcount, 0))
+            self._finish()
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._add(started, 0 if row is None else 1)
+        if row is None:
+            self._finish()
+        return row
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._add(started, len(rows))
+        if not rows:
+            self._finish()
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._add(started, len(rows))
+        self._finish()
+        return rows
+
+    def __next__(self):
+        started = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._finish()
+            raise
+        self._add(started, 1)
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        try:
+            self._finish()
+        except Exception:
+            pass
+
+class InstrumentedConnection(sqlite3.Connection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.vm_steps = 0
+        # Contador de instruções da VM: custo do comando independente do ruído de tempo
+        self.set_progress_handler(self._on_progress, PROGRESS_STEPS)
+
+    def _on_progress(self):
+        self.vm_steps += 1
+        return 0
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+def connection_factory():
+    return InstrumentedConnection if ENABLED else sqlite3.Connection
+
+def _log_slow(conn, key, sql, params, seconds, rows):
+    plan = []
+    if sql.lstrip().upper().startswith(("SELECT", "WITH", "UPDATE", "DELETE", "INSERT")):
+        try:
+            # Cursor comum: o EXPLAIN não entra nas métricas
+            explain = conn.cursor(sqlite3.Cursor)
+            plan = [row[3] for row in explain.execute("EXPLAIN QUERY PLAN " + sql, params or ()).fetchall()]
+        except sqlite3.Error as e:
+            plan = [f"(EXPLAIN falhou: {e})"]
+    entry = {"at": time.strftime("%Y-%m-%d %H:%M:%S"), "ms": seconds * 1000, "rows": rows,
+             "sql": key, "params": repr(params)[:200], "plan": plan}
+    _slow_queries.append(entry)
+    slow_log.warning("consulta lenta (%.1f ms, %d linhas): %s | plano: %s", entry["ms"], rows, key, " / ".join(plan))
+
+# --- Exportação ---
+def export_json():
+    with _lock:
+        return {
+            "enabled": ENABLED,
+            "slow_query_ms": SLOW_QUERY_MS,
+            "functions": {name: hist.as_dict() for name, hist in _functions.items()},
+            "statements": {sql: hist.as_dict() for sql, hist in _statements.items()},
+            "slow_queries": list(_slow_queries),
+        }
+
+def _label(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")[:300]
+
+def _prometheus_histogram(lines, metric, label, registry):
+    lines.append(f"# TYPE {metric}_seconds histogram")
+    for key, hist in registry.items():
+        cumulative = 0
+        for bound, count in zip(BUCKETS, hist.counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f'{metric}_seconds_bucket{{{label}="{_label(key)}",le="{le}"}} {cumulative}')
+        lines.append(f'{metric}_seconds_sum{{{label}="{_label(key)}"}} {hist.total}')
+        lines.append(f'{metric}_seconds_count{{{label}="{_label(key)}"}} {hist.n}')
+    lines.append(f"# TYPE {metric}_rows_total counter")
+    lines.extend(f'{metric}_rows_total{{{label}="{_label(key)}"}} {hist.rows}' for key, hist in registry.items())
+    lines.append(f"# TYPE {metric}_errors_total counter")
+    lines.extend(f'{metric}_errors_total{{{label}="{_label(key)}"}} {hist.errors}' for key, hist in registry.items())
+
+def export_prometheus():
+    lines = []
+    with _lock:
+        _prometheus_histogram(lines, "finance_db_function", "function", _functions)
+        _prometheus_histogram(lines, "finance_db_statement", "statement", _statements)
+        lines.append("# TYPE finance_db_statement_vm_steps_total counter")
+        lines.extend(f'finance_db_statement_vm_steps_total{{statement="{_label(key)}"}} {hist.vm_steps}'
+                     for key, hist in _statements.items())
+        lines.append("# TYPE finance_db_slow_queries gauge")
+        lines.append(f"finance_db_slow_queries {len(_slow_queries)}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,181 @@
+import os
+import time
+import threading
+import numpy as np
+import pandas as pd
+from collections import OrderedDict
+import database as db
+import instrumentation
+
+try:
+    import duckdb
+except ImportError:  # opcional: sem DuckDB os relatórios rodam no SQLite (database.analytical)
+    duckdb = None
+
+# Caminho analítico dos relatórios pesados. Cada usuário que pede um relatório ganha uma cópia colunar
+# dos seus totais por mês e categoria e das regras de recorrência num DuckDB em memória (uma tabela de
+# fatos só, com período, tipo, categoria e valor). A cópia é refeita quando a versão dos dados do usuário muda
+# (escrita neste processo) ou depois de SNAPSHOT_TTL segundos (escrita de outro processo), como o cache
+# de leituras. Carregar custa uma leitura dos totais no SQLite; depois disso, agregações e pivôs sobre
+# anos de lançamentos rodam vetorizados no DuckDB, sem disputar as conexões do app.
+SNAPSHOT_TTL = db.CACHE_TTL
+SNAPSHOT_MAX_USERS = 64
+LOAD_CHUNK_SIZE = 100000
+THREADS = int(os.environ.get("FINANCE_OLAP_THREADS", "2"))
+
+_SCHEMA = """
+    CREATE TABLE facts (user_id INTEGER, period INTEGER, kind VARCHAR, category VARCHAR, value BIGINT);
+    CREATE TABLE recurrences (user_id INTEGER, id INTEGER, kind VARCHAR, category VARCHAR, value BIGINT,
+                              start_period INTEGER, end_period INTEGER, interval_months INTEGER);
+    CREATE TABLE recurrence_overrides (user_id INTEGER, recurrence_id INTEGER, period INTEGER, value BIGINT, skip INTEGER);
+"""
+
+# Leituras no SQLite que alimentam a cópia (mesmas regras de database.CATEGORY_TOTALS_QUERY)
+_LOAD_QUERIES = {
+    # Lançamentos já somados por mês e categoria (category_totals): a cópia tem meses x categorias linhas
+    "facts": "SELECT year * 12 + month - 1, kind, category, total FROM category_totals WHERE user_id = :user_id",
+    "recurrences": """SELECT id, kind, COALESCE(category, 'Geral'), value, start_period, end_period, interval_months
+                      FROM recurrences WHERE user_id = :user_id""",
+    "recurrence_overrides": """SELECT o.recurrence_id, o.period, o.value, o.skip FROM recurrence_overrides o
+                               JOIN recurrences r ON r.id = o.recurrence_id WHERE r.user_id = :user_id""",
+}
+
+# Fatos de [$start, $end]: lançamentos + ocorrências das regras (range() gera os períodos de cada regra)
+_FACTS_CTE = """
+    WITH occurrences AS (
+        SELECT id, kind, category, value,
+               UNNEST(range(start_period, LEAST(COALESCE(end_period, $end), $end) + 1, interval_months)) AS period
+        FROM recurrences WHERE user_id = $user_id
+    ),
+    facts_in_range AS (
+        SELECT period, kind, category, value FROM facts
+        WHERE user_id = $user_id AND period BETWEEN $start AND $end
+        UNION ALL
+        SELECT r.period, r.kind, r.category, COALESCE(o.value, r.value)
+        FROM occurrences r
+        LEFT JOIN recurrence_overrides o ON o.user_id = $user_id AND o.recurrence_id = r.id AND o.period = r.period
+        WHERE r.period >= $start AND COALESCE(o.skip, 0) = 0
+    )
+"""
+
+_CATEGORY_QUERY = _FACTS_CTE + """
+    SELECT period, kind, category, SUM(value)::BIGINT AS total FROM facts_in_range
+    GROUP BY period, kind, category ORDER BY period, kind, category
+"""
+
+_PERIOD_QUERY = _FACTS_CTE + """
+    SELECT period, SUM(value) FILTER (kind = 'income')::BIGINT, SUM(value) FILTER (kind = 'expense')::BIGINT,
+           SUM(value) FILTER (kind = 'investment')::BIGINT
+    FROM facts_in_range GROUP BY period
+"""
+
+_duck = None
+_lock = threading.Lock()
+_loaded = OrderedDict()  # user_id -> (versão dos dados, instante da carga)
+_stats = {"loads": 0, "load_seconds": 0.0, "rows": 0}
+
+def available():
+    return duckdb is not None
+
+def _database():
+    global _duck
+    if _duck is None:
+        _duck = duckdb.connect(":memory:", config={"threads": THREADS})
+        _duck.execute(_SCHEMA)
+    return _duck
+
+def _delete_user(duck, user_id):
+    for table in _LOAD_QUERIES:
+        duck.execute(f"DELETE FROM {table} WHERE user_id = ?", [user_id])
+
+def _in_transaction(duck, func, *args):
+    # Consultas em andamento (outros cursores) continuam vendo a cópia anterior, inteira, até o COMMIT
+    cursor = duck.cursor()
+    try:
+        cursor.begin()
+        try:
+            func(cursor, *args)
+            cursor.commit()
+        except BaseException:
+            cursor.rollback()
+            raise
+    finally:
+        cursor.close()
+
+def _load_user(duck, user_id):
+    started = time.perf_counter()
+    _delete_user(duck, user_id)
+    rows = 0
+    with db.connection(user_id=user_id) as conn:
+        conn.execute("BEGIN")  # as três tabelas do mesmo instante
+        for table, query in _LOAD_QUERIES.items():
+            cursor = conn.execute(query, {"user_id": user_id})
+            while True:
+                chunk = cursor.fetchmany(LOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                # Lote em colunas (DataFrame) entra no DuckDB de uma vez, sem INSERT linha a linha
+                frame = pd.DataFrame(chunk)
+                frame.insert(0, "user_id", user_id)
+                duck.execute(f"INSERT INTO {table} SELECT * FROM frame")
+                rows += len(chunk)
+    _stats["loads"] += 1
+    _stats["load_seconds"] += time.perf_counter() - started
+    _stats["rows"] += rows
+
+def _snapshot(user_id):
+    """Cursor do DuckDB com a cópia do usuário em dia (carrega ou recarrega se preciso)."""
+    duck = _database()
+    version = db.data_version(user_id)
+    with _lock:
+        loaded = _loaded.get(user_id)
+        if loaded is None or loaded[0] != version or time.monotonic() - loaded[1] >= SNAPSHOT_TTL:
+            _in_transaction(duck, _load_user, user_id)
+            _loaded[user_id] = (version, time.monotonic())
+        _loaded.move_to_end(user_id)
+        while len(_loaded) > SNAPSHOT_MAX_USERS:
+            _in_transaction(duck, _delete_user, _loaded.popitem(last=False)[0])
+        # Cada chamada usa o seu cursor: a conexão do DuckDB não deve ser compartilhada entre threads.
+        # A transação aberta aqui, ainda sob o lock, fixa a cópia que a consulta vai ler: uma recarga
+        # ou remoção depois disso não aparece pela metade
+        cursor = duck.cursor()
+        cursor.begin()
+        return cursor
+
+def drop_snapshots():
+    with _lock:
+        if _duck is not None:
+            for user_id in _loaded:
+                _in_transaction(_duck, _delete_user, user_id)
+        _loaded.clear()
+
+def snapshot_stats():
+    with _lock:
+        return dict(_stats, users=len(_loaded))
+
+def _query(user_id, sql, start, end):
+    cursor = _snapshot(user_id)
+    try:
+        return cursor.execute(sql, {"user_id": user_id, "start": start, "end": end}).fetchall()
+    finally:
+        cursor.rollback()
+        cursor.close()
+
+def get_category_totals(user_id, start, end):
+    """Mesmo resultado de database.get_category_totals, calculado no DuckDB."""
+    return db.category_frame(_query(user_id, _CATEGORY_QUERY, start, end))
+
+def get_annual_summary(user_id, year):
+    """Mesmo resultado de database.get_annual_summary, calculado no DuckDB. Não passa pelo @analytical
+    (o rollup do SQLite é mais rápido); serve de comparação no benchmarks/olap_bench.py."""
+    start, end = db.to_period(1, year), db.to_period(12, year)
+    totals = np.zeros((12, 3), dtype=np.int64)
+    rows = _query(user_id, _PERIOD_QUERY, start, end)
+    if rows:
+        found = np.array([[v or 0 for v in row] for row in rows], dtype=np.int64)
+        totals[found[:, 0] - start] = found[:, 1:]
+    frame = pd.DataFrame(totals, columns=["income", "expense", "investment"])
+    frame.insert(0, "month", np.arange(1, 13))
+    return frame
+
+instrumentation.instrument_functions(globals(), exclude={"available", "drop_snapshots", "snapshot_stats"})
@@ -1,8 +1,7 @@
+import re
 import streamlit as st
 
-def apply_styles():
-    st.markdown("""
-        <style>
+CSS = """
         @import url('https://fonts.googleapis.com/css2?family=Inter:wght@400;600;800&family=Playfair+Display:wght@700&display=swap');
         
         /* Paleta de Prosperidade: 
@@ -97,5 +96,16 @@ def apply_styles():
                 letter-spacing: 3px;
             }
         }
-        </style>
-    """, unsafe_allow_html=True)
+"""
+
+def minify_css(css):
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    css = re.sub(r"\s+", " ", css)
+    return re.sub(r"\s*([{};])\s*", r"\1", css).strip()
+
+# Montado uma vez por processo; o Streamlit reexecuta o app.py a cada interação, mas não reimporta este módulo
+STYLE_TAG = f"<style>{minify_css(CSS)}</style>"
+
+def apply_styles():
+    # A tag precisa ser reenviada a cada rerun (elementos não reemitidos somem da página)
+    st.markdown(STYLE_TAG, unsafe_allow_html=True)
@@ -0,0 +1,36 @@
+import os
+import sys
+import tempfile
+
+# database.py lê estas variáveis na importação: banco temporário e bcrypt barato
+os.environ.setdefault("FINANCE_DB", os.path.join(tempfile.mkdtemp(prefix="finance_tests_"), "import.db"))
+os.environ.setdefault("FINANCE_BCRYPT_ROUNDS", "4")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+import database as db
+
+@pytest.fixture
+def fresh_db(tmp_path, monkeypatch):
+    """database apontando para um arquivo novo (sem shards), já migrado."""
+    db.close_all_connections()
+    db.read_cache.clear()
+    monkeypatch.setattr(db, "DB_NAME", str(tmp_path / "finance.db"))
+    monkeypatch.setattr(db, "SHARDS", 0)
+    db.init_db()
+    yield db
+    db.close_all_connections()
+    db.read_cache.clear()
+
+@pytest.fixture
+def sharded_db(fresh_db, monkeypatch):
+    """Como fresh_db, com os dados espalhados por 2 shards."""
+    fresh_db.close_all_connections()
+    monkeypatch.setattr(fresh_db, "SHARDS", 2)
+    fresh_db.init_db()
+    return fresh_db
+
+def new_user(db, name="ana"):
+    db.create_user(name, f"{name}@example.com", "senha123")
+    with db.connection() as conn:
+        return conn.execute("SELECT id FROM users WHERE username = ?", (name,)).fetchone()[0]
@@ -0,0 +1,58 @@
+import json
+import threading
+import http.client
+import pytest
+import api
+from conftest import new_user
+
+@pytest.fixture
+def server(fresh_db):
+    server = api.make_server("127.0.0.1", 0, workers=2)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def _request(server, method, path, body=None, headers=None):
+    conn = http.client.HTTPConnection(*server.server_address, timeout=10)
+    try:
+        conn.request(method, path, body=None if body is None else json.dumps(body), headers=headers or {})
+        response = conn.getresponse()
+        data = response.read()
+        return response.status, response.headers, json.loads(data) if data else None
+    finally:
+        conn.close()
+
+def _login(server, password="senha123"):
+    status, _, body = _request(server, "POST", "/api/login", {"user": "ana", "password": password})
+    assert status == 200, body
+    return {"Authorization": f"Bearer {body['token']}"}
+
+def test_etag_revalidation(fresh_db, server):
+    db = fresh_db
+    user_id = new_user(db)
+    auth = _login(server)
+    status, headers, body = _request(server, "GET", "/api/month?month=3&year=2025", headers=auth)
+    assert status == 200 and body["totals"]["expense"] == 0
+    tag = headers["ETag"]
+    status, headers, body = _request(server, "GET", "/api/month?month=3&year=2025", headers={**auth, "If-None-Match": tag})
+    assert status == 304 and body is None and headers["ETag"] == tag
+    db.add_expense(user_id, "Mercado", 12050, "Alimentação", 3, 2025)
+    status, headers, body = _request(server, "GET", "/api/month?month=3&year=2025", headers={**auth, "If-None-Match": tag})
+    assert status == 200 and headers["ETag"] != tag
+    assert body["totals"]["expense"] == 12050 and body["expenses"]["count"] == 1
+
+def test_password_change_invalidates_token(fresh_db, server):
+    db = fresh_db
+    new_user(db)
+    auth = _login(server)
+    assert _request(server, "GET", "/api/goals", headers=auth)[0] == 200
+    user_id, expires, signature = auth["Authorization"][7:].split(".")
+    forged = {"Authorization": f"Bearer {int(user_id) + 1}.{expires}.{signature}"}
+    assert _request(server, "GET", "/api/goals", headers=forged)[0] == 401
+    db.reset_password("ana@example.com", "outra-senha")
+    status, headers, _ = _request(server, "GET", "/api/goals", headers=auth)
+    assert status == 401 and headers["WWW-Authenticate"] == "Bearer"
+    assert _request(server, "GET", "/api/goals", headers=_login(server, "outra-senha"))[0] == 200
+    assert _request(server, "POST", "/api/login", {"user": "ana", "password": "senha123"})[0] == 401
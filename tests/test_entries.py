@@ -0,0 +1,39 @@
+from conftest import new_user
+
+ROWS = 950  # mais que um lote de ID_BATCH (900) ids
+
+def _bulk_expenses(db, user_id, rows=ROWS):
+    with db.connection(user_id=user_id) as conn:
+        conn.executemany("INSERT INTO expenses (user_id, description, value, category, is_recurring, month, year) "
+                         "VALUES (?, ?, ?, 'Ocasional', 0, 3, 2025)",
+                         [(user_id, f"Compra {i}", 100 + i) for i in range(rows)])
+        return [row[0] for row in conn.execute("SELECT id FROM expenses WHERE user_id = ? ORDER BY id", (user_id,))]
+
+def test_delete_entries_ignores_other_users_ids(fresh_db):
+    db = fresh_db
+    owner, other = new_user(db, "ana"), new_user(db, "bia")
+    owner_ids, other_ids = _bulk_expenses(db, owner), _bulk_expenses(db, other)
+    other_total = db.get_month_totals(other, 3, 2025)[1]
+    # Ids de bia misturados aos de ana, espalhados por mais de um lote de 900
+    assert db.delete_entries("expenses", other_ids + owner_ids[:10], owner) == 10
+    assert db.delete_entries("expenses", other_ids, owner) == 0
+    assert db.get_entries_page("expenses", other, 3, 2025)[1] == ROWS
+    assert db.get_month_totals(other, 3, 2025)[1] == other_total
+    assert db.delete_entries("expenses", owner_ids, owner) == ROWS - 10
+    assert db.get_month_totals(owner, 3, 2025) == (0, 0, 0)
+
+def test_pages_add_up_to_total(fresh_db):
+    db = fresh_db
+    user_id = new_user(db)
+    ids = _bulk_expenses(db, user_id)
+    seen = []
+    for page in range(1, db.page_count(ROWS, 100) + 1):
+        frame, rows = db.get_entries_page("expenses", user_id, 3, 2025, page, page_size=100)
+        assert rows == ROWS
+        seen += frame["id"].tolist()
+    assert len(seen) == ROWS and sorted(seen) == ids
+    # O snapshot pagina igual e leva uma página além do fim para a última existente
+    snapshot = db.get_month_snapshot(user_id, 3, 2025, pages=(1, 99, 1), page_size=100)
+    assert snapshot.counts == (0, ROWS, 0) and snapshot.pages == (1, 10, 1)
+    assert len(snapshot.expenses) == ROWS - 900
+    assert snapshot.totals[1] == sum(100 + i for i in range(ROWS))
@@ -0,0 +1,42 @@
+import io
+import zipfile
+import pytest
+import exporter
+from conftest import new_user
+
+def test_export_to_bytes_is_accepted_by_download_button(fresh_db):
+    download_data = pytest.importorskip("streamlit.runtime.download_data_util")
+    user_id = new_user(fresh_db)
+    fresh_db.add_expense(user_id, "Mercado", 12050, "Alimentação", 3, 2025)
+    # O mesmo conversor que o st.download_button aplica ao resultado do callable adiado
+    data, _ = download_data.convert_data_to_bytes_and_infer_mime(
+        exporter.export_to_bytes(user_id), RuntimeError("formato recusado"))
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        assert "manifest.json" in archive.namelist()
+
+def test_backup_round_trip(fresh_db):
+    db = fresh_db
+    source, target = new_user(db, "ana"), new_user(db, "bia")
+    db.add_goal(source, "Viagem", 500000, "2030-01-01")
+    goal_id = int(db.get_goals(source)["id"].iloc[0])
+    db.add_investment(source, 10000, "CDB", 1, 2025, goal_id=goal_id)
+    db.add_expense(source, "Aluguel", 150000, "Fixa", 1, 2025, is_recurring=1)
+    stats = exporter.restore_user(io.BytesIO(exporter.export_to_bytes(source)), target)
+    assert stats["goals"] == 1 and stats["investments"] == 1 and stats["recurrences"] == 1
+    assert db.get_month_totals(target, 1, 2025) == db.get_month_totals(source, 1, 2025)
+    restored = db.get_goals(target)
+    assert restored["current_value"].tolist() == db.get_goals(source)["current_value"].tolist()
+    with pytest.raises(ValueError):
+        exporter.restore_user(io.BytesIO(exporter.export_to_bytes(source)), target)
+
+def test_backup_page_renders(fresh_db):
+    testing = pytest.importorskip("streamlit.testing.v1")
+    user_id = new_user(fresh_db)
+    at = testing.AppTest.from_file("../app.py", default_timeout=60)
+    at.session_state["logged_in"] = True
+    at.session_state["user_id"] = user_id
+    at.session_state["username"] = "ana"
+    at.run()
+    at.sidebar.radio[0].set_value("💾 Backup").run()
+    assert not at.exception
+    assert at.subheader[0].value == "💾 Backup dos Dados"
@@ -0,0 +1,100 @@
+import random
+import pytest
+import analytics
+from conftest import new_user
+
+def _month_year(period):
+    return period % 12 + 1, period // 12
+
+def _goal_ids(db, user_id):
+    return db.get_goals(user_id)["id"].tolist()
+
+def _brute_force(rules, overrides, single, initial, now):
+    # Expande mês a mês: ocorrências das regras com exceções + avulsos até o mês atual
+    linked = dict(initial)
+    for rule_id, (goal_id, value, start, end, interval) in rules.items():
+        for period in range(start, min(now if end is None else end, now) + 1):
+            if (period - start) % interval:
+                continue
+            skip, override = overrides.get((rule_id, period), (0, None))
+            linked[goal_id] += 0 if skip else value if override is None else override
+    for goal_id, period, amount in single:
+        if period <= now:
+            linked[goal_id] += amount
+    return linked
+
+def test_progress_matches_brute_force_expansion(fresh_db):
+    db, rng = fresh_db, random.Random(19)
+    user_id = new_user(db)
+    now = db.current_period()
+    for name in ("Viagem", "Reserva", "Carro"):
+        db.add_goal(user_id, name, 10_000_000)
+    goals = _goal_ids(db, user_id)
+    initial = {goal_id: 0 for goal_id in goals}
+    db.update_goal_progress(goals[0], user_id, 5000)
+    initial[goals[0]] = 5000
+
+    rules, overrides, single = {}, {}, []
+    for _ in range(8):
+        goal_id, value = rng.choice(goals), rng.randrange(1000, 50000)
+        start, interval = now - rng.randrange(-3, 40), rng.choice((1, 1, 2, 3))
+        occurrences = rng.choice((None, rng.randrange(1, 25)))
+        rule_id = db.add_recurrence(user_id, "investment", None, value, "CDB", *_month_year(start),
+                                    occurrences, interval, goal_id=goal_id)
+        end = None if occurrences is None else start + (occurrences - 1) * interval
+        rules[rule_id] = (goal_id, value, start, end, interval)
+        for _ in range(4):
+            period = start + rng.randrange(0, 30)
+            if rng.random() < 0.5:
+                db.skip_recurrence(rule_id, user_id, *_month_year(period))
+                overrides[(rule_id, period)] = (1, None)
+            else:
+                override = rng.randrange(0, 90000)
+                db.override_recurrence(rule_id, user_id, *_month_year(period), override)
+                overrides[(rule_id, period)] = (0, override)
+    for _ in range(20):
+        goal_id, period, amount = rng.choice(goals), now - rng.randrange(-6, 48), rng.randrange(100, 30000)
+        db.add_investment(user_id, amount, "Tesouro", *_month_year(period), goal_id=goal_id)
+        single.append((goal_id, period, amount))
+    db.add_investment(user_id, 99999, "Sem meta", *_month_year(now))
+
+    expected = _brute_force(rules, overrides, single, initial, now)
+    progress = db.get_goals(user_id).set_index("id")["current_value"].to_dict()
+    assert progress == expected
+    forecast = analytics.forecast_goals(user_id).set_index("id")["current_value"].to_dict()
+    assert forecast == expected
+
+def test_foreign_goal_is_rejected(fresh_db):
+    db = fresh_db
+    owner, other = new_user(db, "ana"), new_user(db, "bia")
+    db.add_goal(owner, "Viagem", 500000)
+    goal_id = _goal_ids(db, owner)[0]
+    with pytest.raises(ValueError):
+        db.add_investment(other, 10000, "CDB", 1, 2025, goal_id=goal_id)
+    with pytest.raises(ValueError):
+        db.add_investment(other, 10000, "CDB", 1, 2025, is_recurring=1, goal_id=goal_id)
+    assert db.get_investments(other, 1, 2025).empty and db.get_recurrences(other).empty
+    assert db.get_goals(owner)["current_value"].tolist() == [0]
+
+def test_foreign_links_do_not_count(fresh_db):
+    db = fresh_db
+    owner, other = new_user(db, "ana"), new_user(db, "bia")
+    db.add_goal(owner, "Viagem", 500000)
+    db.add_goal(other, "Carro", 500000)
+    goal_id = _goal_ids(db, owner)[0]
+    now = db.current_period()
+    month, year = _month_year(now - 1)
+    # Vínculos gravados antes da validação: aporte e regra (com exceção) de outro usuário na meta
+    with db.connection() as conn:
+        conn.execute("INSERT INTO investments (user_id, amount, category, is_recurring, month, year, goal_id) "
+                     "VALUES (?, 10000, 'CDB', 0, ?, ?, ?)", (other, month, year, goal_id))
+        rule_id = conn.execute("INSERT INTO recurrences (user_id, kind, description, value, category, start_period, "
+                               "end_period, interval_months, goal_id) VALUES (?, 'investment', NULL, 5000, 'CDB', ?, "
+                               "NULL, 1, ?)", (other, now - 3, goal_id)).lastrowid
+        conn.execute("INSERT INTO recurrence_overrides (recurrence_id, period, value, skip) VALUES (?, ?, 0, 0)",
+                     (rule_id, now - 2))
+    db.read_cache.clear()
+    assert db.get_goals(owner)["current_value"].tolist() == [0]
+    assert analytics.forecast_goals(owner)["current_value"].tolist() == [0]
+    # A regra fica de fora das metas de bia, mas a exceção dela ainda vem na consulta
+    assert analytics.forecast_goals(other)["current_value"].tolist() == [0]
@@ -0,0 +1,19 @@
+import io
+import importer
+from conftest import new_user
+
+def test_parse_amounts_brazilian_format():
+    parsed = importer.parse_amounts(["1.234,56", "R$ 10,00", "-1.000.000,01", "10,5", "abc", None])
+    assert parsed[:4].tolist() == [1234.56, 10.0, -1000000.01, 10.5]
+    assert parsed[4:].isna().all()
+
+def test_parse_amounts_us_format():
+    parsed = importer.parse_amounts(["1,234.56", "-1234.56", "2,500,000.5", "7.25"])
+    assert parsed.tolist() == [1234.56, -1234.56, 2500000.5, 7.25]
+
+def test_import_us_statement(fresh_db):
+    user_id = new_user(fresh_db)
+    csv = "date,description,amount\n2025-03-05,GROCERY,\"-1,234.56\"\n2025-03-06,SALARIO,\"3,000.00\"\n"
+    stats = importer.import_statement(io.StringIO(csv), user_id)
+    assert stats["incomes"] == 1 and stats["expenses"] == 1
+    assert fresh_db.get_month_totals(user_id, 3, 2025)[:2] == (300000, 123456)
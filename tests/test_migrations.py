@@ -0,0 +1,208 @@
+import hashlib
+import sqlite3
+import pytest
+import database as db
+import utils
+from conftest import new_user
+
+# Esquema da versão original do app (antes das migrações): dinheiro em reais (REAL), itens recorrentes
+# replicados em 12 linhas com is_recurring = 1 e senhas em SHA-256
+BASELINE_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT NOT NULL,
+        email TEXT NOT NULL UNIQUE,
+        password TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE TABLE IF NOT EXISTS password_resets (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        email TEXT NOT NULL,
+        code TEXT NOT NULL,
+        expires_at TIMESTAMP NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS incomes (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        source_name TEXT NOT NULL,
+        value REAL NOT NULL,
+        category TEXT DEFAULT 'Geral',
+        is_recurring INTEGER DEFAULT 0,
+        month INTEGER NOT NULL,
+        year INTEGER NOT NULL,
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    );
+    CREATE TABLE IF NOT EXISTS expenses (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        description TEXT NOT NULL,
+        value REAL NOT NULL,
+        category TEXT NOT NULL,
+        is_recurring INTEGER DEFAULT 0,
+        month INTEGER NOT NULL,
+        year INTEGER NOT NULL,
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    );
+    CREATE TABLE IF NOT EXISTS investments (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        amount REAL NOT NULL,
+        category TEXT DEFAULT 'Geral',
+        is_recurring INTEGER DEFAULT 0,
+        month INTEGER NOT NULL,
+        year INTEGER NOT NULL,
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    );
+    CREATE TABLE IF NOT EXISTS goals (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        name TEXT NOT NULL,
+        target_value REAL NOT NULL,
+        current_value REAL DEFAULT 0,
+        deadline DATE,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    );
+"""
+
+# (tabela, nome, valor em reais, categoria, recorrente, mês, ano); recorrente = 12 linhas, como o app antigo gravava
+LEGACY_ENTRIES = [
+    ("incomes", "Salário", 5000.10, "Salário", 1, 11, 2024),
+    ("incomes", "Freela", 1234.56, "Freelance", 0, 3, 2024),
+    ("expenses", "Aluguel", 1500.50, "Fixa", 1, 1, 2025),
+    ("expenses", "Academia", 99.90, "Fixa", 1, 2, 2025),
+    ("expenses", "Academia", 99.90, "Fixa", 1, 2, 2025),  # cadastrada duas vezes
+    ("expenses", "Café", 19.99, "Ocasional", 0, 3, 2025),
+    ("expenses", "Café", 19.99, "Ocasional", 0, 3, 2025),
+    ("expenses", "Café", 19.99, "Ocasional", 0, 3, 2025),
+    ("investments", "CDB", 300.00, "CDB", 1, 6, 2024),
+    ("investments", "Tesouro", 0.10, "Tesouro", 0, 3, 2025),
+    ("investments", "Tesouro", 0.20, "Tesouro", 0, 3, 2025),
+]
+LEGACY_MONTHS = [(month, year) for year in (2024, 2025, 2026) for month in range(1, 13)]
+
+def _legacy_rows():
+    for table, name, value, category, recurring, month, year in LEGACY_ENTRIES:
+        for i in range(12 if recurring else 1):
+            yield table, name, value, category, recurring, (month + i - 1) % 12 + 1, year + (month + i - 1) // 12
+
+def _expected_totals():
+    kinds = {"incomes": 0, "expenses": 1, "investments": 2}
+    totals = {key: [0, 0, 0] for key in LEGACY_MONTHS}
+    for table, _, value, _, _, month, year in _legacy_rows():
+        totals[(month, year)][kinds[table]] += utils.to_cents(value)
+    return {key: tuple(value) for key, value in totals.items()}
+
+@pytest.fixture
+def legacy_db(tmp_path, monkeypatch):
+    """Banco criado pela versão original do app, com dados, e depois aberto por init_db."""
+    db.close_all_connections()
+    db.read_cache.clear()
+    path = str(tmp_path / "legacy.db")
+    conn = sqlite3.connect(path)
+    conn.executescript(BASELINE_SCHEMA)
+    conn.execute("INSERT INTO users (username, email, password) VALUES ('ana', 'ana@example.com', ?)",
+                 (hashlib.sha256(b"senha123").hexdigest(),))
+    for table, name, value, category, recurring, month, year in _legacy_rows():
+        if table == "investments":
+            conn.execute("INSERT INTO investments (user_id, amount, category, is_recurring, month, year) "
+                         "VALUES (1, ?, ?, ?, ?, ?)", (value, category, recurring, month, year))
+        else:
+            name_col = "source_name" if table == "incomes" else "description"
+            conn.execute(f"INSERT INTO {table} (user_id, {name_col}, value, category, is_recurring, month, year) "
+                         "VALUES (1, ?, ?, ?, ?, ?, ?)", (name, value, category, recurring, month, year))
+    conn.execute("INSERT INTO goals (user_id, name, target_value, current_value, deadline) "
+                 "VALUES (1, 'Viagem', 10000.0, 2500.75, '2026-12-01')")
+    conn.commit()
+    conn.close()
+    monkeypatch.setattr(db, "DB_NAME", path)
+    monkeypatch.setattr(db, "SHARDS", 0)
+    db.init_db()
+    yield db
+    db.close_all_connections()
+    db.read_cache.clear()
+
+def test_baseline_database_upgrades_with_same_totals(legacy_db):
+    db = legacy_db
+    with db.connection() as conn:
+        assert db.get_schema_version(conn) == db.SCHEMA_VERSION
+    expected = _expected_totals()
+    assert {key: db.get_month_totals(1, *key) for key in LEGACY_MONTHS} == expected
+    assert db.get_annual_summary(1, 2025)["expense"].sum() == sum(expected[(m, 2025)][1] for m in range(1, 13))
+    # Senha antiga (SHA-256) ainda entra e é trocada por bcrypt no primeiro login
+    assert db.login_user("ana", "errada") is None
+    assert db.login_user("ana", "senha123") == (1, "ana")
+    with db.connection() as conn:
+        assert conn.execute("SELECT password FROM users WHERE id = 1").fetchone()[0].startswith("$2")
+    assert db.login_user("ana@example.com", "senha123") == (1, "ana")
+    # O banco migrado continua aceitando escritas e usuários novos
+    db.add_expense(1, "Mercado", 12050, "Alimentação", 3, 2025)
+    assert db.get_month_totals(1, 3, 2025)[1] == expected[(3, 2025)][1] + 12050
+    assert new_user(db, "bia") == 2
+
+def test_baseline_recurring_rows_become_rules(legacy_db):
+    db = legacy_db
+    with db.connection() as conn:
+        for table in ("incomes", "expenses", "investments"):
+            assert conn.execute(f"SELECT COUNT(*) FROM {table} WHERE is_recurring = 1").fetchone()[0] == 0
+    rules = db.get_recurrences(1).sort_values(["kind", "description", "id"])
+    start = {"Salário": db.to_period(11, 2024), "Aluguel": db.to_period(1, 2025),
+             "Academia": db.to_period(2, 2025), None: db.to_period(6, 2024)}
+    assert rules["kind"].tolist() == ["expense", "expense", "expense", "income", "investment"]
+    for rule in rules.itertuples():
+        name = rule.description if rule.kind != "investment" else None
+        assert (rule.start_period, rule.end_period, rule.interval_months) == (start[name], start[name] + 11, 1)
+    assert rules.loc[rules["description"] == "Aluguel", "value"].tolist() == [150050]
+    # A projeção expande as regras e termina onde terminavam as 12 linhas antigas
+    projection = db.get_future_projection(1, 12, 2025, 3)
+    assert projection["Despesa"].tolist() == [150050 + 2 * 9990, 2 * 9990, 0]
+    # "Excluir todas" de um item recorrente remove as duas regras duplicadas
+    db.delete_expense(None, 1, delete_all_recurring=True, description="Academia")
+    assert db.get_month_totals(1, 12, 2025)[1] == 150050
+    assert db.get_month_totals(1, 1, 2026)[1] == 0
+
+def test_baseline_money_becomes_exact_cents(legacy_db):
+    db = legacy_db
+    with db.connection() as conn:
+        for table, money in db.MONEY_COLUMNS.items():
+            types = {row[1]: row[2] for row in conn.execute(f"PRAGMA table_info({table})")}
+            for column in money:
+                assert types[column] == "INTEGER", (table, column)
+                assert conn.execute(f"SELECT COUNT(*) FROM {table} WHERE typeof({column}) NOT IN ('integer', 'null')"
+                                    ).fetchone()[0] == 0, (table, column)
+        # Os rollups são refeitos a partir dos centavos de cada linha, não do total em reais
+        for table, (value_col, kind) in db.ROLLUP_SOURCES.items():
+            rows = conn.execute(f"SELECT year, month, SUM({value_col}) FROM {table} GROUP BY year, month").fetchall()
+            rollup = conn.execute(f"SELECT year, month, {kind} FROM monthly_totals WHERE {kind} != 0").fetchall()
+            assert sorted(rows) == sorted(rollup), table
+    # 3 x 19,99 e 0,10 + 0,20: somas exatas, sem o resíduo do ponto flutuante
+    assert db.get_month_totals(1, 3, 2025) == (500010, 150050 + 2 * 9990 + 3 * 1999, 30000 + 30)
+    goal = db.get_goals(1).iloc[0]
+    assert (goal["target_value"], goal["initial_value"]) == (1000000, 250075)
+
+def _migrate_to(db, monkeypatch, path, version):
+    migrations = db.MIGRATIONS
+    monkeypatch.setattr(db, "MIGRATIONS", migrations[:version])
+    with db.connection(path) as conn:
+        assert db.migrate(conn) == version
+    monkeypatch.setattr(db, "MIGRATIONS", migrations)
+
+def test_user_data_version_moves_to_data_versions(fresh_db, tmp_path, monkeypatch):
+    db, path = fresh_db, str(tmp_path / "v9.db")
+    _migrate_to(db, monkeypatch, path, 9)
+    with db.connection(path) as conn:
+        conn.execute("INSERT INTO users (username, email, password, data_version) VALUES ('ana', 'a@x', 'x', 7)")
+        conn.execute("INSERT INTO users (username, email, password) VALUES ('bia', 'b@x', 'x')")
+        conn.execute("INSERT INTO users (username, email, password) VALUES ('caio', 'c@x', 'x')")
+        conn.execute("DELETE FROM users WHERE username = 'caio'")
+        conn.commit()
+    with db.connection(path) as conn:
+        assert db.migrate(conn) == db.SCHEMA_VERSION
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(users)")]
+        assert "data_version" not in columns
+        assert conn.execute("SELECT user_id, version FROM data_versions").fetchall() == [(1, 7)]
+        assert conn.execute("SELECT id, username FROM users ORDER BY id").fetchall() == [(1, "ana"), (2, "bia")]
+        # Índices e AUTOINCREMENT sobrevivem à recriação: o id 3 (removido) não volta
+        assert conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'idx_users_username'").fetchone()
+        assert conn.execute("INSERT INTO users (username, email, password) VALUES ('davi', 'd@x', 'x')").lastrowid == 4
+        conn.rollback()
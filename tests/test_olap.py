@@ -0,0 +1,57 @@
+import threading
+import pytest
+from conftest import new_user
+
+pytest.importorskip("duckdb")
+import olap
+
+@pytest.fixture
+def user(fresh_db, monkeypatch):
+    db = fresh_db
+    olap.drop_snapshots()
+    monkeypatch.setattr(db, "ANALYTICS_ENGINE", "sqlite")
+    user_id = new_user(db)
+    db.add_income(user_id, "Salário", 500000, "Salário", 1, 2025, is_recurring=1)
+    db.add_expense(user_id, "Aluguel", 150000, "Fixa", 1, 2025, is_recurring=1)
+    db.add_expense(user_id, "Mercado", 32075, "Alimentação", 3, 2025)
+    db.add_investment(user_id, 20000, "CDB", 2, 2025)
+    yield user_id
+    olap.drop_snapshots()
+
+def test_annual_summary_matches_sqlite(fresh_db, user, monkeypatch):
+    expected = fresh_db.get_annual_summary(user, 2025)
+    assert olap.get_annual_summary(user, 2025).equals(expected)
+    # Mesmo com o DuckDB forçado, o resumo anual continua no rollup do SQLite
+    monkeypatch.setattr(fresh_db, "ANALYTICS_ENGINE", "duckdb")
+    fresh_db.read_cache.clear()
+    loads = olap.snapshot_stats()["loads"]
+    assert fresh_db.get_annual_summary(user, 2025).equals(expected)
+    assert olap.snapshot_stats()["loads"] == loads
+
+def test_category_totals_match_sqlite(fresh_db, user):
+    expected = fresh_db.get_category_totals(user, 2025 * 12, 2025 * 12 + 11)
+    got = olap.get_category_totals(user, 2025 * 12, 2025 * 12 + 11)
+    key = ["period", "kind", "category"]
+    assert got.sort_values(key).reset_index(drop=True).equals(expected.sort_values(key).reset_index(drop=True))
+
+def test_reload_never_exposes_half_loaded_copy(fresh_db, user, monkeypatch):
+    monkeypatch.setattr(olap, "LOAD_CHUNK_SIZE", 1)  # um INSERT por linha: muitas janelas para a corrida
+    monkeypatch.setattr(olap, "SNAPSHOT_TTL", 0)  # toda consulta recarrega a cópia
+    expected = olap.get_annual_summary(user, 2025)
+    failures, stop = [], threading.Event()
+
+    def reader():
+        while not stop.is_set():
+            got = olap.get_annual_summary(user, 2025)
+            if not got.equals(expected):
+                failures.append(got)
+
+    threads = [threading.Thread(target=reader) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for _ in range(30):
+        olap.get_annual_summary(user, 2025)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    assert not failures
@@ -0,0 +1,74 @@
+import io
+import importer
+from conftest import new_user
+
+def _entry_id(db, user_id, table):
+    return int(getattr(db.get_month_snapshot(user_id, 3, 2025), table)["id"].iloc[0])
+
+def _rule_id(db, user_id):
+    return int(db.get_recurrences(user_id)["id"].iloc[0])
+
+def test_every_write_path_invalidates_cached_reads(fresh_db):
+    db = fresh_db
+    user_id = new_user(db)
+    csv = "Data;Descrição;Valor\n10/03/2025;MERCADO;-120,50\n"
+    # (escrita, totais esperados de março e abril/2025 depois dela)
+    steps = [
+        (lambda: db.add_income(user_id, "Salário", 300000, "Salário", 3, 2025),
+         ((300000, 0, 0), (0, 0, 0))),
+        (lambda: db.add_expense(user_id, "Aluguel", 100000, "Fixa", 1, 2025, is_recurring=1),
+         ((300000, 100000, 0), (0, 100000, 0))),
+        (lambda: db.override_recurrence(_rule_id(db, user_id), user_id, 3, 2025, 80000),
+         ((300000, 80000, 0), (0, 100000, 0))),
+        (lambda: db.skip_recurrence(_rule_id(db, user_id), user_id, 3, 2025),
+         ((300000, 0, 0), (0, 100000, 0))),
+        (lambda: db.end_recurrence(_rule_id(db, user_id), user_id, 4, 2025),
+         ((300000, 0, 0), (0, 0, 0))),
+        (lambda: db.add_investment(user_id, 5000, "CDB", 3, 2025),
+         ((300000, 0, 5000), (0, 0, 0))),
+        (lambda: db.delete_entries("investments", [_entry_id(db, user_id, "investments")], user_id),
+         ((300000, 0, 0), (0, 0, 0))),
+        (lambda: db.delete_income(_entry_id(db, user_id, "incomes"), user_id),
+         ((0, 0, 0), (0, 0, 0))),
+        (lambda: importer.import_statement(io.StringIO(csv), user_id),
+         ((0, 12050, 0), (0, 0, 0))),
+        (lambda: db.delete_recurrence(_rule_id(db, user_id), user_id),
+         ((0, 12050, 0), (0, 0, 0))),
+    ]
+    for number, (write, expected) in enumerate(steps):
+        # Leituras em cache antes da escrita; depois dela, a versão muda e a leitura traz o dado novo
+        db.get_month_totals(user_id, 3, 2025), db.get_month_totals(user_id, 4, 2025)
+        version, stored = db.data_version(user_id), db.sync_data_version(user_id)
+        write()
+        assert db.data_version(user_id) > version, number
+        assert db.sync_data_version(user_id) > stored, number
+        assert (db.get_month_totals(user_id, 3, 2025), db.get_month_totals(user_id, 4, 2025)) == expected, number
+    assert db.get_recurrences(user_id).empty
+
+def test_goal_writes_invalidate_cached_goals(fresh_db):
+    db = fresh_db
+    user_id = new_user(db)
+    assert db.get_goals(user_id).empty
+    db.add_goal(user_id, "Viagem", 500000)
+    goal_id = int(db.get_goals(user_id)["id"].iloc[0])
+    db.update_goal_progress(goal_id, user_id, 20000)
+    assert db.get_goals(user_id)["current_value"].tolist() == [20000]
+    db.add_investment(user_id, 1000, "CDB", 1, 2020, goal_id=goal_id)
+    assert db.get_goals(user_id)["current_value"].tolist() == [21000]
+    db.delete_goal(goal_id, user_id)
+    assert db.get_goals(user_id).empty
+
+def test_other_process_write_is_seen_after_sync(fresh_db):
+    db = fresh_db
+    user_id = new_user(db)
+    db.sync_data_version(user_id)
+    assert db.get_month_totals(user_id, 3, 2025) == (0, 0, 0)
+    # Escrita direta no arquivo, como faria outro processo: só data_versions avisa a mudança
+    with db.connection(user_id=user_id) as conn:
+        conn.execute("INSERT INTO incomes (user_id, source_name, value, category, is_recurring, month, year) "
+                     "VALUES (?, 'Bônus', 700, 'Outros', 0, 3, 2025)", (user_id,))
+        db._store_data_versions(conn, [user_id])
+        conn.commit()
+    assert db.get_month_totals(user_id, 3, 2025) == (0, 0, 0)  # ainda em cache
+    db.sync_data_version(user_id)
+    assert db.get_month_totals(user_id, 3, 2025) == (700, 0, 0)
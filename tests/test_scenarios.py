@@ -0,0 +1,72 @@
+import random
+import numpy as np
+import analytics
+from conftest import new_user
+
+PATHS = 2000
+
+def _month_year(period):
+    return period % 12 + 1, period // 12
+
+def _deadline(period):
+    month, year = _month_year(period)
+    return f"{year}-{month:02d}-01"
+
+def test_percentile_bands_are_ordered_and_seeded(fresh_db):
+    db, rng = fresh_db, random.Random(24)
+    user_id = new_user(db)
+    now = db.current_period()
+    for period in range(now - 24, now):
+        db.add_income(user_id, "Freela", rng.randrange(100000, 600000), "Freelance", *_month_year(period))
+        db.add_expense(user_id, "Mercado", rng.randrange(50000, 400000), "Alimentação", *_month_year(period))
+        db.add_investment(user_id, rng.randrange(0, 80000), "CDB", *_month_year(period))
+    db.add_expense(user_id, "Aluguel", 150000, "Fixa", *_month_year(now - 24), is_recurring=1, occurrences=None)
+    bands = analytics.simulate_projection(user_id, now + 1, 12, paths=PATHS, seed=7).bands
+    for prefix in ("balance", "cumulative"):
+        assert (bands[f"{prefix}_p10"] <= bands[f"{prefix}_p50"]).all()
+        assert (bands[f"{prefix}_p50"] <= bands[f"{prefix}_p90"]).all()
+    assert (bands["balance_p10"] < bands["balance_p90"]).all()  # histórico variável: bandas abertas
+    db.read_cache.clear()
+    again = analytics.simulate_projection(user_id, now + 1, 12, paths=PATHS, seed=7).bands
+    assert again.equals(bands)
+
+def test_bands_collapse_without_variance(fresh_db):
+    db = fresh_db
+    user_id = new_user(db)
+    now = db.current_period()
+    # Só regras: o histórico de avulsos é todo zero e cada caminho repete o programado
+    db.add_income(user_id, "Salário", 500000, "Salário", *_month_year(now - 24), is_recurring=1, occurrences=None)
+    db.add_expense(user_id, "Aluguel", 150000, "Fixa", *_month_year(now - 24), is_recurring=1, occurrences=None)
+    bands = analytics.simulate_projection(user_id, now + 1, 12, paths=PATHS, seed=7).bands
+    for q in analytics.SCENARIO_PERCENTILES:
+        assert (bands[f"balance_p{q}"] == bands["scheduled_balance"]).all()
+        assert (bands[f"cumulative_p{q}"] == bands["scheduled_balance"].cumsum()).all()
+    # Avulsos idênticos todo mês: a banda fecha no programado + o avulso de sempre
+    for period in range(now - 24, now):
+        db.add_expense(user_id, "Mercado", 30000, "Alimentação", *_month_year(period))
+    bands = analytics.simulate_projection(user_id, now + 1, 12, paths=PATHS, seed=7).bands
+    for q in analytics.SCENARIO_PERCENTILES:
+        assert (bands[f"balance_p{q}"] == bands["scheduled_balance"] - 30000).all()
+
+def test_goal_probabilities_stay_in_range(fresh_db):
+    db, rng = fresh_db, random.Random(5)
+    user_id = new_user(db)
+    now = db.current_period()
+    goals = [("Reserva", 50000, _deadline(now + 12)), ("Viagem", 1_440_000, _deadline(now + 6)),
+             ("Casa", 90_000_000, _deadline(now + 24)), ("Vencida", 900000, _deadline(now - 1)),
+             ("Sem prazo", 300000, None)]
+    for name, target, deadline in goals:
+        db.add_goal(user_id, name, target, deadline)
+    ids = db.get_goals(user_id)["id"].tolist()
+    for period in range(now - 18, now):
+        db.add_investment(user_id, rng.randrange(0, 120000), "CDB", *_month_year(period), goal_id=ids[1])
+        db.add_investment(user_id, rng.randrange(0, 30000), "Tesouro", *_month_year(period), goal_id=ids[0])
+    result = analytics.simulate_projection(user_id, now + 1, 12, paths=PATHS, seed=7).goals.set_index("name")
+    probability = result["hit_probability"]
+    known = probability.dropna()
+    assert ((known >= 0) & (known <= 1)).all()
+    assert np.isnan(probability["Sem prazo"])
+    assert probability["Reserva"] == 1.0  # já atingida pelos aportes vinculados
+    assert probability["Vencida"] == 0.0
+    assert probability["Casa"] == 0.0
+    assert 0 < probability["Viagem"] < 1
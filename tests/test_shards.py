@@ -0,0 +1,41 @@
+import io
+import time
+import exporter
+import importer
+from conftest import new_user
+
+CSV = "Data;Descrição;Valor\n05/03/2025;MERCADO;-120,50\n06/03/2025;SALARIO;3.000,00\n"
+
+def _stale_after_move(db, user_id):
+    # Move o usuário e deixa o mapa deste processo apontando para o shard antigo (como outro processo)
+    old = db.shard_of(user_id)
+    db.move_user(user_id, 1 - old)
+    db._placements[user_id] = (old, time.monotonic())
+    return old
+
+def _rows(db, path, user_id):
+    with db.connection(path) as conn:
+        return conn.execute("SELECT (SELECT COUNT(*) FROM incomes WHERE user_id = :u) + "
+                            "(SELECT COUNT(*) FROM expenses WHERE user_id = :u)", {"u": user_id}).fetchone()[0]
+
+def test_import_after_move_lands_on_new_shard(sharded_db):
+    db = sharded_db
+    user_id = new_user(db)
+    old = _stale_after_move(db, user_id)
+    stats = importer.import_statement(io.StringIO(CSV), user_id)
+    assert stats["incomes"] + stats["expenses"] == 2
+    assert db.shard_of(user_id) == 1 - old
+    assert _rows(db, db.shard_file(1 - old), user_id) == 2
+    assert _rows(db, db.shard_file(old), user_id) == 0
+
+def test_restore_after_move_lands_on_new_shard(sharded_db, tmp_path):
+    db = sharded_db
+    source, target = new_user(db, "ana"), new_user(db, "bia")
+    db.add_expense(source, "Aluguel", 150000, "Fixa", 1, 2025)
+    exporter.export_user(source, tmp_path / "backup.zip")
+    old = _stale_after_move(db, target)
+    exporter.restore_user(tmp_path / "backup.zip", target)
+    assert _rows(db, db.shard_file(1 - old), target) == 1
+    assert _rows(db, db.shard_file(old), target) == 0
+    db.purge_moved_users(0)
+    assert db.get_month_totals(target, 1, 2025)[1] == 150000
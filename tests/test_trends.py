@@ -0,0 +1,46 @@
+import random
+import numpy as np
+import pandas as pd
+import analytics
+from conftest import new_user
+
+def test_trends_match_pandas_reference(fresh_db):
+    db, rng = fresh_db, random.Random(16)
+    user_id = new_user(db)
+    first = 2021 * 12
+    periods = pd.RangeIndex(first, first + 40)
+    expected = pd.DataFrame(0, index=periods, columns=["income", "expense", "investment"])
+    # Lançamentos avulsos espalhados, com meses vazios no meio, e uma regra de 12 meses
+    for _ in range(60):
+        period, kind, value = rng.choice(periods[:-3]), rng.choice(expected.columns), rng.randrange(100, 500000)
+        month, year = period % 12 + 1, period // 12
+        if kind == "income":
+            db.add_income(user_id, "Salário", value, "Salário", month, year)
+        elif kind == "expense":
+            db.add_expense(user_id, "Mercado", value, "Alimentação", month, year)
+        else:
+            db.add_investment(user_id, value, "CDB", month, year)
+        expected.loc[period, kind] += value
+    db.add_expense(user_id, "Aluguel", 150000, "Fixa", 3, 2022, is_recurring=1, occurrences=12)
+    expected.loc[first + 14:first + 25, "expense"] += 150000
+
+    start, end = periods[0], periods[-1]
+    monthly = analytics.get_monthly_trends(user_id, start, end, window=3).set_index("period")
+    balance = expected["income"] - expected["expense"]
+    reference = pd.DataFrame({
+        "running_balance": balance.cumsum(), "cumulative_invested": expected["investment"].cumsum(),
+        "income_yoy": expected["income"] - expected["income"].shift(12),
+        "balance_yoy": balance - balance.shift(12),
+        "expense_ma": expected["expense"].rolling(3, min_periods=1).mean(),
+        "balance_ma": balance.rolling(3, min_periods=1).mean(),
+    })
+    assert (monthly["expense"] == expected["expense"]).all()
+    for column in reference:
+        np.testing.assert_allclose(monthly[column].astype(float), reference[column].astype(float), err_msg=column)
+
+    yearly = analytics.get_yearly_trends(user_id, start, end).set_index("year")
+    by_year = expected.groupby(expected.index // 12).sum()
+    year_balance = by_year["income"] - by_year["expense"]
+    assert yearly["running_balance"].tolist() == year_balance.cumsum().tolist()
+    np.testing.assert_allclose(yearly["expense_yoy_pct"].astype(float),
+                               (by_year["expense"].pct_change() * 100).astype(float))
@@ -0,0 +1,13 @@
+import numpy as np
+import pandas as pd
+import utils
+
+def test_scalar_and_array_formatting_agree():
+    values = pd.Series([0, 1.5, 2.5, -1.5, 0.4, 99.5, 123456789, -100000, 1234.4999, np.nan])
+    assert utils.format_currency_array(values).tolist() == [utils.format_currency(v) for v in values]
+    assert utils.format_currency(1.5) == "R$ 0,02"
+
+def test_format_currency_array_keeps_index():
+    values = pd.Series([150000, -5, None], index=["a", "b", "c"], dtype="Int64")
+    formatted = utils.format_currency_array(values)
+    assert formatted.to_dict() == {"a": "R$ 1.500,00", "b": "R$ -0,05", "c": "R$ 0,00"}
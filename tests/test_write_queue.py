@@ -0,0 +1,77 @@
+import threading
+import time
+import pytest
+from conftest import new_user
+
+def _descriptions(db, user_id):
+    with db.connection(user_id=user_id) as conn:
+        return sorted(row[0] for row in conn.execute("SELECT description FROM expenses WHERE user_id = ?", (user_id,)))
+
+def test_failing_operation_rolls_back_only_itself(fresh_db):
+    db = fresh_db
+    user_id = new_user(db)
+    writer = db.get_writer(db.shard_path(user_id))
+    started, release = threading.Event(), threading.Event()
+
+    def hold_writer():
+        started.set()
+        release.wait(10)
+
+    @db.invalidates
+    def partial_then_fail(user_id):
+        db.add_expense(user_id, "Parcial", 100, "Ocasional", 1, 2025)  # escrita aninhada, no mesmo SAVEPOINT
+        raise RuntimeError("falhou no meio")
+
+    # Segura a thread de escrita para que as três operações entrem no mesmo lote
+    blocker = writer.submit(hold_writer)
+    assert started.wait(10)
+    batches = writer.stats["batches"]
+    first = db.submit_write(db.add_expense, user_id, "Antes", 1000, "Ocasional", 1, 2025)
+    failing = db.submit_write(partial_then_fail, user_id)
+    last = db.submit_write(db.add_expense, user_id, "Depois", 2000, "Ocasional", 1, 2025)
+    release.set()
+    blocker.result(10)
+    first.result(10)
+    last.result(10)
+    with pytest.raises(RuntimeError):
+        failing.result(10)
+    assert writer.stats["batches"] == batches + 2 and writer.stats["largest_batch"] >= 3
+    assert _descriptions(db, user_id) == ["Antes", "Depois"]
+    assert db.get_month_totals(user_id, 1, 2025)[1] == 3000
+
+def test_caller_reads_its_own_write(fresh_db):
+    db = fresh_db
+    user_id = new_user(db)
+    assert db.get_month_totals(user_id, 2, 2025) == (0, 0, 0)  # fica em cache
+    db.add_income(user_id, "Salário", 500000, "Salário", 2, 2025)
+    assert db.get_month_totals(user_id, 2, 2025) == (500000, 0, 0)
+    # De várias threads ao mesmo tempo: cada uma enxerga a própria escrita assim que a chamada retorna
+    errors = []
+
+    def session(value):
+        db.add_expense(user_id, f"Compra {value}", value, "Ocasional", 2, 2025)
+        snapshot = db.get_month_snapshot(user_id, 2, 2025)
+        if f"Compra {value}" not in snapshot.expenses["description"].tolist():
+            errors.append(value)
+
+    threads = [threading.Thread(target=session, args=(value,)) for value in range(100, 1100, 100)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert db.get_month_totals(user_id, 2, 2025)[1] == sum(range(100, 1100, 100))
+
+def test_write_after_move_is_redirected(sharded_db):
+    db = sharded_db
+    user_id = new_user(db)
+    old = db.shard_of(user_id)
+    db.move_user(user_id, 1 - old)
+    db._placements[user_id] = (old, time.monotonic())  # mapa deste processo ainda aponta para o shard antigo
+    redirected = db.get_writer(db.shard_file(old)).stats["redirected"]
+    db.add_expense(user_id, "Aluguel", 150000, "Fixa", 1, 2025)
+    assert db.get_writer(db.shard_file(old)).stats["redirected"] == redirected + 1
+    assert db.shard_of(user_id) == 1 - old
+    with db.connection(db.shard_file(1 - old)) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM expenses WHERE user_id = ?", (user_id,)).fetchone()[0] == 1
+    assert db.get_month_totals(user_id, 1, 2025)[1] == 150000
@@ -1,13 +1,67 @@
+import numpy as np
 import pandas as pd
+from decimal import Decimal, ROUND_HALF_UP
+from functools import lru_cache
 
-def format_currency(value):
-    """Formata um valor numérico para o padrão de moeda brasileiro R$ 0.000,00"""
+def to_cents(value):
+    """Converte um valor em reais (número ou texto) para centavos inteiros, arredondando meio centavo para cima"""
     if value is None:
-        value = 0.0
-    return f"R$ {value:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+        return 0
+    return int((Decimal(str(value)) * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+def to_reais(cents):
+    """Centavos -> reais, só para exibição (gráficos); aceita escalares, Series e arrays"""
+    return cents / 100
+
+@lru_cache(maxsize=4096)
+def _format_cents(cents):
+    reais, rest = divmod(abs(cents), 100)
+    sign = "-" if cents < 0 else ""
+    return f"R$ {sign}{reais:,}".replace(",", ".") + f",{rest:02d}"
+
+def format_currency(cents):
+    """Formata um valor em centavos para o padrão de moeda brasileiro R$ 0.000,00"""
+    if cents is None or pd.isna(cents):
+        cents = 0
+    # Frações de centavo (médias) são arredondadas como em format_currency_array: meio vai para o par
+    return _format_cents(int(round(cents)))
+
+# Pedaços já formatados: a versão vetorizada só escolhe e concatena strings prontas
+_HEAD = np.array([str(i) for i in range(1000)], dtype=object)
+_GROUP = np.array([f".{i:03d}" for i in range(1000)], dtype=object)
+_CENTS = np.array([f",{i:02d}" for i in range(100)], dtype=object)
+
+def _format_unique(cents):
+    reais, rest = np.divmod(np.abs(cents), 100)
+    # Quantidade de grupos de milhar de cada valor (1 para 0..999)
+    groups = np.ones(len(cents), dtype=np.int64)
+    remaining = reais // 1000
+    while remaining.any():
+        groups += remaining > 0
+        remaining //= 1000
+    out = np.where(cents < 0, "R$ -", "R$ ").astype(object)
+    for level in range(int(groups.max(initial=1)) - 1, -1, -1):
+        digits = (reais // 1000 ** level) % 1000
+        present = groups > level
+        piece = np.where(groups - 1 == level, _HEAD[digits], _GROUP[digits])
+        out[present] += piece[present]
+    return out + _CENTS[rest]
+
+def format_currency_array(values):
+    """Formata uma Series/ndarray de centavos de uma vez (mesmo resultado de format_currency; NaN vira R$ 0,00)"""
+    series = pd.Series(values, copy=False)
+    if series.dtype.kind == "f":
+        series = series.round()
+    cents = series.fillna(0).to_numpy(dtype=np.int64)
+    # Valores repetidos (comuns em lançamentos) são formatados uma única vez
+    codes, uniques = pd.factorize(cents)
+    formatted = _format_unique(uniques)[codes] if len(cents) else np.array([], dtype=object)
+    if isinstance(values, pd.Series):
+        return pd.Series(formatted, index=values.index, name=values.name, dtype=object)
+    return formatted
 
 def calculate_monthly_totals(incomes_df, expenses_df, investment_val):
-    total_income = incomes_df['value'].sum() if not incomes_df.empty else 0.0
-    total_expense = expenses_df['value'].sum() if not expenses_df.empty else 0.0
+    total_income = int(incomes_df['value'].sum()) if not incomes_df.empty else 0
+    total_expense = int(expenses_df['value'].sum()) if not expenses_df.empty else 0
     balance = total_income - total_expense
     return total_income, total_expense, balance, investment_val